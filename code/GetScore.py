@@ -1,22 +1,257 @@
+from configparser import ConfigParser
+from hashlib import md5
 from json import dumps, loads
 import os
 import sys
+import time
 import logging
 
 # 完全禁用所有日志输出
 logging.disable(logging.CRITICAL)
 
+from requests.exceptions import RequestException
+
 from PhiCloudAction import (
-    PhigrosCloud, parseSaveDict, readDifficultyFile, 
-    countRks, checkSaveHistory, getB19, getB30, logger
+    PhigrosCloud, readDifficultyFile, 
+    checkSaveHistory, getB19, getB30, logger, getSharedSession, CircuitBreaker,
+    setRequestHook, RecordTable, LazySave
 )
+from context import default_context
+from metrics import CACHE_EVENTS, cloud_call, stage, trace_cloud_request
+from savecache import ParsedSaveCache
+
+# 所有文件路径都从这里解析，不依赖当前工作目录
+code_context = default_context
 
 # 禁用导入的logger
 logger.disabled = True
 
+# 云端请求共用的连接池：连接数、连接超时和读取超时（秒）
+CLOUD_POOL_SIZE = 16
+CLOUD_CONNECT_TIMEOUT = 5
+CLOUD_READ_TIMEOUT = 30
+
+# GET 请求在连接失败、超时、5xx 时的重试次数，以及指数退避的基数和上限（秒，实际等待时间带随机抖动）
+CLOUD_RETRIES = 2
+CLOUD_BACKOFF = 0.2
+CLOUD_BACKOFF_MAX = 2
+
+# 熔断器：连续失败多少次后打开，打开多少秒后放行一个试探请求
+CLOUD_BREAKER_THRESHOLD = 5
+CLOUD_BREAKER_RESET = 30
+
+# 云端 API 地址，None 表示使用 PhigrosCloud 默认地址（测试时可指向本地的替身服务器）
+CLOUD_BASE_URL = None
+
+# 所有云端请求共用的熔断器；打开期间查询直接使用 saveHistory 中最近一次的数据
+cloud_breaker = CircuitBreaker(CLOUD_BREAKER_THRESHOLD, CLOUD_BREAKER_RESET)
+
+# 云端 HTTP 请求的采样比例（记录到 /api/admin/metrics），0 表示不追踪；
+# 排查问题时可以调用 setRequestHook(..., dumpBodies=True) 记录完整的请求和返回数据
+CLOUD_TRACE_SAMPLE_RATE = 1.0
+
+def configure_cloud_tracing(sample_rate=None):
+    """按采样比例安装云端请求追踪钩子"""
+    rate = CLOUD_TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    setRequestHook(trace_cloud_request if rate > 0 else None, rate)
+
+configure_cloud_tracing()
+
+# 解析后的存档成绩缓存（键是存档 md5，内存 LRU + code/saveCache 目录）：内存部分的大小上限（字节）和磁盘文件数上限
+SAVE_CACHE_MEMORY_BYTES = 32 * 1024 * 1024
+SAVE_CACHE_DISK_FILES = 2000
+
+_save_cache = None
+_difficulty_cache = {}  # 定数表路径 -> (文件签名, 定数表, 版本)
+
+def save_cache():
+    """进程内共享的解析存档缓存（code_context.save_cache_dir 变化时重新创建）"""
+    global _save_cache
+    if _save_cache is None or _save_cache.disk_dir != code_context.save_cache_dir:
+        _save_cache = ParsedSaveCache(code_context.save_cache_dir, SAVE_CACHE_MEMORY_BYTES, SAVE_CACHE_DISK_FILES)
+    return _save_cache
+
+def difficulty_table():
+    """读取定数表，文件没有变化时复用上次的结果；返回 (定数表, 版本)，版本是定数表内容的 md5"""
+    path = code_context.difficulty_path()
+    try:
+        stat = os.stat(path) if path else None
+        signature = (stat.st_mtime_ns, stat.st_size) if stat else None
+    except OSError:
+        signature = None
+    cached = _difficulty_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1], cached[2]
+    difficult = readDifficultyFile(path)
+    version = md5(dumps(difficult, sort_keys=True).encode()).hexdigest()
+    _difficulty_cache[path] = (signature, difficult, version)
+    return difficult, version
+
+def save_records(checksum, save=None):
+    """
+    按存档 md5 取解析好并计算了 RKS 的成绩表（RecordTable），同一份存档在各个请求之间只解析一次
+
+    缓存中没有时解析 save（LazySave，只解密 gameRecord）并写入缓存；save 为 None 且没有缓存时返回 None
+    """
+    difficult, version = difficulty_table()
+    records, source = save_cache().get(checksum, difficult, version)
+    if records is not None:
+        CACHE_EVENTS.inc("parsed_save", source)
+        return records
+    if save is None:
+        return None
+    CACHE_EVENTS.inc("parsed_save", "miss")
+    return save_cache().put(checksum, RecordTable.fromRecord(save, difficult), version)
+
+def fetch_records(session_token):
+    """获取当前存档的成绩表：存档 md5 已经在缓存中时不下载存档"""
+    profile = fetch_profile(session_token, save_cache())
+    if profile["save"] is not None:
+        profile["save"] = LazySave(profile["save"])
+        dump_save(profile["save"])
+    records = save_records(profile["summary"]["checksum"], profile["save"])
+    if records is None:
+        # 确认时还在缓存中，读取前被淘汰了：重新下载
+        profile = fetch_profile(session_token)
+        records = save_records(profile["summary"]["checksum"], LazySave(profile["save"]))
+    return records
+
+def best_records(records, b_number=30):
+    """计算成绩表的 B30（b_number 为 19 时为 B19）成绩列表"""
+    return getB19(records) if b_number == 19 else getB30(records)
+
+def _dump_save_option():
+    """config.ini 中 [SAVE] dump_save 的值（没有这一项时为 False）"""
+    config = ConfigParser()
+    config.read(code_context.path("config.ini"), encoding="utf-8")
+    return config.getboolean("SAVE", "dump_save", fallback=False)
+
+# 是否把完整存档写到 PhigrosSave.json（只用于排查问题，在 config.ini 的 [SAVE] dump_save 中设置）。
+# 写出时会解密存档中的所有文件，包括最大的 gameKey；关闭时计算 B30 只会解密 gameRecord
+DUMP_SAVE = _dump_save_option()
+
+def dump_save(save):
+    """DUMP_SAVE 为 True 时把完整存档写到 PhigrosSave.json"""
+    if not DUMP_SAVE:
+        return
+    with open(code_context.save_dump_file, "w", encoding="utf-8") as file:
+        file.write(dumps(save.toDict(), indent=4, ensure_ascii=False))
+
+def cloud_session():
+    """进程内共享的云端会话（保持连接，所有 PhigrosCloud 复用同一个连接池）"""
+    return getSharedSession(pool_size=CLOUD_POOL_SIZE, connect_timeout=CLOUD_CONNECT_TIMEOUT,
+                            read_timeout=CLOUD_READ_TIMEOUT, retries=CLOUD_RETRIES,
+                            backoff=CLOUD_BACKOFF, backoff_max=CLOUD_BACKOFF_MAX, breaker=cloud_breaker)
+
+def open_cloud(session_token):
+    return PhigrosCloud(session_token, cloud_session(), CLOUD_BASE_URL)
+
+# 存档新鲜度窗口（秒）：同一个 SessionToken 在窗口内再次查询时不访问云端，直接使用 saveHistory 中的数据
+SAVE_FRESHNESS_TTL = 60
+
+# {SessionToken: (上次向云端确认存档的时间（time.monotonic）, 当时的存档校验值)}
+_last_checked = {}
+
+# {SessionToken: 最近一次从云端取到的昵称}
+_nicknames = {}
+
+def fetch_profile(session_token, known_checksums=None):
+    """
+    从云端获取昵称、摘要和存档（users/me、_GameSave、存档文件各请求一次）
+
+    存档校验值在 known_checksums 中时不下载存档，返回的 save 为 None
+    """
+    with open_cloud(session_token) as cloud:
+        with cloud_call("profile"):
+            profile = cloud.fetchProfile(known_checksums)
+    _nicknames[session_token] = profile["nickname"]
+    return profile
+
+def _is_fresh(session_token):
+    checked = _last_checked.get(session_token)
+    return checked is not None and time.monotonic() - checked[0] < SAVE_FRESHNESS_TTL
+
+# 每个 SessionToken 最多记住的已处理存档校验值个数（checksumIndex.json）
+CHECKSUM_INDEX_LIMIT = 32
+
+# {文件路径: ((修改时间, 大小), 校验值集合)}，文件没有变化时不重新解析
+_checksum_file_cache = {}
+
+def _checksum_index_file(session_token):
+    return os.path.join(code_context.save_history_dir, session_token, "checksumIndex.json")
+
+def _file_checksums(path, extract):
+    """读取文件中的校验值集合，按修改时间和大小缓存"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return set()
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _checksum_file_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checksums = set(extract(loads(f.read())))
+    except (OSError, ValueError, AttributeError, TypeError):
+        checksums = set()
+    checksums.discard(None)
+    _checksum_file_cache[path] = (signature, checksums)
+    return checksums
+
+def _known_checksums(session_token):
+    """
+    已处理过的存档校验值：summaryHistory 中记录的 + checksumIndex.json 中的 + 上一次确认时的
+
+    saveHistory 只在歌曲记录有变化时才记录 summary，记录相同的新存档（例如只改了设置）
+    的校验值保存在 checksumIndex.json 中，重启后也不会重新下载
+    """
+    token_dir = os.path.join(code_context.save_history_dir, session_token)
+    checksums = set(_file_checksums(os.path.join(token_dir, "summaryHistory.json"),
+                                    lambda data: (summary.get('checksum') for summary in data.values())))
+    checksums |= _file_checksums(_checksum_index_file(session_token), lambda data: data)
+    if session_token in _last_checked:
+        checksums.add(_last_checked[session_token][1])
+    return checksums
+
+def _remember_checksum(session_token, checksum):
+    """把已处理完的存档校验值写入 checksumIndex.json（最新的在前，最多 CHECKSUM_INDEX_LIMIT 个）"""
+    index_file = _checksum_index_file(session_token)
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = loads(f.read())
+        if not isinstance(index, list):
+            index = []
+    except (OSError, ValueError):
+        index = []
+    if index[:1] == [checksum]:
+        return
+    index = [checksum] + [c for c in index if c != checksum][:CHECKSUM_INDEX_LIMIT - 1]
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    with open(index_file, 'w', encoding='utf-8') as f:
+        f.write(dumps(index, indent=4, ensure_ascii=False))
+
+def _has_snapshot(session_token):
+    """saveHistory 中是否已有解析好的存档记录"""
+    return os.path.exists(os.path.join(code_context.save_history_dir, session_token, "recordHistory.json"))
+
+def _read_rks_json(session_token):
+    """读取rks.json中最新的两个RKS值 (当前, 上一次)"""
+    rks_file = os.path.join(code_context.save_history_dir, session_token, "rks.json")
+    try:
+        with open(rks_file, 'r', encoding='utf-8') as f:
+            rks_data = loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return 0.0, 0.0
+    if isinstance(rks_data, list):
+        return (rks_data[0] if rks_data else 0.0), (rks_data[1] if len(rks_data) > 1 else 0.0)
+    if isinstance(rks_data, (int, float)):
+        return rks_data, 0.0
+    return 0.0, 0.0
+
 def _get_latest_rks_from_history(session_token):
     """从saveHistory目录获取最新的RKS值"""
-    history_file = os.path.join("saveHistory", session_token, "summaryHistory.json")
+    history_file = os.path.join(code_context.save_history_dir, session_token, "summaryHistory.json")
     try:
         with open(history_file, 'r', encoding='utf-8') as f:
             history_data = loads(f.read())
@@ -41,25 +276,23 @@ def get_current_rks(session_token):
     
     # 如果saveHistory没有，尝试获取新存档
     try:
-        with PhigrosCloud(session_token) as cloud:
-            summary = cloud.getSummary()
-            save_data = cloud.getSave()
+        profile = fetch_profile(session_token)
+        summary = profile["summary"]
+        save_data = profile["save"]
         
-        # 保存存档文件
-        save_dict = parseSaveDict(save_data)
-        with open("PhigrosSave.json", "w", encoding="utf-8") as file:
-            file.write(dumps(save_dict, indent=4, ensure_ascii=False))
+        # 按需解密存档（计算 B30 只解密 gameRecord，同一份存档解析过时直接使用缓存）
+        save = LazySave(save_data)
+        dump_save(save)
         
-        difficult = readDifficultyFile()
-        save_dict = countRks(save_dict, difficult)
+        difficult, _ = difficulty_table()
         
         # 使用B30计算RKS
-        b30 = getB30(save_dict)
+        b30 = best_records(save_records(summary["checksum"], save))
         count_rks = sum(b["rks"] for b in b30)
         current_rks = count_rks / 30
         
         # 保存到历史记录（直接保存到saveHistory目录）
-        checkSaveHistory(session_token, summary, save_data, difficult)
+        checkSaveHistory(session_token, summary, save, difficult, code_context.save_history_dir)
         
         return current_rks
     except Exception as e:
@@ -68,7 +301,7 @@ def get_current_rks(session_token):
 
 def get_user_info(session_token):
     """获取<sessionToken>当前用户信息（summaryHistory.json内容）"""
-    history_file = os.path.join("saveHistory", session_token, "summaryHistory.json")
+    history_file = os.path.join(code_context.save_history_dir, session_token, "summaryHistory.json")
     try:
         with open(history_file, 'r', encoding='utf-8') as f:
             history_data = loads(f.read())
@@ -85,7 +318,7 @@ def get_user_info(session_token):
 
 def get_save_data(session_token):
     """获取<sessionToken>存档（recordHistory.json内容）"""
-    record_file = os.path.join("saveHistory", session_token, "recordHistory.json")
+    record_file = os.path.join(code_context.save_history_dir, session_token, "recordHistory.json")
     try:
         with open(record_file, 'r', encoding='utf-8') as f:
             return loads(f.read())
@@ -97,7 +330,7 @@ def get_save_data(session_token):
 
 def get_rks_increase(session_token):
     """获取<sessionToken>的RKS涨了多少"""
-    rks_file = os.path.join("saveHistory", session_token, "rks.json")
+    rks_file = os.path.join(code_context.save_history_dir, session_token, "rks.json")
     try:
         with open(rks_file, 'r', encoding='utf-8') as f:
             rks_data = loads(f.read())
@@ -113,7 +346,7 @@ def get_rks_increase(session_token):
 
 def clear_rks_history(session_token):
     """清空<sessionToken>的RKS历史记录（只保留最近一个）"""
-    rks_file = os.path.join("saveHistory", session_token, "rks.json")
+    rks_file = os.path.join(code_context.save_history_dir, session_token, "rks.json")
     try:
         with open(rks_file, 'r', encoding='utf-8') as f:
             rks_data = loads(f.read())
@@ -137,21 +370,7 @@ def get_b_calculated_rks(session_token, b_number=30):
         raise ValueError("b_number必须是19或30")
     
     try:
-        with PhigrosCloud(session_token) as cloud:
-            save_data = cloud.getSave()
-        
-        # 保存存档文件
-        save_dict = parseSaveDict(save_data)
-        with open("PhigrosSave.json", "w", encoding="utf-8") as file:
-            file.write(dumps(save_dict, indent=4, ensure_ascii=False))
-        
-        difficult = readDifficultyFile()
-        save_dict = countRks(save_dict, difficult)
-        
-        if b_number == 19:
-            b_data = getB19(save_dict)
-        else:
-            b_data = getB30(save_dict)
+        b_data = best_records(fetch_records(session_token), b_number)
         
         count_rks = sum(b["rks"] for b in b_data)
         return count_rks / b_number
@@ -160,46 +379,82 @@ def get_b_calculated_rks(session_token, b_number=30):
         print(f"获取B{b_number}计算RKS失败: {e}")
         return 0.0
 
-def nickname(session_token):
-    """获取玩家昵称"""
+def nickname(session_token, refreshed=False):
+    """
+    获取玩家昵称（存档新鲜度窗口内直接使用 fetch_profile 取到的昵称）
+
+    refreshed 为 True 表示调用方在同一次查询中刚调用过 update_rks_record：不论新鲜度窗口多长，
+    都直接使用那次 fetch_profile 取到的昵称，users/me 每次刷新只请求一次
+    """
+    if (refreshed or _is_fresh(session_token)) and session_token in _nicknames:
+        return _nicknames[session_token]
     try:
-        with PhigrosCloud(session_token) as cloud:
-            nickname = cloud.getNickname()
+        with open_cloud(session_token) as cloud:
+            with cloud_call("nickname"):
+                nickname = cloud.getNickname()
+            _nicknames[session_token] = nickname
             return nickname
     except Exception as e:
         print(f"获取昵称失败: {e}")
-        return "未知玩家"
+        return _nicknames.get(session_token, "未知玩家")
+
+def update_rks_record(session_token, force=False):
+    """
+    更新RKS记录
 
-def update_rks_record(session_token):
-    """更新RKS记录"""
+    距离上次向云端确认存档不到 SAVE_FRESHNESS_TTL 秒时直接返回本地记录；
+    否则通过 fetch_profile 请求昵称和存档摘要，校验值已处理过（见 _known_checksums）时
+    不下载、不解密也不解析存档，直接使用 saveHistory 中已解析的记录。
+    force 为 True 时忽略新鲜度窗口和校验值，总是重新下载。
+    """
+    if not force and _is_fresh(session_token):
+        CACHE_EVENTS.inc("save", "fresh")
+        return _read_rks_json(session_token)
+    
     # 获取之前的RKS
     previous_rks = _get_previous_rks_from_json(session_token)
     
     # 获取最新存档和RKS
     try:
-        with PhigrosCloud(session_token) as cloud:
-            print(f"玩家昵称：{cloud.getNickname()}")
-            summary = cloud.getSummary()
-            save_data = cloud.getSave()
+        profile = fetch_profile(session_token, None if force else _known_checksums(session_token))
+        summary = profile["summary"]
+        save_data = profile["save"]
+        if save_data is None:
+            # 存档没有变化，saveHistory 中的数据就是最新的
+            CACHE_EVENTS.inc("save", "unchanged")
+            _last_checked[session_token] = (time.monotonic(), summary["checksum"])
+            return _read_rks_json(session_token)
+        CACHE_EVENTS.inc("save", "download")
         
-        # 保存存档文件
-        save_dict = parseSaveDict(save_data)
-        with open("PhigrosSave.json", "w", encoding="utf-8") as file:
-            file.write(dumps(save_dict, indent=4, ensure_ascii=False))
+        # 按需解密存档：计算 B30 和保存历史记录都只需要 gameRecord
+        with stage("parse_save"):
+            save = LazySave(save_data)
+            difficult, _ = difficulty_table()
+            records = save_records(summary["checksum"], save)
+        with stage("save_dump"):
+            dump_save(save)
         print("获取存档成功！")
         
-        difficult = readDifficultyFile()
-        save_dict = countRks(save_dict, difficult)
-        
-        # 计算B30 RKS
-        b30 = getB30(save_dict)
-        count_rks_b30 = sum(b["rks"] for b in b30)
-        current_rks = count_rks_b30 / 30
+        with stage("count_rks"):
+            # 计算B30 RKS
+            b30 = best_records(records)
+            count_rks_b30 = sum(b["rks"] for b in b30)
+            current_rks = count_rks_b30 / 30
         print(f"B30计算出来的RKS：{current_rks:.4f}")
         
         # 保存到历史记录
-        checkSaveHistory(session_token, summary, save_data, difficult)
+        with stage("save_history"):
+            checkSaveHistory(session_token, summary, save, difficult, code_context.save_history_dir)
+            _remember_checksum(session_token, summary["checksum"])
+        _last_checked[session_token] = (time.monotonic(), summary["checksum"])
         
+    except RequestException as e:
+        # 云端不可用（熔断器打开，或重试后仍然超时、5xx）：不再重复请求，使用 saveHistory 中最近一次的数据
+        print(f"云端不可用: {e}")
+        if _has_snapshot(session_token):
+            CACHE_EVENTS.inc("save", "stale")
+            return _read_rks_json(session_token)
+        return 0.0, previous_rks
     except Exception as e:
         print(f"获取存档失败: {e}")
         current_rks = get_b_calculated_rks(session_token, 30)
@@ -211,7 +466,7 @@ def update_rks_record(session_token):
 
 def _get_previous_rks_from_json(session_token):
     """从rks.json中获取上一次的RKS值"""
-    rks_file = os.path.join("saveHistory", session_token, "rks.json")
+    rks_file = os.path.join(code_context.save_history_dir, session_token, "rks.json")
     try:
         with open(rks_file, 'r', encoding='utf-8') as f:
             rks_data = loads(f.read())
@@ -228,7 +483,7 @@ def _get_previous_rks_from_json(session_token):
 
 def _update_rks_json(session_token, current_rks, previous_rks):
     """更新rks.json文件"""
-    rks_file = os.path.join("saveHistory", session_token, "rks.json")
+    rks_file = os.path.join(code_context.save_history_dir, session_token, "rks.json")
     
     # 读取现有的rks.json
     try:
@@ -257,15 +512,8 @@ def _update_rks_json(session_token, current_rks, previous_rks):
 def getB(session_token, best_count=30, phi_count=3):
     """获取B数和P数数据"""
     try:
-        with PhigrosCloud(session_token) as cloud:
-            save_data = cloud.getSave()
-        
-        save_dict = parseSaveDict(save_data)
-        difficult = readDifficultyFile()
-        save_dict = countRks(save_dict, difficult)
-        
-        # 获取B30数据
-        b_data = getB30(save_dict)
+        # 获取B30数据（存档解析过时不下载）
+        b_data = best_records(fetch_records(session_token))
         
         # 计算B数和P数
         b_count = len([b for b in b_data if b.get('score', 0) >= 960000])  # B数：960000分以上
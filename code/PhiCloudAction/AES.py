@@ -1,6 +1,7 @@
 # 萌新写的代码，可能不是很好，但是已经尽可能注释了，希望各位大佬谅解喵=v=
 # ----------------------- 导包区喵 -----------------------
 from base64 import b64decode
+from typing import Union
 
 from Crypto.Cipher.AES import new, MODE_CBC, block_size
 from Crypto.Util.Padding import unpad, pad
@@ -37,3 +38,23 @@ def decrypt(data: bytes):
     """
     data = new(aes_key, MODE_CBC, aes_iv).decrypt(data)
     return unpad(data, block_size)
+
+
+def decryptInto(data: Union[bytearray, memoryview]) -> memoryview:
+    """
+    AES CBC原地解密喵（不复制数据喵）
+
+    参数:
+        data (bytearray | memoryview): 要解密的数据喵，必须是可写的，解密后的数据直接写回这里喵
+
+    返回:
+        (memoryview): 去掉填充后的解密数据(data的视图喵)
+    """
+    view = memoryview(data)
+    new(aes_key, MODE_CBC, aes_iv).decrypt(view, output=view)
+
+    # 和unpad()一样检查PKCS#7填充喵
+    padding_len = view[-1] if len(view) else 0
+    if not 0 < padding_len <= block_size or view[-padding_len:] != bytes([padding_len]) * padding_len:
+        raise ValueError("Padding is incorrect.")
+    return view[:-padding_len]
@@ -4,14 +4,16 @@ from copy import deepcopy
 from datetime import datetime
 from io import BytesIO
 from json import dumps, loads
-from os import mkdir
+from os import makedirs
 from os.path import dirname, abspath, exists, join
 from re import match
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 from zipfile import ZipFile, ZIP_DEFLATED
 
 from .AES import decrypt, encrypt
-from .Structure import headGetStructure, getFileHead, Reader, Writer
+from .LazySave import LazySave
+from .RecordTable import RecordTable
+from .Structure import headGetStructure, getFileHead, compilePlan, BitFlags, Reader, Writer
 from .logger import logger
 
 
@@ -310,13 +312,17 @@ def getBest(
     获取best成绩喵
 
     参数:
-        record_data (dict): gameRecord/存档 反序列化数据喵
+        record_data (dict | RecordTable): gameRecord/存档 反序列化数据喵，也可以是列式成绩表喵
         phi (int): 要返回phi榜的前几条成绩喵。默认为3喵
         best (int): 要返回best榜的前几条成绩喵。默认为27喵
 
     返回:
         (dict[str, list[dict]]): best列表喵
     """
+    if isinstance(record_data, RecordTable):
+        # 列式成绩表直接用argpartition取前几名喵
+        return record_data.getBest(phi_count, best_count)
+
     all_record = []  # 存储所有打歌成绩记录喵
 
     if record_data.get("gameRecord") is not None and isinstance(
@@ -360,7 +366,7 @@ def getB19(records: dict) -> List[dict]:
     获取b19喵（现在Phigros已不使用b19进行计算rks了，请使用`getB30()`喵！）
 
     参数:
-        records (dict): gameRecord/存档 反序列化数据喵
+        records (dict | RecordTable): gameRecord/存档 反序列化数据喵，也可以是列式成绩表喵
 
     返回:
         (list[dict]): b19列表喵
@@ -377,7 +383,7 @@ def getB30(records: dict):
     获取b30喵
 
     参数:
-        records (dict): gameRecord/存档 反序列化数据喵
+        records (dict | RecordTable): gameRecord/存档 反序列化数据喵，也可以是列式成绩表喵
 
     返回:
         (list[dict]): b30列表喵
@@ -410,8 +416,8 @@ def decryptSave(save_dict: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
     for key, value in save_dict.items():
         save_dict[key] = decrypt(value[1:])
 
-        reader = Reader(save_dict[key])
-        save_dict[key] = reader.parseStructure(structure_list[key])
+        # 用预编译的解析计划反序列化喵（结果和Reader.parseStructure()一样喵）
+        save_dict[key] = compilePlan(structure_list[key]).parse(save_dict[key])
 
     return save_dict
 
@@ -515,8 +521,9 @@ def readRecordHistory(recordHistory: Dict[str, dict]):
 def checkSaveHistory(
     sessionToken: str,
     summary: dict,
-    save_data: bytes,
+    save_data: Union[bytes, LazySave],
     difficulty: Dict[str, list],
+    history_path: str = "saveHistory",
 ):
     """
     更新存档历史记录喵
@@ -526,46 +533,42 @@ def checkSaveHistory(
     参数
         sessionToken (str): 玩家的sessionToken喵
         summary (dict): 玩家的summary喵
-        save_data (bytes): 存档原始数据喵
+        save_data (bytes | LazySave): 存档原始数据喵，也可以是已经打开的LazySave(会复用已经解密的gameRecord喵)
         difficulty (dict[str, list]): 难度定数数据喵
+        history_path (str): 存档历史记录文件夹路径喵。默认为工作目录下的"saveHistory"喵
 
     返回:
         (bool): 是否更新了存档历史记录喵
     """
     nowTime = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    token_path = join(history_path, sessionToken)
+    summary_file = join(token_path, "summaryHistory.json")
+    record_file = join(token_path, "recordHistory.json")
 
     # 如果历史文件夹不存在则创建喵
-    if not exists("saveHistory/"):
-        mkdir("saveHistory/")
+    if not exists(history_path):
+        makedirs(history_path, exist_ok=True)
         logger.info("存档历史记录文件夹不存在喵！已创建喵！")
 
     # 如果对应token历史文件夹不存在则创建喵
-    if not exists(f"saveHistory/{sessionToken}/"):
-        mkdir(f"saveHistory/{sessionToken}/")
+    if not exists(token_path):
+        makedirs(token_path, exist_ok=True)
         logger.info("对应sessionToken的存档历史文件夹不存在喵！已创建喵！")
 
-    if not exists(f"saveHistory/{sessionToken}/summaryHistory.json"):
+    if not exists(summary_file):
         summaryHistory = {}
         logger.info("对应sessionToken的summary历史文件不存在，将会创建喵！")
 
     else:
-        with open(
-            f"saveHistory/{sessionToken}/summaryHistory.json",
-            "r",
-            encoding="utf-8",
-        ) as file:
+        with open(summary_file, "r", encoding="utf-8") as file:
             summaryHistory = loads(file.read())
 
-    if not exists(f"saveHistory/{sessionToken}/recordHistory.json"):
+    if not exists(record_file):
         recordHistory = {}
         logger.info("对应sessionToken的record历史文件不存在喵！已创建喵！")
 
     else:
-        with open(
-            f"saveHistory/{sessionToken}/recordHistory.json",
-            "r",
-            encoding="utf-8",
-        ) as file:
+        with open(record_file, "r", encoding="utf-8") as file:
             recordHistory = loads(file.read())
 
     # 获取历史所有校验值喵
@@ -574,15 +577,11 @@ def checkSaveHistory(
     # 如果没有相同校验值，则添加进历史记录并保存存档喵
     if not summary["checksum"] in checksumHistory:
         record_old = readRecordHistory(recordHistory)
-        save_dict = unzipFile(save_data)
 
-        del save_dict["gameKey"]
-        del save_dict["gameProgress"]
-        del save_dict["settings"]
-        del save_dict["user"]
-
-        save_dict = decryptSave(save_dict)
-        record_new = save_dict["gameRecord"]
+        # 只需要gameRecord，其他文件不会被解密喵
+        if not isinstance(save_data, LazySave):
+            save_data = LazySave(save_data)
+        record_new = save_data["gameRecord"]
         differentRecord = findDifferentKeys(record_old, record_new)
 
         if differentRecord != []:
@@ -592,21 +591,13 @@ def checkSaveHistory(
             for key in differentRecord:
                 new_record[key] = record_new[key]
 
-            with open(
-                f"saveHistory/{sessionToken}/summaryHistory.json",
-                "w",
-                encoding="utf-8",
-            ) as file:
+            with open(summary_file, "w", encoding="utf-8") as file:
                 file.write(dumps(summaryHistory, indent=4, ensure_ascii=False))
 
-            with open(f"saveHistory/{sessionToken}/{nowTime}.save", "wb") as save:
-                save.write(save_data)
+            with open(join(token_path, f"{nowTime}.save"), "wb") as save:
+                save.write(save_data.data)
 
-            with open(
-                f"saveHistory/{sessionToken}/recordHistory.json",
-                "w",
-                encoding="utf-8",
-            ) as file:
+            with open(record_file, "w", encoding="utf-8") as file:
                 recordHistory[nowTime] = new_record
                 file.write(dumps(recordHistory, indent=4, ensure_ascii=False))
 
@@ -693,29 +684,32 @@ def formatGameKey(save_dict: dict, filePath: str = "./") -> Dict[str, dict]:
         "single": readTxtFile(join(filePath, "single.txt")),
     }
 
+    # type可能是BitFlags，也可能是从JSON读回来的字符串喵，都不需要eval()喵
+    def keyType(key: str) -> BitFlags:
+        return BitFlags.parse(gameKeys[key]["type"])
+
     for key in allKey["avatar"]:
         try:
-            gameKeys[key]["4avatar"] = eval(gameKeys[key]["type"])[4]
+            gameKeys[key]["4avatar"] = keyType(key).bit(4)
         except KeyError:
             pass
 
     for key in allKey["collection"].keys():
         try:
-            gameKeys[key]["02collection"] = str(
-                [eval(gameKeys[key]["type"])[0], eval(gameKeys[key]["type"])[2]]
-            )
+            key_type = keyType(key)
+            gameKeys[key]["02collection"] = str([key_type.bit(0), key_type.bit(2)])
         except KeyError:
             pass
 
     for key in allKey["illustration"]:
         try:
-            gameKeys[key]["3illustration"] = eval(gameKeys[key]["type"])[3]
+            gameKeys[key]["3illustration"] = keyType(key).bit(3)
         except KeyError:
             pass
 
     for key in allKey["single"]:
         try:
-            gameKeys[key]["1single"] = eval(gameKeys[key]["type"])[1]
+            gameKeys[key]["1single"] = keyType(key).bit(1)
         except KeyError:
             pass
 
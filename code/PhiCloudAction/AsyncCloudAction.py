@@ -0,0 +1,211 @@
+# ----------------------- 导包区喵 -----------------------
+import asyncio
+from json import loads
+from time import perf_counter
+from typing import Container, Dict, Iterable, Mapping, Optional, Union
+
+import aiohttp
+
+from .ActionLib import checkSessionToken
+from .CloudAction import DEFAULT_BASE_URL, LC_HEADERS, PhigrosCloud, _sampleTracing
+from .logger import logger
+
+
+# ---------------------- 定义赋值区喵 ----------------------
+
+
+def createAsyncSession(
+    limit: int = 100,
+    limitPerHost: int = 16,
+    connectTimeout: float = 5,
+    readTimeout: float = 30,
+) -> aiohttp.ClientSession:
+    """
+    创建带连接数限制和超时的aiohttp会话喵（必须在事件循环里调用喵）
+
+    参数:
+        limit (int): 总连接数上限喵
+        limitPerHost (int): 同一个主机的连接数上限喵（LeanCloud和存档文件的主机分别计算喵）
+        connectTimeout (float): 连接超时秒数喵
+        readTimeout (float): 两次读取之间的超时秒数喵
+
+    返回:
+        (aiohttp.ClientSession): 会话喵，用完要await close()喵
+    """
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limitPerHost)
+    timeout = aiohttp.ClientTimeout(sock_connect=connectTimeout, sock_read=readTimeout)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+class AsyncPhigrosCloud:
+    """
+    asyncio版的PhigrosCloud喵，接口和同步版一致喵（getNickname、getSummary、getSave、fetchProfile）
+
+    多个实例可以共用同一个aiohttp会话喵，连接数由会话的TCPConnector限制喵
+    """
+
+    def __init__(
+        self,
+        sessionToken: str,
+        client: Optional[aiohttp.ClientSession] = None,
+        baseUrl: Optional[str] = None,
+    ):
+        checkSessionToken(sessionToken)
+        self.sessionToken = sessionToken
+        self.create_client = client is None
+        self.client = client
+        self.baseUrl = baseUrl or DEFAULT_BASE_URL
+        self.headers = {**LC_HEADERS, "X-LC-Session": sessionToken}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if self.create_client:
+            await self.close()
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+
+    async def _get(self, url: str, asJson: bool = True):
+        # 没有传入会话时在第一次请求时创建喵（aiohttp会话要在事件循环里创建喵）
+        if self.client is None:
+            self.client = createAsyncSession()
+
+        tracing = _sampleTracing()
+        start = perf_counter() if tracing is not None else 0.0
+        try:
+            async with self.client.get(url, headers=self.headers) as response:
+                content = await response.read()
+        except Exception as e:
+            if tracing is not None:
+                tracing.emit("GET", url, None, None, perf_counter() - start, e, self.headers)
+            raise
+        if tracing is not None:
+            tracing.emit("GET", url, response.status, content, perf_counter() - start, None, self.headers)
+
+        logger.debug("GET %s ：%s", url, response.status)
+        response.raise_for_status()
+        return loads(content) if asJson else content
+
+    async def getNickname(self) -> str:
+        """
+        获取玩家昵称喵
+
+        返回:
+            (str): 玩家昵称喵
+        """
+        logger.debug("调用函数：getNickname()")
+        return_data = (await self._get(self.baseUrl + "users/me"))["nickname"]
+
+        logger.debug(f'函数"getNickname()"返回：{return_data}')
+        return return_data
+
+    async def getSummary(self) -> dict:
+        """
+        获取玩家summary喵
+
+        返回:
+            (dict): 玩家summary数据喵
+        """
+        logger.debug("调用函数：getSummary()")
+        result = (await self._get(self.baseUrl + "classes/_GameSave?limit=1"))["results"][0]
+        return_data = PhigrosCloud._parseSummary(result)
+
+        logger.debug(f'函数"getSummary()"返回：{return_data}')
+        return return_data
+
+    async def getSave(
+        self, url: Optional[str] = None, checksum: Optional[str] = None
+    ) -> bytes:
+        """
+        获取存档数据喵 (压缩包数据喵)
+
+        参数:
+            url (str | None): 存档的URL喵。留空自动获取当前token的数据喵
+            checksum (str | None): 存档的md5校验值喵。留空自动获取当前token的数据喵
+
+        返回:
+            (bytes): 存档压缩包数据喵
+        """
+        logger.debug("调用函数：getSave()")
+
+        if url is None or checksum is None:
+            summary = await self.getSummary()
+            url = url or summary["url"]
+            checksum = checksum or summary["checksum"]
+
+        save_data = await self._get(url, asJson=False)  # type: ignore
+        PhigrosCloud._checkSave(save_data, checksum)
+
+        logger.debug(f'函数"getSave()"返回：*{len(save_data)} bytes*')
+        return save_data
+
+    async def fetchProfile(self, knownChecksums: Optional[Container[str]] = None) -> dict:
+        """
+        一次性获取玩家昵称、summary和存档数据喵（users/me和_GameSave同时请求喵）
+
+        参数:
+            knownChecksums (Container[str] | None): 已经有的存档校验值喵，命中时save为None喵
+
+        返回:
+            (dict): {"nickname": 玩家昵称, "summary": summary数据, "save": 存档压缩包数据或None}喵
+        """
+        logger.debug("调用函数：fetchProfile()")
+
+        nickname, summary = await asyncio.gather(self.getNickname(), self.getSummary())
+
+        if knownChecksums is not None and summary["checksum"] in knownChecksums:
+            logger.debug("存档校验值未变化，不下载存档喵")
+            save_data = None
+        else:
+            save_data = await self.getSave(summary["url"], summary["checksum"])
+
+        return {"nickname": nickname, "summary": summary, "save": save_data}
+
+
+async def fetchProfiles(
+    sessionTokens: Iterable[str],
+    concurrency: int = 64,
+    knownChecksums: Optional[Mapping[str, Container[str]]] = None,
+    client: Optional[aiohttp.ClientSession] = None,
+    baseUrl: Optional[str] = None,
+) -> Dict[str, Union[dict, Exception]]:
+    """
+    并发获取一批玩家的资料喵（批量刷新用喵）
+
+    同时进行中的玩家数不超过concurrency喵，每个主机的连接数还受会话的limitPerHost限制喵。
+    单个玩家失败不会影响其他玩家喵，失败的结果是对应的异常对象喵
+
+    参数:
+        sessionTokens (Iterable[str]): 玩家的sessionToken喵
+        concurrency (int): 同时进行中的玩家数上限喵
+        knownChecksums (Mapping[str, Container[str]] | None): 每个玩家已经有的存档校验值喵
+        client (aiohttp.ClientSession | None): 共用的会话喵，留空时临时创建一个喵
+        baseUrl (str | None): LeanCloud接口地址喵
+
+    返回:
+        (dict): {sessionToken: fetchProfile()的结果或异常}喵
+    """
+    tokens = list(dict.fromkeys(sessionTokens))  # 去重并保持顺序喵
+    semaphore = asyncio.Semaphore(concurrency)
+    session = client or createAsyncSession()
+
+    async def fetchOne(sessionToken: str):
+        async with semaphore:
+            known = knownChecksums.get(sessionToken) if knownChecksums else None
+            return await AsyncPhigrosCloud(sessionToken, session, baseUrl).fetchProfile(known)
+
+    try:
+        results = await asyncio.gather(
+            *(fetchOne(token) for token in tokens), return_exceptions=True
+        )
+    finally:
+        if client is None:
+            await session.close()
+
+    for token, result in zip(tokens, results):
+        if isinstance(result, Exception):
+            logger.error(f"获取玩家资料失败喵：{token[:6]}...：{type(result).__name__}: {result}")
+    return dict(zip(tokens, results))
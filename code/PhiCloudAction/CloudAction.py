@@ -3,17 +3,288 @@
 from base64 import b64decode
 from hashlib import md5
 from json import dumps
-from typing import Any, Optional, Union
+from logging import DEBUG
+from random import random, uniform
+from threading import Lock
+from time import monotonic, perf_counter, sleep
+from typing import Any, Callable, Container, Optional, Union
 
 from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
 
 from .ActionLib import checkSessionToken
-from .Structure import Reader, summary
+from .Structure import compilePlan, summary
 from .logger import logger
 
 
 # ---------------------- 定义赋值区喵 ----------------------
 
+DEFAULT_BASE_URL = "https://rak3ffdi.cloud.tds1.tapapis.cn/1.1/"
+
+LC_HEADERS = {
+    "X-LC-Id": "rAK3FfdieFob2Nn8Am",
+    "X-LC-Key": "Qr9AEqtuoSVS3zeD6iVbM4ZC0AtkJcQ89tywVyi0",
+    "User-Agent": "LeanCloud-CSharp-SDK/1.0.3",
+    "Accept": "application/json",
+}  # 除了X-LC-Session以外的固定请求头喵（同步和异步客户端共用）
+
+
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})  # 可以安全重试的幂等请求喵
+RETRY_EXCEPTIONS = (ConnectionError, Timeout, ChunkedEncodingError)
+
+
+class CircuitOpenError(ConnectionError):
+    """熔断器处于打开状态，请求没有发出去喵"""
+
+
+class CircuitBreaker:
+    """
+    熔断器喵（多个线程、多个会话可以共用一个喵）
+
+    连续失败failure_threshold次后打开喵，打开期间的请求直接引发CircuitOpenError，不会占着线程等超时喵。
+    打开reset_timeout秒后放行一个试探请求（半开喵）：成功就关闭，失败就重新打开喵
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0  # 连续失败次数喵
+        self.opened_at: Optional[float] = None  # 打开的时间喵(monotonic)，关闭时为None喵
+        self._probing = False  # 半开状态下是否已经放行了试探请求喵
+        self._lock = Lock()
+
+    @property
+    def state(self) -> str:
+        """closed / open / half_open 喵"""
+        if self.opened_at is None:
+            return "closed"
+        if self._probing or monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_request(self):
+        """发请求之前调用喵，熔断器打开时引发CircuitOpenError喵"""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if not self._probing and monotonic() - self.opened_at >= self.reset_timeout:
+                self._probing = True  # 放行这一个试探请求喵
+                return
+        raise CircuitOpenError(
+            f"云端连续请求失败{self.failures}次，熔断器已打开喵，{self.reset_timeout}秒后重试喵"
+        )
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._probing:
+                    logger.warning(f"云端连续请求失败{self.failures}次，熔断器打开喵！")
+                self.opened_at = monotonic()
+                self._probing = False
+
+
+class PooledSession(Session):
+    """
+    带连接池、默认超时、重试和熔断的requests会话喵
+
+    同一个会话可以在多个线程、多个PhigrosCloud之间共享喵，连接会保持复用，不用每次都重新TLS握手喵。
+    GET等幂等请求在连接失败、超时、5xx和429时最多重试retries次喵，
+    每次等待 0 ~ min(backoff_max, backoff * 2^第几次重试) 秒的随机时间（指数退避+抖动喵）。
+    传入breaker时，每个请求(包括它的所有重试)前检查一次熔断器喵，重试完仍然失败或引发异常算一次失败喵
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 16,
+        connect_timeout: float = 5,
+        read_timeout: float = 30,
+        retries: int = 2,
+        backoff: float = 0.2,
+        backoff_max: float = 2,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        super().__init__()
+        self.timeout = (connect_timeout, read_timeout)  # 默认的(连接超时, 读取超时)喵
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        # 没有单独指定超时的请求使用默认超时喵
+        kwargs.setdefault("timeout", self.timeout)
+        attempts = self.retries + 1 if method.upper() in RETRY_METHODS else 1
+
+        if self.breaker is None:
+            return self._requestWithRetry(method, url, attempts, **kwargs)
+
+        # 每个请求只检查一次熔断器喵（重试时不再检查，否则半开时的试探请求重试会被自己拦住喵）
+        self.breaker.before_request()
+        try:
+            response = self._requestWithRetry(method, url, attempts, **kwargs)
+        except BaseException:
+            # 任何异常都算一次失败喵，试探请求失败时熔断器会重新打开，不会一直卡在半开喵
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _requestWithRetry(self, method, url, attempts, **kwargs):
+        for attempt in range(attempts):
+            response, error = None, None
+            try:
+                response = super().request(method, url, **kwargs)
+            except RETRY_EXCEPTIONS as e:
+                error = e
+
+            failed = error is not None or response.status_code >= 500 or response.status_code == 429
+            if not failed or attempt == attempts - 1:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = uniform(0, min(self.backoff_max, self.backoff * 2**attempt))
+            logger.warning(
+                f"请求失败喵（{error or response.status_code}），{delay:.2f}秒后第{attempt + 1}次重试喵：{url}"
+            )
+            if response is not None:
+                response.close()  # 把连接还给连接池喵
+            sleep(delay)
+
+
+_shared_session: Optional[PooledSession] = None
+_shared_session_lock = Lock()
+
+
+def getSharedSession(**kwargs) -> PooledSession:
+    """
+    获取进程内共享的连接池会话喵（第一次调用时创建）
+
+    参数:
+        **kwargs: 第一次创建时传给PooledSession的参数喵(pool_size, connect_timeout, read_timeout, retries, breaker等)
+
+    返回:
+        (PooledSession): 共享的会话喵
+    """
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = PooledSession(**kwargs)
+    return _shared_session
+
+
+class RequestTracing:
+    """请求追踪设置喵（用setRequestHook()修改喵）"""
+
+    def __init__(
+        self,
+        hook: Callable[[dict], None],
+        sampleRate: float = 1.0,
+        dumpBodies: bool = False,
+    ):
+        self.hook = hook
+        self.sampleRate = sampleRate
+        self.dumpBodies = dumpBodies
+
+    def emit(
+        self,
+        method: str,
+        url: str,
+        status: Optional[int],
+        content: Optional[bytes],
+        elapsed: float,
+        error: Optional[BaseException] = None,
+        requestHeaders: Optional[dict] = None,
+        requestBody: Any = None,
+    ):
+        trace = {
+            "method": method,
+            "url": url,
+            "status": status,
+            "bytes": len(content) if content is not None else 0,
+            "elapsed": elapsed,
+            "error": error,
+        }
+        if self.dumpBodies:
+            headers = dict(requestHeaders or {})
+            if "X-LC-Session" in headers:
+                headers["X-LC-Session"] = "***"  # sessionToken不能出现在日志里喵
+            trace["requestHeaders"] = headers
+            trace["requestBody"] = requestBody
+            trace["responseBody"] = content
+            if logger.isEnabledFor(DEBUG):
+                logger.debug(f"请求头 ：{headers}")
+                logger.debug(f"请求数据 : {_describeBody(requestBody)}")
+                logger.debug(f"返回数据 : {_describeBody(content)}")
+
+        try:
+            self.hook(trace)
+        except Exception as e:
+            # 追踪钩子出错不能影响请求本身喵
+            logger.warning(f"请求追踪钩子出错喵：{e!r}")
+
+
+def _describeBody(body: Any) -> str:
+    if body is None:
+        return "*无数据*"
+    if isinstance(body, str):
+        return repr(body)
+    try:
+        return bytes(body).decode()
+    except UnicodeDecodeError:
+        return f"*{len(body)} bytes*"
+
+
+_tracing: Optional[RequestTracing] = None
+
+
+def setRequestHook(
+    hook: Optional[Callable[[dict], None]] = None,
+    sampleRate: float = 1.0,
+    dumpBodies: bool = False,
+):
+    """
+    设置全局的请求追踪钩子喵（同步和异步客户端共用喵）
+
+    每次请求完成后按sampleRate的比例调用hook(trace)喵，trace是一个字典喵：
+        method, url, status(请求出错时为None), bytes(返回数据字节数), elapsed(耗时秒数), error(异常或None)
+    dumpBodies为True时还会带上requestHeaders(X-LC-Session已隐去)、requestBody、responseBody，
+    并在DEBUG日志里输出完整的请求和返回数据喵（存档有上百KB，只在排查问题时打开喵）
+
+    hook为None时关闭追踪喵，此时每次请求只多一次None判断喵
+
+    参数:
+        hook (Callable[[dict], None] | None): 追踪钩子喵
+        sampleRate (float): 采样比例喵(0~1)
+        dumpBodies (bool): 是否记录完整的请求头、请求数据和返回数据喵
+    """
+    global _tracing
+    _tracing = RequestTracing(hook, sampleRate, dumpBodies) if hook is not None else None
+
+
+def _sampleTracing() -> Optional[RequestTracing]:
+    """这次请求要不要追踪喵，不追踪时返回None喵"""
+    tracing = _tracing
+    if tracing is None or (tracing.sampleRate < 1 and random() >= tracing.sampleRate):
+        return None
+    return tracing
+
 
 class PigeonRequest:
     def __init__(
@@ -25,16 +296,13 @@ class PigeonRequest:
         if client:
             self.client = client
         else:
-            self.client = Session()
+            self.client = PooledSession(pool_size=1)
 
         if headers:
             self.headers = headers
         else:
             self.headers = {
-                "X-LC-Id": "rAK3FfdieFob2Nn8Am",
-                "X-LC-Key": "Qr9AEqtuoSVS3zeD6iVbM4ZC0AtkJcQ89tywVyi0",
-                "User-Agent": "LeanCloud-CSharp-SDK/1.0.3",
-                "Accept": "application/json",
+                **LC_HEADERS,
                 "X-LC-Session": sessionToken,
             }  # 全局的默认请求头喵
 
@@ -56,43 +324,38 @@ class PigeonRequest:
             headers = self.headers
 
         if method == "GET":
-            self._req = self.client.get(url, headers=headers, **kwargs)
+            send = self.client.get
 
         elif method == "POST":
-            self._req = self.client.post(url, headers=headers, **kwargs)
+            send = self.client.post
 
         elif method == "PUT":
-            self._req = self.client.put(url, headers=headers, **kwargs)
+            send = self.client.put
 
         elif method == "DELETE":
-            self._req = self.client.delete(url, headers=headers, **kwargs)
+            send = self.client.delete
 
         else:
             raise ValueError(f'传入的请求类型不合法喵！不应为"{method}"！')
 
-        logger.debug(f"请求类型 ：{method}")
-        logger.debug(f"请求URL ：{url}")
-        logger.debug(f"请求头 ：{self._req.request.headers}")
-        logger.debug(f"状态码 ：{self._req.status_code}")
-
-        if self._req.request.body is None:
-            logger.debug(f"请求数据 : *无请求数据*")
-
-        elif isinstance(self._req.request.body, str):
-            logger.debug(f"请求数据 : {repr(self._req.request.body)}")
-
-        else:
-            logger.debug(f"请求数据 : *{len(self._req.request.body)} bytes*")
-
-        if self._req.content is None:
-            logger.debug(f"返回数据 : *无返回数据*")
+        tracing = _sampleTracing()
+        if tracing is None:
+            self._req = send(url, headers=headers, **kwargs)
 
         else:
+            start = perf_counter()
             try:
-                logger.debug(f"返回数据 : {self._req.content.decode()}")
+                self._req = send(url, headers=headers, **kwargs)
+            except Exception as e:
+                tracing.emit(method, url, None, None, perf_counter() - start, e, headers, kwargs.get("data"))
+                raise
+            tracing.emit(
+                method, url, self._req.status_code, self._req.content, perf_counter() - start,
+                None, self._req.request.headers, self._req.request.body,
+            )
 
-            except UnicodeDecodeError:
-                logger.debug(f"返回数据 : *{len(self._req.content)} bytes*")
+        # 用%格式化喵，日志没打开时不会拼接字符串喵
+        logger.debug("%s %s ：%s", method, url, self._req.status_code)
 
         self._req.raise_for_status()
 
@@ -122,17 +385,23 @@ class PigeonRequest:
 
 
 class PhigrosCloud:
-    def __init__(self, sessionToken: str, client: Optional[Any] = None):
+    def __init__(
+        self,
+        sessionToken: str,
+        client: Optional[Any] = None,
+        baseUrl: Optional[str] = None,
+    ):
         if checkSessionToken(sessionToken):
             self.create_client = False
             if client:
                 self.client = client
             else:
-                self.client = Session()
+                self.client = PooledSession(pool_size=1)
                 self.create_client = True
 
-            self.request = PigeonRequest(sessionToken, client)
-            self.baseUrl = "https://rak3ffdi.cloud.tds1.tapapis.cn/1.1/"
+            # 发请求和关闭用的是同一个会话喵
+            self.request = PigeonRequest(sessionToken, self.client)
+            self.baseUrl = baseUrl or DEFAULT_BASE_URL
 
     async def __aenter__(self):
         return self
@@ -179,10 +448,26 @@ class PhigrosCloud:
         result = (self.request.get(self.baseUrl + "classes/_GameSave?limit=1")).json()[
             "results"
         ][0]
+        return_data = self._parseSummary(result)
+
+        logger.debug(f'函数"getSummary()"返回：{return_data}')
+        return return_data
+
+    @staticmethod
+    def _parseSummary(result: dict) -> dict:
+        """
+        解析_GameSave返回的存档信息喵
+
+        参数:
+            result (dict): classes/_GameSave返回的results中的一项喵
+
+        返回:
+            (dict): 玩家summary数据喵
+        """
         summary_data = b64decode(result["summary"])  # base64解码summary数据喵
 
         # 解析summary数据喵（谢谢废酱喵！）
-        summary_dict = Reader(summary_data).parseStructure(summary)
+        summary_dict = compilePlan(summary).parse(summary_data)
 
         return_data = {  # 解析数据并返回一个字典喵
             # 这是存档的md5校验值喵
@@ -199,10 +484,34 @@ class PhigrosCloud:
             "IN": summary_dict["IN"],  # IN难度的评级情况喵
             "AT": summary_dict["AT"],  # AT难度的评级情况喵
         }
-
-        logger.debug(f'函数"getSummary()"返回：{return_data}')
         return return_data
 
+    def fetchProfile(self, knownChecksums: Optional[Container[str]] = None) -> dict:
+        """
+        一次性获取玩家昵称、summary和存档数据喵
+
+        users/me、classes/_GameSave和存档文件各只请求一次喵（分别调用getNickname()、getSummary()、getSave()
+        的话_GameSave会被请求两次喵）。存档的校验值在knownChecksums里时不下载存档喵
+
+        参数:
+            knownChecksums (Container[str] | None): 已经有的存档校验值喵，命中时save为None喵
+
+        返回:
+            (dict): {"nickname": 玩家昵称, "summary": summary数据, "save": 存档压缩包数据或None}喵
+        """
+        logger.debug("调用函数：fetchProfile()")
+
+        nickname = self.getNickname()
+        summary = self.getSummary()
+
+        if knownChecksums is not None and summary["checksum"] in knownChecksums:
+            logger.debug("存档校验值未变化，不下载存档喵")
+            save_data = None
+        else:
+            save_data = self.getSave(summary["url"], summary["checksum"])
+
+        return {"nickname": nickname, "summary": summary, "save": save_data}
+
     def getSave(
         self, url: Optional[str] = None, checksum: Optional[str] = None
     ) -> bytes:
@@ -229,6 +538,20 @@ class PhigrosCloud:
 
         # 请求存档文件并获取数据喵
         save_data = (self.request.get(url)).content  # type: ignore
+        self._checkSave(save_data, checksum)
+
+        logger.debug(f'函数"getSave()"返回：*{len(save_data)} bytes*')
+        return save_data  # 返回存档数据喵
+
+    @staticmethod
+    def _checkSave(save_data: bytes, checksum: Optional[str]):
+        """
+        检查下载到的存档数据喵，大小不足或校验值不对时引发ValueError喵
+
+        参数:
+            save_data (bytes): 存档压缩包数据喵
+            checksum (str | None): 云端记录的md5校验值喵
+        """
         if len(save_data) <= 30:
             logger.error(
                 f"严重警告喵！！！获取到的云存档大小不足 30 字节喵！当前大小喵：{len(save_data)}"
@@ -248,9 +571,6 @@ class PhigrosCloud:
                 f"存档校验不通过喵！本地存档md5：{actual_checksum}，云端存档md5：{checksum}"
             )
 
-        logger.debug(f'函数"getSave()"返回：*{len(save_data)} bytes*')
-        return save_data  # 返回存档数据喵
-
     def refreshSessionToken(self):
         """
         刷新sessionToken喵
@@ -0,0 +1,109 @@
+# ----------------------- 导包区喵 -----------------------
+from collections.abc import Mapping
+from io import BytesIO
+from typing import Any, Dict, Iterator, Tuple
+from zipfile import ZipFile, ZipInfo
+
+from .AES import decryptInto
+from .Structure import compilePlan, headGetStructure
+from .logger import logger
+
+
+# ---------------------- 定义赋值区喵 ----------------------
+
+# 解压时每次读取的大小喵
+ZIP_CHUNK_SIZE = 64 * 1024
+
+
+def readZipMember(zip_file: ZipFile, info: ZipInfo) -> bytearray:
+    """
+    把压缩包里的一个文件解压到预先分配好的缓冲区喵
+
+    参数:
+        zip_file (ZipFile): 压缩包喵
+        info (ZipInfo): 要解压的文件喵
+
+    返回:
+        (bytearray): 文件数据喵(可写，可以直接原地解密喵)
+    """
+    buffer = bytearray(info.file_size)
+    view = memoryview(buffer)
+    pos = 0
+    with zip_file.open(info) as file:
+        while pos < info.file_size:
+            read = file.readinto(view[pos : pos + ZIP_CHUNK_SIZE])
+            if not read:
+                raise EOFError(f'解压"{info.filename}"时数据不完整喵！')
+            pos += read
+    return buffer
+
+
+def decodeMember(name: str, buffer: bytearray) -> Any:
+    """
+    原地解密并反序列化存档里的一个文件喵（解密和反序列化都直接在buffer上进行，不复制数据喵）
+
+    参数:
+        name (str): 文件名喵(gameRecord、gameKey……)
+        buffer (bytearray): 文件数据喵(第一个字节是文件头喵)，解密后内容会被覆盖喵
+
+    返回:
+        (Any): 反序列化数据喵
+    """
+    # 文件头(第一个字节喵)决定反序列化用的结构类喵
+    structure = headGetStructure({name: bytes(buffer[:1])})[name]
+    return compilePlan(structure).parse(decryptInto(memoryview(buffer)[1:]))
+
+
+class LazySave(Mapping):
+    """
+    按需反序列化的存档喵
+
+    用法和parseSaveDict()返回的字典一样喵（save["gameRecord"]、save.get("user")……），
+    但每个文件只在第一次被访问时才解压、解密并反序列化，之后直接用缓存喵。
+    只计算B30时只会解密gameRecord，不会碰最大的gameKey喵
+    """
+
+    def __init__(self, save_data: bytes):
+        """
+        参数:
+            save_data (bytes): 存档原始数据(压缩包)喵
+        """
+        self.data = save_data
+        self._zip = ZipFile(BytesIO(save_data))
+        self._names = [i.filename for i in self._zip.filelist]
+        self._files: Dict[str, Any] = {}
+        self.decryptedBytes = 0  # 已经解密的字节数喵
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._files.get(key)
+        if value is not None:
+            return value
+
+        if key not in self._names:
+            raise KeyError(key)
+
+        logger.debug(f'解压"{key}"文件喵')
+        buffer = readZipMember(self._zip, self._zip.getinfo(key))
+        value = self._files[key] = decodeMember(key, buffer)
+        self.decryptedBytes += len(buffer) - 1
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    @property
+    def decoded(self) -> Tuple[str, ...]:
+        """已经反序列化的文件名喵"""
+        return tuple(key for key in self._names if key in self._files)
+
+    def toDict(self) -> Dict[str, Dict[str, Any]]:
+        """
+        反序列化全部文件喵
+
+        返回:
+            (dict[str, dict]): 和parseSaveDict()一样的存档反序列化数据喵
+        """
+        return {key: self[key] for key in self._names}
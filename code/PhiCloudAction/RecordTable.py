@@ -0,0 +1,310 @@
+# ----------------------- 导包区喵 -----------------------
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .logger import logger
+
+# ---------------------- 定义赋值区喵 ----------------------
+
+# 难度名称和难度代码(也是定数表里的索引)喵
+LEVELS = ("EZ", "HD", "IN", "AT", "Legacy")
+_LEVEL_CODES = {name: code for code, name in enumerate(LEVELS)}
+
+
+def _lookupDifficulty(
+    difficulty: Dict[str, list], songName: str, diff: str, code: int
+) -> float:
+    # 定数获取失败时的处理和addDifficulty()一样喵
+    songDifficulty = difficulty.get(songName)
+    if songDifficulty is None or code < 0:
+        logger.warning(f'歌曲"{songName}"的{diff}定数不存在喵！')
+        return 0
+    if code >= len(songDifficulty):
+        logger.warning(f'歌曲"{songName}"可能存在旧谱记录喵！')
+        return 0
+    return songDifficulty[code]
+
+
+def computeRks(acc: np.ndarray, difficulty: np.ndarray) -> np.ndarray:
+    """
+    向量化计算等效rks喵（公式和countRks()完全一样喵：ACC不超过70时为0喵）
+
+    参数:
+        acc (np.ndarray): ACC列喵
+        difficulty (np.ndarray): 谱面定数列喵
+
+    返回:
+        (np.ndarray): 等效rks列喵
+    """
+    return np.where(acc > 70, ((acc - 55) / 45) ** 2 * difficulty, 0.0)
+
+
+def topIndices(
+    values: np.ndarray, count: int, mask: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    按values从高到低取前count个的下标喵（值相同时按原顺序，和稳定排序的结果一样喵）
+
+    先用argpartition找到第count大的值，只对不小于它的部分排序喵
+
+    参数:
+        values (np.ndarray): 用来排序的值喵(例如rks列喵)
+        count (int): 要取的个数喵
+        mask (np.ndarray | None): 只在这些位置里取喵。默认为None，表示全部喵
+
+    返回:
+        (np.ndarray): 下标数组喵
+    """
+    values = np.asarray(values)
+    rows = np.arange(len(values)) if mask is None else np.flatnonzero(mask)
+    if count <= 0 or rows.size == 0:
+        return rows[:0]
+
+    values = values[rows]
+    if count < rows.size:
+        kth = values[np.argpartition(-values, count - 1)[count - 1]]
+        keep = values >= kth
+        rows, values = rows[keep], values[keep]
+
+    # lexsort以最后一个键为主键喵：值降序，相同时下标升序喵
+    return rows[np.lexsort((rows, -values))][:count]
+
+
+class RecordTable:
+    """
+    gameRecord的列式表示喵
+
+    每条成绩是一行喵，按列存成NumPy数组喵：song(歌曲在names里的索引)、level(难度在levels里的索引)、score、acc、fc、difficulty(谱面定数)、rks喵。
+    levels前面是LEVELS，存档里有其他难度名称时追加在后面喵(这些难度没有定数喵)。
+    行的顺序和遍历gameRecord字典的顺序一样，所以排序结果和getBest()完全一致喵
+    """
+
+    def __init__(
+        self,
+        names: Sequence[str],
+        song: Sequence[int],
+        level: Sequence[int],
+        score: Sequence[int],
+        acc: Sequence[float],
+        fc: Sequence[int],
+        difficulty: Sequence[float],
+        rks: Optional[Sequence[float]] = None,
+        records: Optional[List[tuple]] = None,
+        levels: Sequence[str] = LEVELS,
+    ):
+        """
+        参数:
+            names (list[str]): 歌曲名列表喵
+            song / level / score / acc / fc / difficulty (序列): 各列数据喵
+            rks (序列 | None): 等效rks列喵。默认为None，此时用computeRks()计算喵
+            records (list[tuple[str, dict]] | None): 每一行对应的(难度名称, 原始成绩字典)喵（toRecord()会保留其中的其他字段喵）
+            levels (序列): 难度名称喵，level列是它的索引喵。默认为LEVELS喵
+        """
+        self.names = list(names)
+        self.levels = tuple(levels)
+        self.song = np.asarray(song, dtype=np.int32)
+        self.level = np.asarray(level, dtype=np.int8)
+        self.score = np.asarray(score, dtype=np.int32)
+        self.acc = np.asarray(acc, dtype=np.float64)
+        self.fc = np.asarray(fc, dtype=np.int8)
+        self.difficulty = np.asarray(difficulty, dtype=np.float64)
+        self.rks = (
+            computeRks(self.acc, self.difficulty)
+            if rks is None
+            else np.asarray(rks, dtype=np.float64)
+        )
+        self._records = records
+
+    def __len__(self) -> int:
+        return len(self.score)
+
+    @classmethod
+    def fromRecord(
+        cls, record_data: dict, difficulty: Dict[str, list]
+    ) -> "RecordTable":
+        """
+        从gameRecord/存档反序列化数据构建列式成绩表喵（相当于addDifficulty() + countRks()，但不会修改原数据喵）
+
+        参数:
+            record_data (dict): gameRecord/存档 反序列化数据喵
+            difficulty (dict[str, list]): 歌曲谱面定数数据喵
+
+        返回:
+            (RecordTable): 列式成绩表喵
+        """
+        if record_data.get("gameRecord") is not None and isinstance(
+            record_data["gameRecord"], dict
+        ):
+            gameRecord = record_data["gameRecord"]
+
+        else:
+            gameRecord = record_data
+
+        names, song, level, score, acc, fc, constants, records = (
+            [], [], [], [], [], [], [], [],
+        )
+        levels = list(LEVELS)
+        for songName, songRecord in gameRecord.items():
+            index = len(names)
+            names.append(songName)
+
+            for diff, record in songRecord.items():
+                code = _LEVEL_CODES.get(diff, -1)
+                song.append(index)
+                if code < 0:
+                    # 不认识的难度名称追加到levels后面喵，compact()之后也能还原名称喵
+                    if diff not in levels:
+                        levels.append(diff)
+                    level.append(levels.index(diff))
+                else:
+                    level.append(code)
+                score.append(record["score"])
+                acc.append(record["acc"])
+                fc.append(record["fc"])
+                constants.append(_lookupDifficulty(difficulty, songName, diff, code))
+                records.append((diff, record))
+
+        return cls(names, song, level, score, acc, fc, constants, records=records, levels=levels)
+
+    def withDifficulty(self, difficulty: Dict[str, list]) -> "RecordTable":
+        """
+        用另一份定数表重新计算定数和rks喵（返回新的成绩表，原来的不变喵）
+
+        参数:
+            difficulty (dict[str, list]): 歌曲谱面定数数据喵
+
+        返回:
+            (RecordTable): 新的列式成绩表喵
+        """
+        constants = [
+            _lookupDifficulty(
+                difficulty, self.names[song], self._levelName(row), code if code < len(LEVELS) else -1
+            )
+            for row, (song, code) in enumerate(zip(self.song.tolist(), self.level.tolist()))
+        ]
+        return RecordTable(
+            self.names, self.song, self.level, self.score, self.acc, self.fc,
+            constants, records=self._records, levels=self.levels,
+        )
+
+    def compact(self) -> "RecordTable":
+        """
+        去掉原始成绩字典，只保留各列喵（toRecord()改为从列生成，对解析出来的存档结果相同喵）
+
+        返回:
+            (RecordTable): 只有列的成绩表喵
+        """
+        return RecordTable(
+            self.names, self.song, self.level, self.score, self.acc, self.fc,
+            self.difficulty, rks=self.rks, levels=self.levels,
+        )
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        以NumPy数组返回所有列喵（可以直接用np.savez保存，读取时不需要pickle喵）
+
+        返回:
+            (dict[str, np.ndarray]): 各列数据喵
+        """
+        return {
+            "names": np.array(self.names, dtype=str),
+            "levels": np.array(self.levels, dtype=str),
+            "song": self.song,
+            "level": self.level,
+            "score": self.score,
+            "acc": self.acc,
+            "fc": self.fc,
+            "difficulty": self.difficulty,
+            "rks": self.rks,
+        }
+
+    @classmethod
+    def fromColumns(cls, columns: Dict[str, np.ndarray]) -> "RecordTable":
+        """
+        从columns()的结果恢复成绩表喵
+
+        参数:
+            columns (dict[str, np.ndarray]): 各列数据喵
+
+        返回:
+            (RecordTable): 列式成绩表喵
+        """
+        return cls(
+            columns["names"].tolist(), columns["song"], columns["level"],
+            columns["score"], columns["acc"], columns["fc"],
+            columns["difficulty"], rks=columns["rks"], levels=columns["levels"].tolist(),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        """成绩表大约占用的内存字节数喵"""
+        arrays = (self.song, self.level, self.score, self.acc, self.fc, self.difficulty, self.rks)
+        # 每个歌名字符串对象本身大约49字节喵
+        return sum(array.nbytes for array in arrays) + sum(len(name) + 49 for name in self.names)
+
+    def _levelName(self, row: int) -> str:
+        if self._records is not None:
+            return self._records[row][0]
+        return self.levels[self.level[row]]
+
+    def topIndices(self, count: int, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        按rks从高到低取前count行的行号喵（见topIndices()喵）
+
+        参数:
+            count (int): 要取的行数喵
+            mask (np.ndarray | None): 只在这些行里取喵。默认为None，表示全部行喵
+
+        返回:
+            (np.ndarray): 行号数组喵
+        """
+        return topIndices(self.rks, count, mask)
+
+    def toRecord(self, row: int) -> dict:
+        """
+        把一行转换成getBest()返回的成绩字典喵
+
+        参数:
+            row (int): 行号喵
+
+        返回:
+            (dict): 包含score、acc、fc、difficulty、rks、name、level的成绩字典喵
+        """
+        level = self._levelName(row)
+        if self._records is not None:
+            record = dict(self._records[row][1])
+        else:
+            record = {
+                "score": int(self.score[row]),
+                "acc": float(self.acc[row]),
+                "fc": int(self.fc[row]),
+            }
+        record["difficulty"] = float(self.difficulty[row])
+        record["rks"] = float(self.rks[row])
+        record["name"] = self.names[self.song[row]]
+        record["level"] = level
+        return record
+
+    def getBest(
+        self, phi_count: int = 3, best_count: int = 27
+    ) -> Dict[str, List[dict]]:
+        """
+        获取best成绩喵（结果和getBest()一样喵）
+
+        参数:
+            phi_count (int): 要返回phi榜的前几条成绩喵。默认为3喵
+            best_count (int): 要返回best榜的前几条成绩喵。默认为27喵
+
+        返回:
+            (dict[str, list[dict]]): best列表喵
+        """
+        phi_rows = self.topIndices(phi_count, self.score == 1000000)
+        mask = np.ones(len(self), dtype=bool)
+        mask[phi_rows] = False
+        best_rows = self.topIndices(best_count, mask)
+
+        return {
+            "phi": [self.toRecord(row) for row in phi_rows],
+            "best": [self.toRecord(row) for row in best_rows],
+        }
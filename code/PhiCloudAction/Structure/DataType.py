@@ -1,7 +1,7 @@
 # 萌新写的代码，可能不是很好，但是已经尽可能注释了，希望各位大佬谅解喵=v=
 # ----------------------- 导包区喵 -----------------------
 from struct import unpack, pack
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, Optional, Tuple, Union
 from ..logger import logger
 
 # ---------------------- 定义赋值区喵 ----------------------
@@ -52,6 +52,113 @@ class Bit:
         #     return data | (1 << index)
 
 
+class IntList(str):
+    """
+    整数列表喵
+
+    本身就是和str(list)完全一样的字符串喵（所以存档字典、JSON和原来的一模一样喵），
+    同时保存了解析好的整数(values)，写回存档时不需要再eval()喵。
+    和str一样是不可变的喵(BitFlags会被很多存档共用，不能让一个地方改掉所有存档的数据喵)
+    """
+
+    def __new__(cls, values):
+        values = tuple(values)
+        obj = super().__new__(cls, str(list(values)))
+        object.__setattr__(obj, "_values", values)
+        return obj
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__}是不可变的喵！")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__}是不可变的喵！")
+
+    @property
+    def values(self) -> Tuple[int, ...]:
+        """解析好的整数喵(只读喵)"""
+        return self._values
+
+    def __getnewargs__(self):
+        # pickle/deepcopy时用整数重新构建喵(默认会把字符串传给__new__喵)
+        return (self.values,)
+
+    @classmethod
+    def parse(cls, value: Union[str, list, tuple]) -> "IntList":
+        """
+        把"[1, 0, 1]"这样的字符串(或者整数列表)转换成IntList喵，不使用eval()喵
+
+        参数:
+            value (str | list | tuple): 整数列表或者它的字符串形式喵
+
+        返回:
+            (IntList): 解析后的整数列表喵
+        """
+        if isinstance(value, cls):
+            return value
+
+        if isinstance(value, (list, tuple)):
+            return cls(value)
+
+        if isinstance(value, str):
+            text = value.strip()
+            if text.startswith("[") and text.endswith("]"):
+                try:
+                    return cls(int(i) for i in text[1:-1].split(",") if i.strip())
+                except ValueError:
+                    pass
+
+        raise TypeError(f'传入的值不能够被解析为list喵！而被解析为："{value!r}"')
+
+
+class BitFlags(IntList):
+    """
+    比特位列表喵（Bits / Bits[n] 的读取结果喵）
+
+    字符串形式和原来的str(list)一样喵(例如"[1, 0, 1, 0, 1]"喵)，同时可以直接用mask(整数)和bit()读取比特位喵
+    """
+
+    _cache: Dict[tuple, "BitFlags"] = {}
+
+    @property
+    def mask(self) -> int:
+        """所有比特位组成的整数喵(第0位是最低位喵)"""
+        mask = 0
+        for index, bit in enumerate(self.values):
+            mask |= (bit & 1) << index
+        return mask
+
+    def bit(self, index: int) -> int:
+        """
+        读取指定索引的比特位喵
+
+        参数:
+            index (int): 比特位索引喵
+
+        返回:
+            (int): 1 或 0 喵
+        """
+        return self.values[index]
+
+    @classmethod
+    def fromByte(cls, byte: int, length: int = 8) -> "BitFlags":
+        """
+        从一个字节读取前length个比特位喵（相同的结果会复用同一个对象喵）
+
+        参数:
+            byte (int): 字节值喵
+            length (int): 比特位数量喵。默认为8喵
+
+        返回:
+            (BitFlags): 比特位列表喵
+        """
+        flags = cls._cache.get((byte, length))
+        if flags is None:
+            flags = cls._cache[(byte, length)] = cls(
+                Bit.read(byte, i) for i in range(length)
+            )
+        return flags
+
+
 class Bits(dataTypeAbstract):
     """比特位喵 (1字节喵)"""
 
@@ -67,40 +174,22 @@ class Bits(dataTypeAbstract):
         返回:
             (tuple[str, int]): 包含每个比特位的值 (1 或 0) 的列表以及下一个字节的位置喵
         """
-        bits: list[int] = []
-        for i in range(8):  # 一个字节有8位
-            bit = Bit.read(data[pos], i)
-            bits.append(bit)
-
-        return str(bits), pos + 1
+        # 一个字节有8位喵，结果的字符串形式和原来的str(list)一样喵
+        return BitFlags.fromByte(data[pos], 8), pos + 1
 
     @staticmethod
-    def write(data: bytearray, value: str) -> bytearray:
+    def write(data: bytearray, value: Union[str, list]) -> bytearray:
         """
         根据给定的比特位值列表构建一个整数喵
 
         参数:
             data (bytearray): 存储结果的字节数组喵
-            value (list[int]): 每个比特位的值 (1 或 0) 的列表喵
+            value (BitFlags | str | list[int]): 每个比特位的值 (1 或 0) 的列表喵(或者它的字符串形式喵)
 
         返回:
             (bytearray): 更新后的数据序列喵
         """
-        _value: type = eval(value)
-
-        if not isinstance(_value, list):
-            raise TypeError(
-                f'传入的值不能够被解析为list喵！而被解析为："{_value.__class__.__name__}"'
-            )
-
-        byte = 0
-        if len(_value) < 8:
-            _value.extend([0] * (8 - len(_value)))
-
-        for i, bit in enumerate(_value):
-            byte = Bit.write(byte, i, bit)
-
-        data.append(byte)
+        data.append(BitFlags.parse(value).mask)
         return data
 
     @staticmethod
@@ -126,41 +215,21 @@ class _Bits(dataTypeAbstract):
         返回:
             (str, int]): 包含每个比特位的值 (1 或 0) 的列表以及下一个字节的位置喵
         """
-        bits: list[int] = []
-        for i in range(self._len):
-            bit = Bit.read(data[pos], i)
-            bits.append(bit)
-
-        return str(bits), pos + 1
+        return BitFlags.fromByte(data[pos], self._len), pos + 1
 
     @staticmethod
-    def write(data: bytearray, value: str) -> bytearray:
+    def write(data: bytearray, value: Union[str, list]) -> bytearray:
         """
         根据给定的比特位值列表构建一个整数喵
 
         参数:
             data (bytearray): 存储结果的字节数组喵
-            value (str): 每个比特位的值 (1 或 0) 的列表喵
+            value (BitFlags | str | list[int]): 每个比特位的值 (1 或 0) 的列表喵(或者它的字符串形式喵)
 
         返回:
             (bytearray): 更新后的数据序列喵
         """
-        _value: type = eval(value)
-
-        if not isinstance(_value, list):
-            raise TypeError(
-                f'传入的值不能够被解析为list喵！而被解析为："{_value.__class__.__name__}"'
-            )
-
-        byte = 0
-
-        if len(_value) < 8:
-            _value.extend([0] * (8 - len(_value)))
-
-        for i, bit in enumerate(_value):
-            byte = Bit.write(byte, i, bit)
-
-        data.append(byte)
+        data.append(BitFlags.parse(value).mask)
         return data
 
 
@@ -367,7 +436,8 @@ class String(dataTypeAbstract):
         string_len, pos = VarInt.read(
             data, pos
         )  # 读当前位置的变长整数喵，代表后续字节长度喵
-        string_val = data[pos : pos + string_len].decode()  # 读取一段字节并uft-8解码喵
+        # 读取一段字节并uft-8解码喵(用str()而不是.decode()，这样data也可以是memoryview喵)
+        string_val = str(data[pos : pos + string_len], "utf-8")
 
         return string_val, pos + string_len  # 返回读取到的数据喵
 
@@ -403,7 +473,7 @@ class GameKey(dataTypeAbstract):
             length = reader.type_read(Byte)
             one_key = all_keys[name] = {}  # 存储单个key的数据喵
             # 获取key的状态标志喵(收藏品阅读、单曲解锁、收藏品、背景、头像喵)
-            one_key["type"] = str((reader.type_read(Bits[5])))
+            one_key["type"] = reader.type_read(Bits[5])
 
             # 用来存储该key的标记喵(长度与type中1的数量一致，每位值相同，与收藏品碎片收集有关，默认为1喵)
             flag = []
@@ -411,7 +481,7 @@ class GameKey(dataTypeAbstract):
             for _ in range(length - 1):
                 flag_value, reader.pos = Byte.read(data, reader.pos)
                 flag.append(flag_value)
-            one_key["flag"] = str(flag)
+            one_key["flag"] = IntList(flag)
 
         return all_keys, reader.pos
 
@@ -422,11 +492,12 @@ class GameKey(dataTypeAbstract):
         writer.type_write(VarInt, len(value))
 
         for keys in value.items():
+            flags = IntList.parse(keys[1]["flag"]).values
             writer.type_write(String, keys[0])
-            writer.type_write(Byte, len(eval(keys[1]["flag"])) + 1)
+            writer.type_write(Byte, len(flags) + 1)
             writer.type_write(Bits, keys[1]["type"])
 
-            for flag in eval(keys[1]["flag"]):
+            for flag in flags:
                 writer.type_write(Byte, flag)
 
         return writer.get_data()
@@ -502,8 +573,8 @@ class GameRecord(dataTypeAbstract):
 
             # 这行不是冗余代码啊喵！本喵这样子写是有原因的！
             writer.type_write(VarInt, len(song) * (4 + 4) + 1 + 1)
-            unlock = eval(Bits.read(b"\x00", 0)[0])
-            fc = eval(Bits.read(b"\x00", 0)[0])
+            unlock = [0] * 8
+            fc = [0] * 8
             record_writer = Writer()
             for diff, index in diff_list.items():
                 if song.get(diff) is not None:
@@ -512,8 +583,8 @@ class GameRecord(dataTypeAbstract):
                     record_writer.type_write(Float, song[diff]["acc"])
                     fc[index] = song[diff]["fc"]
 
-            writer.type_write(Bits, str(unlock))
-            writer.type_write(Bits, str(fc))
+            writer.type_write(Bits, unlock)
+            writer.type_write(Bits, fc)
             writer.type_write(Byte, record_writer.get_data())
 
         return writer.get_data()
@@ -537,12 +608,12 @@ class Summary(dataTypeAbstract):
 class Reader:
     """反序列化存档数据的操作类喵"""
 
-    def __init__(self, data: Union[bytes, bytearray], pos: int = 0):
+    def __init__(self, data: Union[bytes, bytearray, memoryview], pos: int = 0):
         """
         反序列化存档数据的操作类喵
 
         参数:
-            data (bytes | bytearray): 要读取的二进制数据喵
+            data (bytes | bytearray | memoryview): 要读取的二进制数据喵
             pos (int): 当前读写位置喵。默认为 0 喵
         """
         self.data = data
@@ -0,0 +1,317 @@
+# ----------------------- 导包区喵 -----------------------
+from struct import Struct
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from .DataType import (
+    Bit,
+    BitFlags,
+    Bits,
+    Byte,
+    Float,
+    GameKey,
+    GameRecord,
+    IntList,
+    Int,
+    Money,
+    ShortInt,
+    String,
+    Summary,
+    VarInt,
+    _Bits,
+    dataTypeAbstract,
+)
+from ..logger import logger
+
+# ---------------------- 定义赋值区喵 ----------------------
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# 定长类型对应的struct格式喵（全部是小端喵）
+_FIXED_FORMATS = {Byte: "B", ShortInt: "H", Int: "I", Float: "f"}
+
+# Bits / Bits[n] 的结果是BitFlags喵，按(长度, 字节值)提前算好喵
+_BITS_TABLES: Dict[int, List[BitFlags]] = {}
+
+_SCORE = Struct("<If")  # 单个难度的成绩喵：分数(Int) + ACC(Float)
+_DIFFICULTIES = ("EZ", "HD", "IN", "AT", "Legacy")
+
+
+def _bitsTable(length: int) -> List[BitFlags]:
+    table = _BITS_TABLES.get(length)
+    if table is None:
+        table = _BITS_TABLES[length] = [
+            BitFlags.fromByte(byte, length) for byte in range(256)
+        ]
+    return table
+
+
+def _readVarInt(data: Buffer, pos: int) -> Tuple[int, int]:
+    value = data[pos]
+    if value > 127:
+        return (value & 0b01111111) ^ (data[pos + 1] << 7), pos + 2
+    return value, pos + 1
+
+
+def _readString(data: Buffer, pos: int) -> Tuple[str, int]:
+    length, pos = _readVarInt(data, pos)
+    end = pos + length
+    return str(data[pos:end], "utf-8"), end
+
+
+def _readMoney(data: Buffer, pos: int) -> Tuple[list, int]:
+    money = []
+    for _ in range(5):
+        value, pos = _readVarInt(data, pos)
+        money.append(value)
+    return money, pos
+
+
+_SUMMARY = Struct("<HHH")
+
+
+def _readSummary(data: Buffer, pos: int) -> Tuple[list, int]:
+    return list(_SUMMARY.unpack_from(data, pos)), pos + 6
+
+
+def readGameRecord(data: Buffer, pos: int = 0) -> Tuple[Dict[str, dict], int]:
+    """
+    解析gameRecord喵（结果和GameRecord.read()完全一样喵）
+
+    每首歌只解析一次歌名和长度，每个已解锁难度的分数和ACC用同一个struct一次读出来喵
+
+    参数:
+        data (bytes | bytearray | memoryview): 解密后的gameRecord数据喵
+        pos (int): 开始位置喵
+
+    返回:
+        (tuple[dict, int]): 成绩数据和结束位置喵
+    """
+    unpack = _SCORE.unpack_from
+    all_record = {}
+
+    song_sum, pos = _readVarInt(data, pos)
+    for _ in range(song_sum):
+        # 歌名喵(去掉结尾的".0"喵)
+        length = data[pos]
+        if length > 127:
+            length = (length & 0b01111111) ^ (data[pos + 1] << 7)
+            pos += 2
+        else:
+            pos += 1
+        song_name = str(data[pos : pos + length], "utf-8")[:-2]
+        pos += length
+
+        # 数据总长度喵(不包括歌名喵)
+        length = data[pos]
+        if length > 127:
+            length = (length & 0b01111111) ^ (data[pos + 1] << 7)
+            pos += 2
+        else:
+            pos += 1
+        end_position = pos + length
+
+        unlock = data[pos]
+        fc = data[pos + 1]
+        pos += 2
+
+        song = all_record[song_name] = {}
+        for level in range(5):
+            if (unlock >> level) & 1:
+                score, acc = unpack(data, pos)
+                pos += 8
+                song[_DIFFICULTIES[level]] = {
+                    "score": score,
+                    "acc": acc,
+                    "fc": (fc >> level) & 1,
+                }
+
+        if pos != end_position:
+            logger.error(f'在读取"{song_name}"的数据时发生错误喵！当前位置：{pos}')
+            logger.error(f"错误喵！！！当前读取字节位置不正确喵！应为：{end_position}")
+
+    return all_record, pos
+
+
+def readGameKey(data: Buffer, pos: int = 0) -> Tuple[Dict[str, dict], int]:
+    """
+    解析gameKey的keyList喵（结果和GameKey.read()完全一样喵）
+
+    参数:
+        data (bytes | bytearray | memoryview): 解密后的gameKey数据喵
+        pos (int): 开始位置喵
+
+    返回:
+        (tuple[dict, int]): 所有key的数据和结束位置喵
+    """
+    types = _bitsTable(5)
+    flags: Dict[bytes, IntList] = {}  # 大部分key的flag都一样喵，相同的flag共用一个对象喵
+    all_keys = {}
+
+    key_sum, pos = _readVarInt(data, pos)
+    for _ in range(key_sum):
+        name, pos = _readString(data, pos)
+        # 总数据长度喵(包括1字节的type喵)
+        length = data[pos]
+        end = pos + 1 + length
+        flag_bytes = bytes(data[pos + 2 : end])
+        flag = flags.get(flag_bytes)
+        if flag is None:
+            flag = flags[flag_bytes] = IntList(flag_bytes)
+        all_keys[name] = {"type": types[data[pos + 1]], "flag": flag}
+        pos = end
+
+    return all_keys, pos
+
+
+# 有专门的快速解析函数的数据类型喵，其他自定义类型直接调用它们自己的read()喵
+_FAST_READERS: Dict[Any, Callable[[Buffer, int], Tuple[Any, int]]] = {
+    GameRecord: readGameRecord,
+    GameKey: readGameKey,
+    VarInt: _readVarInt,
+    String: _readString,
+    Money: _readMoney,
+    Summary: _readSummary,
+}
+
+Step = Callable[[Buffer, int, dict], int]
+
+
+def _fixedStep(keys: Tuple[str, ...], formats: str) -> Step:
+    compiled = Struct("<" + formats)
+    unpack = compiled.unpack_from
+    size = compiled.size
+
+    def step(data, pos, out):
+        out.update(zip(keys, unpack(data, pos)))
+        return pos + size
+
+    return step
+
+
+def _bitStep(keys: Tuple[str, ...]) -> Step:
+    # 连续的Bit字段共用一个字节喵（和Reader的行为一样，超过8个时后面的都是0喵）
+    def step(data, pos, out):
+        byte = data[pos]
+        for index, key in enumerate(keys):
+            out[key] = (byte >> index) & 1
+        return pos + 1
+
+    return step
+
+
+def _bitsStep(key: str, length: int) -> Step:
+    table = _bitsTable(length)
+
+    def step(data, pos, out):
+        out[key] = table[data[pos]]
+        return pos + 1
+
+    return step
+
+
+def _readerStep(key: str, read: Callable[[Buffer, int], Tuple[Any, int]]) -> Step:
+    def step(data, pos, out):
+        out[key], pos = read(data, pos)
+        return pos
+
+    return step
+
+
+class DecodePlan:
+    """
+    预编译的结构解析计划喵
+
+    按结构类的字段顺序编译一次喵：连续的定长字段合并成一个struct.Struct，连续的Bit字段一次读一个字节，
+    Bits / Bits[n] 查表得到结果喵。解析结果和Reader.parseStructure()完全一样喵
+    """
+
+    def __init__(self, structure):
+        self.name = structure.__name__
+        self.steps: List[Step] = []
+        self.read = None  # 结构本身就是数据类型时(例如GameRecord)的解析函数喵
+
+        if isinstance(structure(), dataTypeAbstract):
+            self.read = _FAST_READERS.get(structure, structure().read)
+            return
+
+        fixed_keys: List[str] = []
+        fixed_formats: List[str] = []
+        bit_keys: List[str] = []
+
+        def flush():
+            if fixed_keys:
+                self.steps.append(_fixedStep(tuple(fixed_keys), "".join(fixed_formats)))
+                fixed_keys.clear()
+                fixed_formats.clear()
+            if bit_keys:
+                self.steps.append(_bitStep(tuple(bit_keys)))
+                bit_keys.clear()
+
+        for key, type_obj in structure.__annotations__.items():
+            if type_obj is Bit:
+                if fixed_keys:
+                    flush()
+                bit_keys.append(key)
+                continue
+
+            if bit_keys:
+                flush()
+
+            if type_obj in _FIXED_FORMATS:
+                fixed_keys.append(key)
+                fixed_formats.append(_FIXED_FORMATS[type_obj])
+                continue
+
+            flush()
+            if type_obj is Bits:
+                self.steps.append(_bitsStep(key, 8))
+            elif isinstance(type_obj, _Bits):
+                self.steps.append(_bitsStep(key, type_obj._len))
+            else:
+                self.steps.append(_readerStep(key, _FAST_READERS.get(type_obj, type_obj.read)))
+
+        flush()
+
+    def decode(self, data: Buffer, pos: int = 0) -> Tuple[Any, int]:
+        """
+        按计划解析数据喵
+
+        返回:
+            (tuple[Any, int]): 解析结果和结束位置喵
+        """
+        if self.read is not None:
+            return self.read(data, pos)
+
+        out: Dict[str, Any] = {}
+        for step in self.steps:
+            pos = step(data, pos, out)
+        return out, pos
+
+    def parse(self, data: Buffer) -> Any:
+        """解析整段数据喵（和Reader(data).parseStructure(structure)一样，会检查有没有剩余字节喵）"""
+        result, pos = self.decode(data)
+        remaining = len(data) - pos
+        if remaining == 0:
+            logger.debug(f'结构"{self.name}"读取完毕喵！剩余{remaining}字节喵！')
+        else:
+            logger.error(f'结构"{self.name}"尚未读取完毕喵！剩余{remaining}字节喵！')
+        return result
+
+
+_PLANS: Dict[Any, DecodePlan] = {}
+
+
+def compilePlan(structure) -> DecodePlan:
+    """
+    获取结构类的解析计划喵（每个结构类只编译一次喵）
+
+    参数:
+        structure (class): 数据结构类喵(例如gameProgress04、summary、GameRecord)
+
+    返回:
+        (DecodePlan): 解析计划喵
+    """
+    plan = _PLANS.get(structure)
+    if plan is None:
+        plan = _PLANS[structure] = DecodePlan(structure)
+    return plan
@@ -8,6 +8,7 @@ from .gameProgress import *
 from .settings import *
 from .user import *
 from .summary import *
+from .DecodePlan import DecodePlan, compilePlan, readGameKey, readGameRecord
 
 # ---------------------- 定义赋值区喵 ----------------------
 
@@ -1,4 +1,15 @@
 from .ActionLib import *
-from .CloudAction import PhigrosCloud, PigeonRequest
+from .CloudAction import (
+    CircuitBreaker,
+    CircuitOpenError,
+    PhigrosCloud,
+    PigeonRequest,
+    PooledSession,
+    RequestTracing,
+    getSharedSession,
+    setRequestHook,
+)
+from .LazySave import LazySave
 from .logger import logger
+from .RecordTable import RecordTable, topIndices
 from .Structure import headGetStructure, getFileHead
\ No newline at end of file
@@ -3,6 +3,7 @@
 from datetime import datetime
 from time import time
 from logging import (
+    getLevelName,
     getLogger,
     INFO,
     DEBUG,
@@ -10,7 +11,7 @@ from logging import (
     FileHandler,
     Formatter,
 )
-from os import mkdir
+from os import environ, mkdir
 from os.path import join, exists
 from typing import Optional
 import sys
@@ -87,5 +88,10 @@ def get_logger(name: Optional[str] = None, level: int = INFO):
 
 # ----------------------- 运行区喵 -----------------------
 
-logger = get_logger("PCA", DEBUG)
+# 控制台日志级别喵，可以用环境变量PCA_LOG_LEVEL修改喵(例如WARNING，压测时不输出DEBUG日志喵)
+CONSOLE_LEVEL = getLevelName(environ.get("PCA_LOG_LEVEL", "DEBUG").upper())
+if not isinstance(CONSOLE_LEVEL, int):
+    CONSOLE_LEVEL = DEBUG
+
+logger = get_logger("PCA", CONSOLE_LEVEL)
 logger.debug("Logger 加载完成喵")
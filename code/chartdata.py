@@ -0,0 +1,147 @@
+import gzip
+import json
+import os
+import threading
+
+DIFFICULTIES = ('ez', 'hd', 'in', 'at')
+# 每个难度下的字段（见 counts.py 生成的 chartData.json）
+DIFFICULTY_FIELDS = ('level', 'notes', 'tap', 'hold', 'drag', 'flick', 'charter', 'duration')
+RESPONSE_MESSAGE = "谱面数据获取成功"
+
+
+def _split(value):
+    """把逗号分隔的查询参数拆成列表，空值返回 None"""
+    if not value:
+        return None
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    return items or None
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ChartTable:
+    """
+    常驻内存的谱面数据表（chartData.json）
+
+    按文件的修改时间和大小判断是否需要重新读取，每次请求只做一次 stat。
+    不带筛选条件的完整响应（普通和 gzip 两种）在加载时编码一次，之后直接返回同一份字节。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self.data = None
+        self.version = None
+        self._body = None
+        self._gzip_body = None
+
+    def _current(self):
+        """返回最新的 (数据, 版本号)，文件变化时重新加载；文件不存在时抛出 FileNotFoundError"""
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._load(signature)
+        return self.data, self.version
+
+    def _load(self, signature):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        body = json.dumps({"code": 200, "message": RESPONSE_MESSAGE, "data": data},
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._body = body
+        self._gzip_body = gzip.compress(body, compresslevel=9)
+        self.data = data
+        self.version = f"{signature[0]:x}-{signature[1]:x}"
+        self._signature = signature
+
+    def get_all(self):
+        """完整的谱面数据字典（共享对象，不能修改）"""
+        return self._current()[0]
+
+    def full_response(self, use_gzip=False):
+        """
+        不带筛选条件时的完整响应体
+
+        返回:
+            (bytes, str): 响应体（use_gzip 为 True 时为 gzip 压缩后的数据）和版本号
+        """
+        self._current()
+        with self._lock:
+            return (self._gzip_body if use_gzip else self._body), self.version
+
+    def query(self, song_ids=None, difficulties=None, level_min=None, level_max=None,
+              charter=None, composer=None, fields=None):
+        """
+        按条件筛选谱面数据
+
+        参数均为查询参数原样的字符串（None 表示不筛选）：
+            song_ids: 歌曲ID，逗号分隔
+            difficulties: 难度（ez/hd/in/at），逗号分隔，只保留这些难度
+            level_min / level_max: 定数范围，只保留定数在范围内的难度
+            charter: 谱师（不区分大小写的子串匹配），只保留匹配的难度
+            composer: 曲师（不区分大小写的子串匹配）
+            fields: 返回的字段，逗号分隔；可以是歌曲字段（name/composer/ill）或难度字段（level/notes/charter 等）
+
+        设置了难度相关的筛选条件时，没有任何难度满足条件的歌曲不会出现在结果中
+        """
+        data = self.get_all()
+
+        ids = _split(song_ids)
+        if ids is not None:
+            candidates = ((song_id, data[song_id]) for song_id in ids if song_id in data)
+        else:
+            candidates = data.items()
+
+        wanted_difficulties = _split(difficulties)
+        wanted_difficulties = tuple(d.lower() for d in wanted_difficulties) if wanted_difficulties else DIFFICULTIES
+        low = _to_float(level_min)
+        high = _to_float(level_max)
+        charter = charter.lower() if charter else None
+        composer = composer.lower() if composer else None
+        filter_difficulty = (wanted_difficulties != DIFFICULTIES or low is not None
+                             or high is not None or charter is not None)
+
+        projection = _split(fields)
+        song_fields = difficulty_fields = None
+        if projection is not None:
+            song_fields = [f for f in projection if f not in DIFFICULTY_FIELDS and f not in DIFFICULTIES]
+            difficulty_fields = [f for f in projection if f in DIFFICULTY_FIELDS]
+
+        result = {}
+        for song_id, song in candidates:
+            if composer is not None and composer not in str(song.get('composer', '')).lower():
+                continue
+
+            charts = {}
+            for difficulty in wanted_difficulties:
+                chart = song.get(difficulty)
+                if not isinstance(chart, dict):
+                    continue
+                if low is not None or high is not None:
+                    level = _to_float(chart.get('level'))
+                    if level is None or (low is not None and level < low) or (high is not None and level > high):
+                        continue
+                if charter is not None and charter not in str(chart.get('charter', '')).lower():
+                    continue
+                charts[difficulty] = chart
+            if filter_difficulty and not charts:
+                continue
+
+            if projection is None:
+                entry = {key: value for key, value in song.items() if key not in DIFFICULTIES}
+                entry.update(charts)
+            else:
+                entry = {key: song[key] for key in song_fields if key in song}
+                if difficulty_fields:
+                    for difficulty, chart in charts.items():
+                        entry[difficulty] = {key: chart[key] for key in difficulty_fields if key in chart}
+            result[song_id] = entry
+        return result
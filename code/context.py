@@ -0,0 +1,45 @@
+import os
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class CodeContext:
+    """
+    查分模块使用的资源路径（全部解析为绝对路径）
+
+    以前通过 os.chdir 切换到 code 目录来保证相对路径可用，但工作目录是进程全局的，
+    多个请求线程同时切换会互相干扰。现在所有路径都从这里取，不再依赖当前工作目录。
+    """
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or CODE_DIR)
+        self.info_dir = os.path.join(self.root, "info")
+        self.difficulty_file = os.path.join(self.info_dir, "difficulty.tsv")
+        self.info_file = os.path.join(self.info_dir, "info.tsv")
+        self.illustration_dir = os.path.join(self.root, "illustration")
+        self.save_history_dir = os.path.join(self.root, "saveHistory")
+        self.chart_dir = os.path.join(self.root, "chart")
+        self.chart_data_file = os.path.join(self.root, "chartData.json")
+        self.save_dump_file = os.path.join(self.root, "PhigrosSave.json")
+        self.image_cache_dir = os.path.join(self.root, "imageCache")
+        self.save_cache_dir = os.path.join(self.root, "saveCache")
+        self.font_dir = self.root
+
+    def path(self, *parts):
+        """拼接 code 目录下的路径"""
+        return os.path.join(self.root, *parts)
+
+    def difficulty_path(self):
+        """返回定数表路径，code/info 下没有时返回 None，交给 PhiCloudAction 使用自带的定数表"""
+        if os.path.exists(self.difficulty_file):
+            return self.difficulty_file
+        return None
+
+    def font_candidates(self, font_name):
+        """字体查找顺序：先找 code 目录下的字体文件，再交给 Pillow 在系统字体目录中查找"""
+        if os.path.isabs(font_name):
+            return [font_name]
+        return [os.path.join(self.font_dir, font_name), font_name]
+
+
+default_context = CodeContext()
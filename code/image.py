@@ -3,6 +3,7 @@ import random
 import os
 import textwrap
 import math
+from context import default_context
 
 def calculate_single_rks(acc, level):
     """计算单曲RKS - acc已经是百分数"""
@@ -88,43 +89,101 @@ def parse_xml_background(xml_content, img_width, img_height):
     except:
         return None
 
-def draw_B_image(B_content, userdata, name, text=None, xml=None):
+# 尝试加载中文字体
+FONT_PATHS = [
+    "msyh.ttc",  # 微软雅黑
+    "simhei.ttf",  # 黑体
+    "simsun.ttc",  # 宋体
+    "arial.ttf",   # 英文字体作为备选
+    "/System/Library/Fonts/PingFang.ttc"  # macOS 苹方
+]
+
+def find_font_file(context=None):
+    """按 FONT_PATHS 的顺序查找第一个可用的字体文件，找不到时返回 None"""
+    if context is None:
+        context = default_context
+    for font_name in FONT_PATHS:
+        for font_path in context.font_candidates(font_name):
+            try:
+                ImageFont.truetype(font_path, 12)
+                return font_path
+            except:
+                continue
+    return None
+
+def load_song_names(context=None):
+    """读取info.tsv文件获取曲名映射"""
+    if context is None:
+        context = default_context
+    song_name_mapping = {}
+    tsv_path = context.info_file
+    if os.path.exists(tsv_path):
+        try:
+            with open(tsv_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    parts = line.strip().split('\t')
+                    if len(parts) >= 2:
+                        song_id = parts[0]
+                        display_name = parts[1]
+                        song_name_mapping[song_id] = display_name
+        except Exception as e:
+            print(f"读取info.tsv失败: {e}")
+    return song_name_mapping
+
+def list_backgrounds(context=None):
+    """列出可用作背景的曲绘文件名"""
+    if context is None:
+        context = default_context
+    background_path = context.illustration_dir
+    if not os.path.exists(background_path):
+        return []
+    try:
+        return sorted(f for f in os.listdir(background_path) if f.endswith(('.png', '.jpg', '.jpeg')))
+    except OSError:
+        return []
+
+def load_render_assets(context=None):
+    """
+    预加载出图需要的字体路径、曲名映射和背景列表
+
+    这些数据只在更新资源后才会变化，常驻服务启动时加载一次，之后每次出图直接复用
+    """
+    return {
+        "font_file": find_font_file(context),
+        "song_names": load_song_names(context),
+        "backgrounds": list_backgrounds(context),
+    }
+
+def draw_B_image(B_content, userdata, name, text=None, xml=None, context=None, assets=None, seed=None):
+    # 曲绘、曲名表和字体都从 context 给出的绝对路径读取，不依赖当前工作目录
+    # 传入 seed 时背景选择是确定的，同样的输入总是生成同样的图片（用于图片缓存）
+    if context is None:
+        context = default_context
+    if assets is None:
+        assets = load_render_assets(context)
+    
     # 创建图片 - 增加高度避免裁剪水印
     img_width = 1200
     img_height = 3000  # 进一步增加高度确保水印不被裁剪
     img = Image.new('RGB', (img_width, img_height), color=(30, 30, 30))
     draw = ImageDraw.Draw(img)
     
-    # 尝试加载中文字体
-    font_paths = [
-        "msyh.ttc",  # 微软雅黑
-        "simhei.ttf",  # 黑体
-        "simsun.ttc",  # 宋体
-        "arial.ttf",   # 英文字体作为备选
-        "/System/Library/Fonts/PingFang.ttc"  # macOS 苹方
-    ]
-    
     title_font = None
     header_font = None
     normal_font = None
     small_font = None
     tiny_font = None
+    font_file = assets["font_file"]
     
-    for font_path in font_paths:
+    if font_file:
         try:
-            if title_font is None:
-                title_font = ImageFont.truetype(font_path, 36)
-            if header_font is None:
-                header_font = ImageFont.truetype(font_path, 24)
-            if normal_font is None:
-                normal_font = ImageFont.truetype(font_path, 20)
-            if small_font is None:
-                small_font = ImageFont.truetype(font_path, 16)
-            if tiny_font is None:
-                tiny_font = ImageFont.truetype(font_path, 12)
-            break
+            title_font = ImageFont.truetype(font_file, 36)
+            header_font = ImageFont.truetype(font_file, 24)
+            normal_font = ImageFont.truetype(font_file, 20)
+            small_font = ImageFont.truetype(font_file, 16)
+            tiny_font = ImageFont.truetype(font_file, 12)
         except:
-            continue
+            title_font = None
     
     # 如果都没找到，使用默认字体
     if title_font is None:
@@ -134,23 +193,10 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
         small_font = ImageFont.load_default()
         tiny_font = ImageFont.load_default()
     
-    # 读取info.tsv文件获取曲名映射
-    song_name_mapping = {}
-    tsv_path = "info/info.tsv"
-    if os.path.exists(tsv_path):
-        try:
-            with open(tsv_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    parts = line.strip().split('\t')
-                    if len(parts) >= 2:
-                        song_id = parts[0]
-                        display_name = parts[1]
-                        song_name_mapping[song_id] = display_name
-        except Exception as e:
-            print(f"读取info.tsv失败: {e}")
+    song_name_mapping = assets["song_names"]
     
     # 设置背景图片 - 支持XML自定义
-    background_path = "illustration"
+    background_path = context.illustration_dir
     custom_bg = None
     
     if xml:
@@ -159,20 +205,19 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
     if custom_bg:
         # 使用XML自定义背景
         img.paste(custom_bg, (0, 0))
-    elif os.path.exists(background_path):
+    elif assets["backgrounds"]:
         try:
-            bg_files = [f for f in os.listdir(background_path) if f.endswith(('.png', '.jpg', '.jpeg'))]
-            if bg_files:
-                bg_file = random.choice(bg_files)
-                bg_image = Image.open(os.path.join(background_path, bg_file))
-                # 调整背景图片大小并模糊
-                bg_image = bg_image.resize((img_width, img_height))
-                bg_image = bg_image.filter(ImageFilter.GaussianBlur(10))
-                # 创建半透明黑色遮罩
-                overlay = Image.new('RGBA', (img_width, img_height), (0, 0, 0, 180))
-                img.paste(bg_image, (0, 0))
-                img.paste(overlay, (0, 0), overlay)
-                draw = ImageDraw.Draw(img)
+            rng = random.Random(seed) if seed is not None else random
+            bg_file = rng.choice(assets["backgrounds"])
+            bg_image = Image.open(os.path.join(background_path, bg_file))
+            # 调整背景图片大小并模糊
+            bg_image = bg_image.resize((img_width, img_height))
+            bg_image = bg_image.filter(ImageFilter.GaussianBlur(10))
+            # 创建半透明黑色遮罩
+            overlay = Image.new('RGBA', (img_width, img_height), (0, 0, 0, 180))
+            img.paste(bg_image, (0, 0))
+            img.paste(overlay, (0, 0), overlay)
+            draw = ImageDraw.Draw(img)
         except:
             pass
     
@@ -297,7 +342,7 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
                 
                 # 尝试加载歌曲图片 - 保持2048:1080比例
                 song_id = phi_song.get('id', '')
-                song_image_path = f"illustration/{song_id}.png"
+                song_image_path = os.path.join(context.illustration_dir, f"{song_id}.png")
                 song_img_loaded = None
                 if os.path.exists(song_image_path):
                     try:
@@ -353,7 +398,7 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
                 while name_text_width > info_width - 10 and name_font_size > 10:
                     name_font_size -= 1
                     try:
-                        name_font = ImageFont.truetype(font_paths[0] if font_paths else "arial.ttf", name_font_size)
+                        name_font = ImageFont.truetype(font_file or "arial.ttf", name_font_size)
                     except:
                         name_font = ImageFont.load_default()
                     name_bbox = draw.textbbox((0, 0), display_name, font=name_font)
@@ -372,7 +417,7 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
                 while id_text_width > info_width - 10 and id_font_size > 6:
                     id_font_size -= 1
                     try:
-                        id_font = ImageFont.truetype(font_paths[0] if font_paths else "arial.ttf", id_font_size)
+                        id_font = ImageFont.truetype(font_file or "arial.ttf", id_font_size)
                     except:
                         id_font = ImageFont.load_default()
                     id_bbox = draw.textbbox((0, 0), song_id, font=id_font)
@@ -446,7 +491,7 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
                 
                 # 歌曲图片 - 保持2048:1080比例
                 song_id = song_data.get('id', '')
-                song_image_path = f"illustration/{song_id}.png"
+                song_image_path = os.path.join(context.illustration_dir, f"{song_id}.png")
                 song_img_loaded = None
                 if os.path.exists(song_image_path):
                     try:
@@ -506,7 +551,7 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
                 while name_text_width > info_width - 10 and name_font_size > 10:
                     name_font_size -= 1
                     try:
-                        name_font = ImageFont.truetype(font_paths[0] if font_paths else "arial.ttf", name_font_size)
+                        name_font = ImageFont.truetype(font_file or "arial.ttf", name_font_size)
                     except:
                         name_font = ImageFont.load_default()
                     name_bbox = draw.textbbox((0, 0), display_name, font=name_font)
@@ -525,7 +570,7 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
                 while id_text_width > info_width - 10 and id_font_size > 6:
                     id_font_size -= 1
                     try:
-                        id_font = ImageFont.truetype(font_paths[0] if font_paths else "arial.ttf", id_font_size)
+                        id_font = ImageFont.truetype(font_file or "arial.ttf", id_font_size)
                     except:
                         id_font = ImageFont.load_default()
                     id_bbox = draw.textbbox((0, 0), song_id, font=id_font)
@@ -606,7 +651,7 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
                     
                     # 歌曲图片 - 保持2048:1080比例
                     song_id = song_data.get('id', '')
-                    song_image_path = f"illustration/{song_id}.png"
+                    song_image_path = os.path.join(context.illustration_dir, f"{song_id}.png")
                     song_img_loaded = None
                     if os.path.exists(song_image_path):
                         try:
@@ -666,7 +711,7 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
                     while name_text_width > info_width - 10 and name_font_size > 10:
                         name_font_size -= 1
                         try:
-                            name_font = ImageFont.truetype(font_paths[0] if font_paths else "arial.ttf", name_font_size)
+                            name_font = ImageFont.truetype(font_file or "arial.ttf", name_font_size)
                         except:
                             name_font = ImageFont.load_default()
                         name_bbox = draw.textbbox((0, 0), display_name, font=name_font)
@@ -685,7 +730,7 @@ def draw_B_image(B_content, userdata, name, text=None, xml=None):
                     while id_text_width > info_width - 10 and id_font_size > 6:
                         id_font_size -= 1
                         try:
-                            id_font = ImageFont.truetype(font_paths[0] if font_paths else "arial.ttf", id_font_size)
+                            id_font = ImageFont.truetype(font_file or "arial.ttf", id_font_size)
                         except:
                             id_font = ImageFont.load_default()
                         id_bbox = draw.textbbox((0, 0), song_id, font=id_font)
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def make_image_key(**fields):
+    """根据出图参数生成内容寻址的缓存键（同时用作强 ETag）"""
+    raw = json.dumps(fields, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ImageCache:
+    """
+    已编码图片的两级缓存：内存 LRU + 磁盘目录
+
+    键由 make_image_key 生成，同一个键对应的图片内容固定不变，所以磁盘文件只写一次，不需要失效，
+    只在数量超过上限时按修改时间淘汰最旧的文件。
+    """
+
+    def __init__(self, disk_dir=None, memory_bytes=64 * 1024 * 1024, disk_max_files=5000):
+        self.disk_dir = disk_dir
+        self.memory_bytes = memory_bytes
+        self.disk_max_files = disk_max_files
+
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.png")
+
+    def get(self, key):
+        """按键取图片数据，内存未命中时查磁盘并回填内存；都没有时返回 None"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                return data
+
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        self._put_memory(key, data)
+        return data
+
+    def put(self, key, data):
+        """写入两级缓存"""
+        self._put_memory(key, data)
+        if self.disk_dir:
+            self._put_disk(key, data)
+
+    def _put_memory(self, key, data):
+        if len(data) > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= len(old)
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_size -= len(evicted)
+
+    def _put_disk(self, key, data):
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        # 先写临时文件再原子替换，避免并发读到写了一半的图片；多个进程可能共用同一个目录，临时文件名由 mkstemp 保证唯一
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.disk_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._disk_writes += 1
+            should_prune = self._disk_writes % 100 == 0
+        if should_prune:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """磁盘文件超过上限时删除最旧的文件"""
+        try:
+            entries = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".png")]
+        except FileNotFoundError:
+            return
+        if len(entries) <= self.disk_max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[: len(entries) - self.disk_max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def memory_size(self):
+        """内存缓存当前占用的字节数"""
+        return self._memory_size
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
@@ -0,0 +1,148 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from context import CodeContext
+from metrics import REGISTRY, STAGE_SECONDS
+
+# 出图进程内的资源缓存：(资源版本, 预载资源)
+_worker_assets = (None, None)
+
+
+def _render_in_worker(context_root, asset_version, B_content, userdata, name, text, xml, seed):
+    """在出图进程中生成 PNG 数据；资源版本变化时重新加载字体、曲名表和背景列表"""
+    global _worker_assets
+    from image import draw_B_image, load_render_assets
+
+    context = CodeContext(context_root)
+    if _worker_assets[0] != asset_version:
+        _worker_assets = (asset_version, load_render_assets(context))
+
+    img = draw_B_image(B_content, userdata, name, text, xml, context=context, assets=_worker_assets[1], seed=seed)
+    if not img:
+        return None
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
+
+class RenderJobs:
+    """
+    异步出图任务
+
+    draw_B_image 是纯 CPU 的 Pillow 绘图，在请求线程中执行时受 GIL 限制，一个慢的出图会拖慢其他请求。
+    这里把出图提交到进程池，按任务 ID 查询结果；正在排队和执行的任务数达到 max_pending 时拒绝新任务。
+    相同缓存键的任务未完成时直接复用已有任务，完成的任务在 job_ttl 秒后清理。
+    进程池在第一次出图时才创建，此时服务已经启动了请求线程、密码哈希线程和定时任务线程，
+    fork 出的子进程可能继承被其他线程持有的锁而卡死，所以出图进程使用 spawn 方式启动。
+    """
+
+    def __init__(self, service, workers=None, max_pending=64, job_ttl=300):
+        self.service = service
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.job_ttl = job_ttl
+        self._executor = None
+        self._jobs = {}
+        self._by_key = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        REGISTRY.gauge("txgetscore_render_queue_depth", "正在排队和执行的异步出图任务数", lambda: self._pending)
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def queue_depth(self):
+        return self._pending
+
+    def submit(self, B_content, userdata, name, text=None, xml=None, key=None):
+        """
+        提交出图任务，返回任务 ID；队列已满时返回 None
+
+        key 对应的图片已在缓存中时直接创建一个已完成的任务
+        """
+        with self._lock:
+            self._expire()
+            if key is not None and key in self._by_key:
+                return self._by_key[key]
+
+            job_id = uuid.uuid4().hex
+            job = {"id": job_id, "key": key, "status": "pending", "created": time.monotonic(),
+                   "finished": None, "png": None, "error": None, "done": threading.Event()}
+
+            png = self.service.image_cache.get(key) if key is not None else None
+            if png is not None:
+                self._finish(job, png, None)
+                self._jobs[job_id] = job
+                return job_id
+
+            if self._pending >= self.max_pending:
+                return None
+            future = self._get_executor().submit(
+                _render_in_worker, self.service.context.root, self.service.asset_version,
+                B_content, userdata, name, text, xml, key,
+            )
+            self._pending += 1
+            self._jobs[job_id] = job
+            if key is not None:
+                self._by_key[key] = job_id
+
+        future.add_done_callback(lambda f: self._on_done(job, f))
+        return job_id
+
+    def _on_done(self, job, future):
+        try:
+            png, error = future.result(), None
+        except Exception as e:
+            png, error = None, e
+        if png is None and error is None:
+            error = RuntimeError("图片生成失败")
+        if png is not None and job["key"] is not None:
+            self.service.image_cache.put(job["key"], png)
+        with self._lock:
+            self._pending -= 1
+            if job["key"] is not None:
+                self._by_key.pop(job["key"], None)
+            self._finish(job, png, error)
+        STAGE_SECONDS.observe(job["finished"] - job["created"], "render_job")
+
+    @staticmethod
+    def _finish(job, png, error):
+        job["png"] = png
+        job["error"] = error
+        job["status"] = "done" if error is None else "error"
+        job["finished"] = time.monotonic()
+        job["done"].set()
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished"] is not None and now - job["finished"] > self.job_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id, wait=0):
+        """
+        查询任务；wait 大于 0 时最多等待 wait 秒直到任务完成（长轮询）
+
+        返回:
+            dict | None: 任务信息（status 为 pending / done / error），任务不存在或已过期时为 None
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        if wait > 0:
+            job["done"].wait(wait)
+        return job
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
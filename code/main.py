@@ -5,22 +5,30 @@ import datetime
 import time
 import json
 import os
+import subprocess
+import sys
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import random
 import textwrap
 import math
 from image import *
+from context import default_context
+import numpy as np
+from PhiCloudAction import topIndices
+
+code_context = default_context
 current_rks = 0
 save_data = {}
 user_info = {}
 ln = 0
 
 def update_phigros_data():
-    run_all_scripts()
+    # 更新脚本大量使用相对路径，在以 code 目录为工作目录的子进程中执行，不改变主进程的工作目录
+    subprocess.run([sys.executable, "UpdateDifAndAssets.py"], cwd=code_context.root, check=True)
 
 def getInfoList():
     try:
-        with open('chartData.json', 'r', encoding='utf-8') as f:
+        with open(code_context.chart_data_file, 'r', encoding='utf-8') as f:
             chart_data = json.load(f)
         return chart_data
     except FileNotFoundError:
@@ -45,11 +53,32 @@ def update_all(sstk):
         ln = 0
         raise e
 
-def getB(sstk, b, p, ifNoOriginalJson=True, ifNoUserData=True):
-    # 强制更新数据，确保获取最新存档
+def load_difficulty_data(path=None):
+    """读取定数表，返回 {歌曲ID: {难度: 定数}}"""
+    difficulty_data = {}
+    with open(path or code_context.difficulty_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split('\t')
+            if len(parts) >= 4:
+                song_id = parts[0]
+                difficulties = {}
+                if len(parts) > 1 and parts[1]:
+                    difficulties['EZ'] = float(parts[1])
+                if len(parts) > 2 and parts[2]:
+                    difficulties['HD'] = float(parts[2])
+                if len(parts) > 3 and parts[3]:
+                    difficulties['IN'] = float(parts[3])
+                if len(parts) > 4 and parts[4]:
+                    difficulties['AT'] = float(parts[4])
+                difficulty_data[song_id] = difficulties
+    return difficulty_data
+
+def getB(sstk, b, p, ifNoOriginalJson=True, ifNoUserData=True, difficulty_data=None, force=False, refresh=True):
     try:
-        # 先更新RKS记录，这会从服务器获取最新数据并保存到本地
-        update_rks_record(sstk)
+        # 先更新RKS记录：新鲜度窗口内或云端存档未变化时直接使用本地数据，force 为 True 时强制重新下载；
+        # refresh 为 False 表示调用方已经刷新过（ScoreService 按 SessionToken 合并刷新）
+        if refresh:
+            update_rks_record(sstk, force)
         
         # 然后从本地读取最新数据
         current_save_data = get_save_data(sstk)
@@ -64,29 +93,16 @@ def getB(sstk, b, p, ifNoOriginalJson=True, ifNoUserData=True):
         if not scores_data or not isinstance(scores_data, dict):
             return {"error": "Invalid save data structure"}
         
-        difficulty_data = {}
-        try:
-            with open('info/difficulty.tsv', 'r', encoding='utf-8') as f:
-                for line in f:
-                    parts = line.strip().split('\t')
-                    if len(parts) >= 4:
-                        song_id = parts[0]
-                        difficulties = {}
-                        if len(parts) > 1 and parts[1]:
-                            difficulties['EZ'] = float(parts[1])
-                        if len(parts) > 2 and parts[2]:
-                            difficulties['HD'] = float(parts[2])
-                        if len(parts) > 3 and parts[3]:
-                            difficulties['IN'] = float(parts[3])
-                        if len(parts) > 4 and parts[4]:
-                            difficulties['AT'] = float(parts[4])
-                        difficulty_data[song_id] = difficulties
-        except FileNotFoundError:
-            return {"error": "Difficulty file not found"}
-        except Exception as e:
-            return {"error": f"Error reading difficulty file: {str(e)}"}
-        
-        all_rks = []
+        if difficulty_data is None:
+            try:
+                difficulty_data = load_difficulty_data()
+            except FileNotFoundError:
+                return {"error": "Difficulty file not found"}
+            except Exception as e:
+                return {"error": f"Error reading difficulty file: {str(e)}"}
+        
+        # 按列收集成绩（只保留有定数的 EZ/HD/IN/AT），RKS 计算和排序在 NumPy 数组上完成
+        ids, difficulties, scores, accs, fcs, levels = [], [], [], [], [], []
         
         for song_id, song_data in scores_data.items():
             if not isinstance(song_data, dict):
@@ -105,52 +121,41 @@ def getB(sstk, b, p, ifNoOriginalJson=True, ifNoUserData=True):
                         acc = 0
                     
                     if song_id in difficulty_data and difficulty in difficulty_data[song_id]:
-                        level = difficulty_data[song_id][difficulty]
-                        
-                        if acc >= 70.0:
-                            if acc == 100.0:
-                                rks = level
-                            else:
-                                rks = (((acc - 55) / 45) ** 2) * level
-                        else:
-                            rks = 0
-                        
-                        # 确保rks是浮点数
-                        rks_value = float(rks) if rks else 0.0
-                        
-                        all_rks.append({
-                            'id': song_id,
-                            'level': f"{difficulty} Lv.{level}",
-                            'score': int(score) if score else 0,
-                            'acc': acc,
-                            'rks': rks_value,  # 直接存储浮点数，不round
-                            'fc': bool(fc),
-                            'difficulty': difficulty,
-                            'base_level': level
-                        })
-        
-        # 修复排序问题：确保比较的是数字
-        all_rks.sort(key=lambda x: float(x['rks']) if x['rks'] is not None else 0, reverse=True)
-        
-        # 现在才进行四舍五入
-        for item in all_rks:
-            item['rks'] = round(item['rks'], 4)
-        
+                        ids.append(song_id)
+                        difficulties.append(difficulty)
+                        scores.append(int(score) if score else 0)
+                        accs.append(acc)
+                        fcs.append(bool(fc))
+                        levels.append(difficulty_data[song_id][difficulty])
+        
+        # acc 达到 70 才有 RKS，acc 为 100 时 ((100 - 55) / 45) ** 2 == 1，RKS 等于定数
+        acc_array = np.asarray(accs, dtype=np.float64)
+        level_array = np.asarray(levels, dtype=np.float64)
+        rks_array = np.where(acc_array >= 70.0, ((acc_array - 55) / 45) ** 2 * level_array, 0.0)
+        
+        def score_entry(i):
+            return {
+                'id': ids[i],
+                'level': f"{difficulties[i]} Lv.{levels[i]}",
+                'score': scores[i],
+                'acc': accs[i],
+                'rks': round(float(rks_array[i]), 4),  # 排序后才四舍五入
+                'fc': fcs[i],
+                'difficulty': difficulties[i],
+                'base_level': levels[i]
+            }
+        
+        # 按 RKS 从高到低取前 b 条（argpartition，RKS 相同时保持原顺序）
         best_scores = {}
-        for i in range(min(int(b), len(all_rks))):
-            best_scores[str(i + 1)] = all_rks[i]
-        
-        phi_scores = []
-        for score in all_rks:
-            if score['acc'] == 100.0:
-                phi_scores.append({
-                    'id': score['id'],
-                    'level': score['level']
-                })
+        for rank, i in enumerate(topIndices(rks_array, int(b))):
+            best_scores[str(rank + 1)] = score_entry(i)
         
         phi_result = {}
-        for i in range(min(int(p), len(phi_scores))):
-            phi_result[str(i + 1)] = phi_scores[i]
+        for rank, i in enumerate(topIndices(rks_array, int(p), acc_array == 100.0)):
+            phi_result[str(rank + 1)] = {
+                'id': ids[i],
+                'level': f"{difficulties[i]} Lv.{levels[i]}"
+            }
         
         userinfo = get_user_info(sstk)
         
@@ -170,7 +175,7 @@ def getB(sstk, b, p, ifNoOriginalJson=True, ifNoUserData=True):
     except Exception as e:
         return {"error": f"Failed to get data: {str(e)}"}
 def getChart(ID, dif):
-    file_path = os.path.join("chart", str(ID), f"{dif}.json")
+    file_path = os.path.join(code_context.chart_dir, str(ID), f"{dif}.json")
     
     if not os.path.exists(file_path):
         print(f"查无此人啊呸查无此谱: {file_path}")
@@ -209,7 +214,7 @@ if __name__ == "__main__":
     p=input("输入P数:")
     bC=getB(sessiontoken,b,p)
     user_info = get_user_info(sessiontoken)
-    name = nickname(sessiontoken)
+    name = nickname(sessiontoken, refreshed=True)
     print(f"用户昵称: {name}")
     img = draw_B_image(bC,user_info,name)
     img.save("phigros_best_scores.png")
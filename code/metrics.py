@@ -0,0 +1,208 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 耗时直方图的默认分桶（秒），覆盖从毫秒级的缓存命中到数秒的云端下载
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """按标签累加的计数器"""
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+
+class Histogram:
+    """按标签统计的累计分桶直方图（与 Prometheus histogram 相同的输出格式）"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [各分桶计数..., +Inf 分桶计数, 总和]
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def totals(self):
+        """{标签: (次数, 总和)}，用于压测脚本计算前后差值"""
+        with self._lock:
+            return {labels: (sum(series[:-1]), series[-1]) for labels, series in self._series.items()}
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), series):
+                cumulative += count
+                yield (f"{self.name}_bucket",
+                       _format_labels(self.labelnames, labels, [("le", _format_value(float(bound)))]),
+                       cumulative)
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), series[-1]
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), cumulative
+
+
+class Gauge:
+    """读取时才调用回调函数取值的仪表（例如队列长度），平时没有任何开销"""
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, callback):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def samples(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return
+        yield self.name, "", value
+
+
+class Registry:
+    """指标注册表；同名指标只创建一次，重复注册返回已有的指标"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(name, lambda: Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(name, lambda: Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback):
+        """注册回调仪表；同名仪表重复注册时替换回调（例如服务重新创建后）"""
+        with self._lock:
+            self._metrics[name] = Gauge(name, documentation, callback)
+            return self._metrics[name]
+
+    def render(self):
+        """输出 Prometheus 文本格式（text/plain; version=0.0.4）"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# 查分流程各阶段耗时：cloud_profile / cloud_nickname / parse_save / save_dump / count_rks /
+# save_history / get_b / draw_image / png_encode / render_job（异步出图从提交到完成）
+STAGE_SECONDS = REGISTRY.histogram(
+    "txgetscore_stage_duration_seconds", "查分流程各阶段耗时（秒）", ("stage",))
+# 云端请求结果（result 为 ok / error）
+CLOUD_REQUESTS = REGISTRY.counter(
+    "txgetscore_cloud_requests_total", "云端请求次数", ("call", "result"))
+# 缓存命中情况：image（hit / miss）、save（fresh / unchanged / download / stale（云端不可用时使用本地数据））
+# parsed_save（memory / disk / miss，按存档 md5 缓存的解析结果）
+CACHE_EVENTS = REGISTRY.counter(
+    "txgetscore_cache_events_total", "缓存命中情况", ("cache", "result"))
+# 被合并的并发请求数
+COALESCED_REQUESTS = REGISTRY.counter(
+    "txgetscore_coalesced_requests_total", "与其他请求合并执行的请求数", ("kind",))
+
+# 单个云端 HTTP 请求（PhiCloudAction 的请求追踪钩子，按 GetScore.CLOUD_TRACE_SAMPLE_RATE 采样）
+CLOUD_HTTP_SECONDS = REGISTRY.histogram(
+    "txgetscore_cloud_http_duration_seconds", "云端 HTTP 请求耗时（秒，采样）", ("method", "status"))
+CLOUD_HTTP_BYTES = REGISTRY.counter(
+    "txgetscore_cloud_http_response_bytes_total", "云端 HTTP 返回数据字节数（采样）", ("method",))
+
+
+def trace_cloud_request(trace):
+    """PhiCloudAction.setRequestHook 的钩子：记录方法、状态码、耗时和返回字节数"""
+    status = str(trace["status"]) if trace["status"] is not None else "error"
+    CLOUD_HTTP_SECONDS.observe(trace["elapsed"], trace["method"], status)
+    CLOUD_HTTP_BYTES.inc(trace["method"], amount=trace["bytes"])
+
+
+def stage(name):
+    """统计一个阶段的耗时：with stage("parse_save"): ..."""
+    return STAGE_SECONDS.time(name)
+
+
+@contextmanager
+def cloud_call(name):
+    """统计一次云端请求的耗时和成功/失败次数"""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        CLOUD_REQUESTS.inc(name, "error")
+        raise
+    else:
+        CLOUD_REQUESTS.inc(name, "ok")
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - start, f"cloud_{name}")
@@ -0,0 +1,185 @@
+"""
+批量解析 saveHistory 中的历史存档（checkSaveHistory 保存的 <时间>.save）
+
+解压、解密和反序列化都是纯 CPU 的工作，这里把每份存档交给进程池解析，只解密 gameRecord，
+每个快照得到一张紧凑的成绩表（RecordTable，已计算定数和 RKS）。主进程只传文件路径，
+每个任务解析 batch_size 份存档（减少进程间通信的次数），同时在处理中的任务最多 max_pending 个，
+结果按顺序逐个产出，内存占用与存档总数无关。
+
+用法（在 code 目录下运行）：
+    python savearchive.py [sessionToken ...] [--output scores.csv] [--workers N] [--batch N]
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from PhiCloudAction import LazySave, RecordTable, getB30, readDifficultyFile
+from context import default_context
+
+# 一个历史快照的解析结果：rks 是按 B30 计算的 RKS，table 是该快照的全部成绩
+SnapshotTable = namedtuple("SnapshotTable", ("token", "snapshot", "rks", "table"))
+
+# level 为难度（EZ / HD / IN / AT），difficulty 为谱面定数
+CSV_FIELDS = ("token", "snapshot", "song", "level", "score", "acc", "fc", "difficulty", "rks")
+
+# 解析进程内的定数表（进程启动时传入一次，不随每个任务传递）
+_worker_difficulty = None
+
+
+def _init_worker(difficulty):
+    global _worker_difficulty
+    _worker_difficulty = difficulty
+
+
+def decode_save_file(path, difficulty=None):
+    """解析一份 .save 文件（只解密 gameRecord），返回 (B30 RKS, 成绩表)"""
+    with open(path, "rb") as f:
+        save = LazySave(f.read())
+    table = RecordTable.fromRecord(save, difficulty if difficulty is not None else _worker_difficulty).compact()
+    return sum(record["rks"] for record in getB30(table)) / 30, table
+
+
+def _decode_batch(paths):
+    """在解析进程中解析一批存档，单个存档出错时记录异常，不影响同一批的其他存档"""
+    results = []
+    for path in paths:
+        try:
+            results.append((decode_save_file(path), None))
+        except Exception as e:
+            results.append((None, e))
+    return results
+
+
+def iter_save_files(history_dir, tokens=None):
+    """按 sessionToken、快照时间顺序列出历史存档，产出 (sessionToken, 快照时间, 文件路径)"""
+    if tokens is None:
+        try:
+            tokens = sorted(entry.name for entry in os.scandir(history_dir) if entry.is_dir())
+        except FileNotFoundError:
+            return
+    for token in tokens:
+        token_dir = os.path.join(history_dir, token)
+        try:
+            names = sorted(name for name in os.listdir(token_dir) if name.endswith(".save"))
+        except FileNotFoundError:
+            continue
+        for name in names:
+            yield token, name[: -len(".save")], os.path.join(token_dir, name)
+
+
+def decode_history(history_dir=None, tokens=None, difficulty=None, workers=None, batch_size=8, max_pending=None,
+                   stats=None):
+    """
+    用进程池解析历史存档，按 iter_save_files 的顺序逐个产出 SnapshotTable
+
+    参数:
+        history_dir: saveHistory 目录（默认 code/saveHistory）
+        tokens: 只解析这些 sessionToken（默认全部）
+        difficulty: 定数表（默认读取 code/info/difficulty.tsv，没有时使用自带的定数表）
+        workers: 进程数（默认 CPU 核数），0 表示在当前进程中解析
+        batch_size: 每个任务解析的存档数
+        max_pending: 同时在处理中的任务数（默认进程数的 4 倍）
+        stats: 传入字典时统计 saves / failed / bytes / seconds
+    """
+    history_dir = history_dir or default_context.save_history_dir
+    if difficulty is None:
+        difficulty = readDifficultyFile(default_context.difficulty_path())
+    if workers is None:
+        workers = os.cpu_count() or 1
+    max_pending = max_pending or max(workers, 1) * 4
+    if stats is None:
+        stats = {}
+    stats.update(saves=0, failed=0, bytes=0, seconds=0.0)
+    start = time.perf_counter()
+
+    def finish(token, snapshot, path, result, error=None):
+        stats["seconds"] = time.perf_counter() - start
+        if error is not None:
+            # 单个存档损坏不影响其他存档；输出到 stderr，不混进 stdout 上的 RKS 列表
+            print(f"解析历史存档失败 {path}: {error}", file=sys.stderr)
+            stats["failed"] += 1
+            return None
+        stats["saves"] += 1
+        stats["bytes"] += os.path.getsize(path)
+        return SnapshotTable(token, snapshot, *result)
+
+    files = iter_save_files(history_dir, tokens)
+    if workers == 0:
+        for token, snapshot, path in files:
+            try:
+                result, error = decode_save_file(path, difficulty), None
+            except Exception as e:
+                result, error = None, e
+            item = finish(token, snapshot, path, result, error)
+            if item is not None:
+                yield item
+        return
+
+    def drain(batch, future):
+        for (token, snapshot, path), (result, error) in zip(batch, future.result()):
+            item = finish(token, snapshot, path, result, error)
+            if item is not None:
+                yield item
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(difficulty,)) as executor:
+        pending = deque()
+        batch = []
+        for entry in files:
+            batch.append(entry)
+            if len(batch) < batch_size:
+                continue
+            pending.append((batch, executor.submit(_decode_batch, [path for _, _, path in batch])))
+            batch = []
+            if len(pending) >= max_pending:
+                yield from drain(*pending.popleft())
+        if batch:
+            pending.append((batch, executor.submit(_decode_batch, [path for _, _, path in batch])))
+        while pending:
+            yield from drain(*pending.popleft())
+
+
+def snapshot_rows(item):
+    """把一个快照的成绩表展开成 CSV 行（每行一条成绩）"""
+    table = item.table
+    for i in range(len(table)):
+        yield (item.token, item.snapshot, table.names[table.song[i]], table.levels[table.level[i]],
+               int(table.score[i]), round(float(table.acc[i]), 4), int(table.fc[i]),
+               float(table.difficulty[i]), round(float(table.rks[i]), 4))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量解析 saveHistory 中的历史存档")
+    parser.add_argument("tokens", nargs="*", help="只解析这些 sessionToken（默认全部）")
+    parser.add_argument("--history", default=None, help="saveHistory 目录（默认 code/saveHistory）")
+    parser.add_argument("--output", default=None, help="成绩表 CSV 文件（默认只输出每个快照的 RKS）")
+    parser.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数，0 表示不使用进程池）")
+    parser.add_argument("--batch", type=int, default=8, help="每个任务解析的存档数")
+    args = parser.parse_args()
+
+    stats = {}
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else None
+    try:
+        writer = csv.writer(output) if output else None
+        if writer:
+            writer.writerow(CSV_FIELDS)
+        for item in decode_history(args.history, args.tokens or None, workers=args.workers,
+                                   batch_size=args.batch, stats=stats):
+            if writer:
+                writer.writerows(snapshot_rows(item))
+            else:
+                print(f"{item.token}\t{item.snapshot}\t{item.rks:.4f}\t{len(item.table)} 条成绩")
+    finally:
+        if output:
+            output.close()
+
+    seconds = stats["seconds"] or 1e-9
+    print(f"解析 {stats['saves']} 份存档（失败 {stats['failed']} 份，{stats['bytes'] / 1024:.1f}KiB），"
+          f"{seconds:.2f}s，{stats['saves'] / seconds:.1f} 份/秒", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import io
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from zipfile import BadZipFile
+
+import numpy as np
+
+from PhiCloudAction import RecordTable
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedSaveCache:
+    """
+    解析后的存档成绩（RecordTable，已计算定数和 RKS）的两级缓存：内存 LRU + 磁盘目录
+
+    键是存档的 md5（云端 summary 中的 checksum），同一个 md5 对应的成绩固定不变，所以磁盘文件只写一次，
+    只在数量超过上限时按修改时间淘汰最旧的文件。磁盘上用 npz 保存各列（不使用 pickle），进程重启后也能直接使用。
+    定数和 RKS 取决于定数表，每条缓存都记录了计算时的定数表版本，版本不同时用新的定数表重新计算。
+    """
+
+    def __init__(self, disk_dir=None, memory_bytes=32 * 1024 * 1024, disk_max_files=2000):
+        self.disk_dir = disk_dir
+        self.memory_bytes = memory_bytes
+        self.disk_max_files = disk_max_files
+
+        self._memory = OrderedDict()  # md5 -> (定数表版本, RecordTable)
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, checksum):
+        return os.path.join(self.disk_dir, f"{checksum}.npz")
+
+    def __contains__(self, checksum):
+        """是否已经有这份存档的成绩（可以直接作为 fetch_profile 的 known_checksums，命中时不下载存档）"""
+        with self._lock:
+            if checksum in self._memory:
+                return True
+        return bool(self.disk_dir) and os.path.exists(self._disk_path(checksum))
+
+    def get(self, checksum, difficulty, version):
+        """
+        按存档 md5 取成绩表，内存未命中时查磁盘并回填内存
+
+        返回 (成绩表, 来源)，来源为 memory / disk；都没有时返回 (None, None)
+        """
+        with self._lock:
+            entry = self._memory.get(checksum)
+            if entry is not None:
+                self._memory.move_to_end(checksum)
+        source = "memory"
+
+        if entry is None:
+            entry = self._read_disk(checksum)
+            if entry is None:
+                return None, None
+            source = "disk"
+
+        table_version, table = entry
+        if table_version != version:
+            # 定数表更新过：用新的定数表重新计算定数和 RKS
+            table = table.withDifficulty(difficulty)
+        if source == "disk" or table_version != version:
+            self._put_memory(checksum, (version, table))
+        return table, source
+
+    def put(self, checksum, table, version):
+        """写入两级缓存（只保存各列，不保存原始成绩字典），返回缓存中的成绩表"""
+        table = table.compact()
+        self._put_memory(checksum, (version, table))
+        if self.disk_dir:
+            self._put_disk(checksum, table, version)
+        return table
+
+    def _read_disk(self, checksum):
+        if not self.disk_dir:
+            return None
+        try:
+            with np.load(self._disk_path(checksum), allow_pickle=False) as columns:
+                version = str(columns["version"])
+                table = RecordTable.fromColumns(columns)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, BadZipFile) as e:
+            # 文件损坏（或是旧格式）时当作没有缓存，下次写入时覆盖
+            logger.warning(f"读取存档缓存失败: {e}")
+            return None
+        return version, table
+
+    def _put_memory(self, checksum, entry):
+        size = entry[1].nbytes
+        if size > self.memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(checksum, None)
+            if old is not None:
+                self._memory_size -= old[1].nbytes
+            self._memory[checksum] = entry
+            self._memory_size += size
+            while self._memory_size > self.memory_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_size -= evicted.nbytes
+
+    def _put_disk(self, checksum, table, version):
+        path = self._disk_path(checksum)
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, version=np.array(version), **table.columns())
+        # 先写临时文件再原子替换，避免并发读到写了一半的文件；多个进程可能共用同一个目录，临时文件名由 mkstemp 保证唯一
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.disk_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(buffer.getvalue())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._disk_writes += 1
+            should_prune = self._disk_writes % 100 == 0
+        if should_prune:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """磁盘文件超过上限时删除最旧的文件"""
+        try:
+            entries = [e for e in os.scandir(self.disk_dir) if e.name.endswith(".npz")]
+        except FileNotFoundError:
+            return
+        if len(entries) <= self.disk_max_files:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[: len(entries) - self.disk_max_files]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    @property
+    def memory_size(self):
+        """内存缓存当前占用的字节数"""
+        return self._memory_size
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_size = 0
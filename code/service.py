@@ -0,0 +1,206 @@
+import hashlib
+import io
+import os
+import threading
+
+import GetScore
+import main as code_main
+from chartdata import ChartTable
+from context import default_context
+from image import load_render_assets
+from imagecache import ImageCache, make_image_key
+from jobs import RenderJobs
+from metrics import CACHE_EVENTS, COALESCED_REQUESTS, REGISTRY, stage
+from singleflight import SingleFlight
+
+
+def _file_signature(path):
+    """文件路径 + 修改时间 + 大小，文件不存在时为 None"""
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [path, stat.st_mtime_ns, stat.st_size]
+
+
+class ScoreService:
+    """
+    常驻的查分/出图服务
+
+    在服务器启动时创建一次，持有 getB / get_user_info / nickname / draw_B_image 等入口
+    以及它们需要的定数表、曲名表、字体和背景列表，请求处理时直接调用，不再每次重新导入模块、读取文件。
+    资源更新（run_data_update）完成后调用 reload() 重新加载预载数据。
+    """
+
+    def __init__(self, context=None, save_freshness_ttl=None, render_workers=None, render_queue_limit=64,
+                 cloud_base_url=None):
+        self.context = context or default_context
+        if save_freshness_ttl is not None:
+            GetScore.SAVE_FRESHNESS_TTL = save_freshness_ttl
+        if cloud_base_url is not None:
+            GetScore.CLOUD_BASE_URL = cloud_base_url
+        self._reload_lock = threading.Lock()
+        self.difficulty_data = None
+        self.render_assets = None
+        self.asset_version = None
+        self.image_cache = ImageCache(self.context.image_cache_dir)
+        self.chart_table = ChartTable(self.context.chart_data_file)
+        self.single_flight = SingleFlight()
+        self.metrics = REGISTRY
+        REGISTRY.gauge("txgetscore_inflight_calls", "正在执行的合并调用数", self.single_flight.in_flight)
+        REGISTRY.gauge("txgetscore_image_cache_memory_bytes", "内存图片缓存占用字节数",
+                       lambda: self.image_cache.memory_size)
+        REGISTRY.gauge("txgetscore_parsed_save_cache_memory_bytes", "内存中解析存档缓存占用字节数",
+                       lambda: GetScore.save_cache().memory_size)
+        REGISTRY.gauge("txgetscore_cloud_circuit_open", "云端熔断器是否打开（1 为打开）",
+                       lambda: int(GetScore.cloud_breaker.state != "closed"))
+        self.render_jobs = RenderJobs(self, render_workers, render_queue_limit)
+        self.reload()
+
+    def reload(self):
+        """重新加载预载数据；新数据全部读完后才替换，正在处理的请求继续使用旧数据"""
+        with self._reload_lock:
+            try:
+                difficulty_data = code_main.load_difficulty_data(self.context.difficulty_file)
+            except FileNotFoundError:
+                # 定数表不存在时保持 None，getB 会按原逻辑返回错误信息
+                difficulty_data = None
+            render_assets = load_render_assets(self.context)
+
+            self.difficulty_data = difficulty_data
+            self.render_assets = render_assets
+            self.asset_version = self._compute_asset_version(render_assets)
+
+    def _compute_asset_version(self, render_assets):
+        """定数表、曲名表、字体和曲绘列表的版本号，任意一项变化都会让旧的图片缓存键失效"""
+        signature = [
+            _file_signature(self.context.difficulty_file),
+            _file_signature(self.context.info_file),
+            _file_signature(render_assets["font_file"]),
+            [_file_signature(os.path.join(self.context.illustration_dir, name)) for name in render_assets["backgrounds"]],
+        ]
+        return hashlib.md5(repr(signature).encode("utf-8")).hexdigest()
+
+    def getB(self, sstk, b, p, ifNoOriginalJson=True, ifNoUserData=True, force=False, refresh=True):
+        return code_main.getB(sstk, b, p, ifNoOriginalJson, ifNoUserData,
+                              difficulty_data=self.difficulty_data, force=force, refresh=refresh)
+
+    def refresh(self, sstk, force=False):
+        """
+        刷新存档（update_rks_record）：同一 SessionToken 的并发刷新合并为一次
+
+        与 B 数、P 数等展示参数无关，/api/get 和出图请求同时到达时只向云端确认一次、只写一次 saveHistory
+        """
+        _, shared = self.single_flight.do(("refresh", sstk, bool(force)), GetScore.update_rks_record, sstk, force)
+        if shared:
+            COALESCED_REQUESTS.inc("refresh")
+
+    def get_user_info(self, sstk):
+        return code_main.get_user_info(sstk)
+
+    def nickname(self, sstk, refreshed=False):
+        return code_main.nickname(sstk, refreshed)
+
+    def get_save_data(self, sstk):
+        return code_main.get_save_data(sstk)
+
+    def draw_B_image(self, B_content, userdata, name, text=None, xml=None):
+        return code_main.draw_B_image(B_content, userdata, name, text, xml, context=self.context, assets=self.render_assets)
+
+    def query(self, sstk, best, phi, with_save_data=False, force=False):
+        """
+        查询 B 数列表、用户信息、昵称（以及完整存档数据）
+
+        同一 SessionToken 的并发刷新（云端下载、saveHistory 写入）只做一次，不论参数（见 refresh）；
+        参数也相同的并发请求连同后面的 B 数计算一起合并，所有请求共享同一个结果字典，调用方不能修改它。
+        force 为 True 时忽略存档新鲜度窗口，强制重新下载存档。
+        """
+        key = ("query", sstk, int(best), int(phi), bool(with_save_data), bool(force))
+        result, shared = self.single_flight.do(key, self._query, sstk, best, phi, with_save_data, force)
+        if shared:
+            COALESCED_REQUESTS.inc("query")
+        return result
+
+    def _query(self, sstk, best, phi, with_save_data, force):
+        self.refresh(sstk, force)
+        with stage("get_b"):
+            b_list = self.getB(sstk, best, phi, force=force, refresh=False)
+        result = {
+            "list": b_list,
+            "user_info": self.get_user_info(sstk),
+            # 刚刷新过存档，直接使用刷新时取到的昵称
+            "nickname": self.nickname(sstk, refreshed=True),
+        }
+        if with_save_data:
+            result["save_data"] = self.get_save_data(sstk)
+        return result
+
+    def image_cache_key(self, user_info, name, best, phi, text=None, xml=None):
+        """
+        出图缓存键：存档校验值 + B数/P数 + 文案 + XML + 昵称 + 资源版本
+
+        没有存档校验值（例如 SessionToken 无效）时返回 None，表示不缓存
+        """
+        checksum = user_info.get("checksum") if isinstance(user_info, dict) else None
+        if not checksum:
+            return None
+        return make_image_key(
+            checksum=checksum, best=int(best), phi=int(phi),
+            text=text or "", xml=xml or "", nickname=name,
+            asset_version=self.asset_version,
+        )
+
+    def render_image_png(self, B_content, userdata, name, text=None, xml=None, key=None):
+        """
+        生成 PNG 图片数据；给定 key 时优先读缓存，并以 key 作为随机种子保证输出可复现
+
+        相同 key 的并发出图请求只渲染一次
+        """
+        if key is None:
+            return self._render_image_png(B_content, userdata, name, text, xml, None)
+
+        png = self.image_cache.get(key)
+        if png is not None:
+            CACHE_EVENTS.inc("image", "hit")
+            return png
+        png, shared = self.single_flight.do(("image", key), self._render_image_png, B_content, userdata, name, text, xml, key)
+        if shared:
+            COALESCED_REQUESTS.inc("image")
+        return png
+
+    def _render_image_png(self, B_content, userdata, name, text, xml, key):
+        if key is not None:
+            # 等待期间可能已有其他请求渲染完成
+            png = self.image_cache.get(key)
+            if png is not None:
+                return png
+            CACHE_EVENTS.inc("image", "miss")
+
+        with stage("draw_image"):
+            img = code_main.draw_B_image(B_content, userdata, name, text, xml,
+                                         context=self.context, assets=self.render_assets, seed=key)
+        if not img:
+            return None
+
+        with stage("png_encode"):
+            img_byte_arr = io.BytesIO()
+            img.save(img_byte_arr, format='PNG')
+            png = img_byte_arr.getvalue()
+
+        if key is not None:
+            self.image_cache.put(key, png)
+        return png
+
+    def getInfoList(self):
+        """完整谱面数据（常驻内存，chartData.json 变化时自动重新读取）"""
+        try:
+            return self.chart_table.get_all()
+        except FileNotFoundError:
+            return {"error": "chartData.json file not found"}
+        except Exception as e:
+            return {"error": f"Error reading chartData.json: {str(e)}"}
+
+    def update_phigros_data(self):
+        return code_main.update_phigros_data()
@@ -0,0 +1,63 @@
+import threading
+
+
+class _Call:
+    """一次正在执行的调用：完成后唤醒所有等待者"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    进程内的请求合并
+
+    同一个键同时只执行一次 fn，执行期间到达的相同请求直接等待并共享这次的结果（或异常），
+    执行完成后键即被移除，之后的请求会重新执行，所以不会返回过期数据。
+    共享的结果会被多个请求同时使用，调用方不能修改它。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        执行 fn(*args, **kwargs)，相同键的并发调用只执行一次
+
+        返回:
+            (object, bool): 结果，以及是否与其他请求共享了这次执行
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, call.waiters > 0
+
+    def in_flight(self):
+        """正在执行的键数量"""
+        with self._lock:
+            return len(self._calls)
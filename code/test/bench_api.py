@@ -0,0 +1,173 @@
+"""
+/api 端到端压测（离线）
+
+启动本地模拟 LeanCloud 服务器（mock_cloud.py，存档由 buildSaveDict 生成），把查分服务的云端地址指向它，
+用 Flask 测试客户端按指定并发调用根目录 main.py 的 /api（type=get / type=image），输出：
+    吞吐量、p50 / p95 / p99 延迟、状态码分布
+    各阶段耗时（txgetscore_stage_duration_seconds 在压测前后的差值）
+    云端各接口的请求次数
+saveHistory、图片缓存、PhigrosSave.json 都写到临时目录，不影响正式数据。
+
+用法（在仓库根目录下运行）：
+    python code/test/bench_api.py --type get --players 20 --requests 400 --concurrency 16
+    python code/test/bench_api.py --type image --latency 50
+    python code/test/bench_api.py --ttl 60    # 新鲜度窗口内的请求不访问云端
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+
+CODE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ROOT_DIR = os.path.dirname(CODE_DIR)
+sys.path.insert(0, CODE_DIR)
+sys.path.insert(1, ROOT_DIR)
+# 不输出 PhiCloudAction 的 DEBUG 日志（导入时就会输出，所以要在导入之前设置）
+os.environ.setdefault("PCA_LOG_LEVEL", "WARNING")
+
+from context import default_context
+from metrics import STAGE_SECONDS
+from mock_cloud import MockCloud, add_random_players
+
+BUNDLED_DIFFICULTY = os.path.join(CODE_DIR, "PhiCloudAction", "info", "difficulty.tsv")
+
+
+def load_app():
+    """按文件路径导入根目录的 main.py（code/main.py 已经占用了模块名 main）"""
+    spec = importlib.util.spec_from_file_location("txgetscore_app", os.path.join(ROOT_DIR, "main.py"))
+    app_main = importlib.util.module_from_spec(spec)
+    sys.modules["txgetscore_app"] = app_main
+    spec.loader.exec_module(app_main)
+    return app_main
+
+
+def build_queries(args, tokens):
+    kinds = ("get", "image") if args.type == "mixed" else (args.type,)
+    queries = []
+    for i in range(args.requests):
+        kind = kinds[i % len(kinds)]
+        params = {"type": kind, "sessiontoken": tokens[i % len(tokens)], "best": args.best, "phi": args.phi}
+        if kind == "get":
+            params["ifNotImage"] = "true"
+        if args.force:
+            params["force"] = "true"
+        queries.append((kind, "/api?" + "&".join(f"{k}={v}" for k, v in params.items())))
+    return queries
+
+
+def run(app, queries, concurrency):
+    local = threading.local()
+
+    def call(query):
+        kind, url = query
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        start = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - start
+        status = response.status_code
+        if status == 200 and kind == "get":
+            body = json.loads(response.data)
+            if isinstance(body["data"]["list"], dict) and "error" in body["data"]["list"]:
+                status = "200(error)"  # 接口返回 200，但查分结果是错误信息
+        return kind, status, elapsed
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(call, queries))
+    return results, time.perf_counter() - start
+
+
+def percentile_ms(samples):
+    if len(samples) < 2:
+        return [samples[0] * 1000] * 3 if samples else [0.0] * 3
+    cuts = quantiles(samples, n=100, method="inclusive")
+    return [cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000]
+
+
+def report(results, wall, stages_before, hits):
+    print(f"\n总计 {len(results)} 个请求，用时 {wall:.2f}s，吞吐量 {len(results) / wall:.1f} 请求/s")
+    for kind in sorted({kind for kind, _, _ in results}):
+        samples = [elapsed for k, _, elapsed in results if k == kind]
+        statuses = Counter(str(status) for k, status, _ in results if k == kind)
+        p50, p95, p99 = percentile_ms(samples)
+        print(f"  type={kind:<6} p50 {p50:8.1f}ms  p95 {p95:8.1f}ms  p99 {p99:8.1f}ms  状态码 {dict(statuses)}")
+
+    print("\n各阶段耗时：")
+    print(f"  {'阶段':<16}{'次数':>8}{'平均(ms)':>12}{'合计(s)':>10}")
+    for labels, (count, total) in sorted(STAGE_SECONDS.totals().items()):
+        before_count, before_total = stages_before.get(labels, (0, 0.0))
+        count, total = count - before_count, total - before_total
+        if count:
+            print(f"  {labels[0]:<16}{count:>8}{total / count * 1000:>12.2f}{total:>10.2f}")
+
+    print("\n云端请求次数：", dict(sorted(Counter(
+        "files" if path.startswith("/files/") else path for path, n in hits.items() for _ in range(n)).items())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/api 端到端压测（使用本地模拟云端）")
+    parser.add_argument("--type", choices=("get", "image", "mixed"), default="get")
+    parser.add_argument("--players", type=int, default=20, help="模拟玩家数")
+    parser.add_argument("--songs", type=int, default=None, help="每个玩家的歌曲数（默认全部歌曲）")
+    parser.add_argument("--requests", type=int, default=200, help="请求总数")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发数")
+    parser.add_argument("--latency", type=float, default=20, help="模拟云端每个请求的延迟（毫秒）")
+    parser.add_argument("--ttl", type=float, default=0,
+                        help="存档新鲜度窗口（秒），默认 0：每次都向云端确认，压测经过模拟云端的完整流程")
+    parser.add_argument("--best", type=int, default=30)
+    parser.add_argument("--phi", type=int, default=3)
+    parser.add_argument("--force", action="store_true", help="每个请求都强制重新下载存档")
+    parser.add_argument("--cold", action="store_true", help="不预热（默认先给每个玩家查询一次）")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="txgetscore-bench-")
+    cloud = MockCloud(latency=args.latency / 1000)
+    try:
+        default_context.save_history_dir = os.path.join(work_dir, "saveHistory")
+        default_context.image_cache_dir = os.path.join(work_dir, "imageCache")
+        default_context.save_cache_dir = os.path.join(work_dir, "saveCache")
+        default_context.save_dump_file = os.path.join(work_dir, "PhigrosSave.json")
+        if not os.path.exists(default_context.difficulty_file):
+            # 定数表由 UpdateDifAndAssets.py 下载，没有时使用 PhiCloudAction 自带的
+            default_context.difficulty_file = BUNDLED_DIFFICULTY
+
+        tokens = add_random_players(cloud, args.players, args.songs)
+        cloud.start()
+
+        app_main = load_app()
+        logging.getLogger().setLevel(logging.WARNING)
+        app_main.CLOUD_BASE_URL = cloud.base_url
+        app_main.SAVE_FRESHNESS_TTL = args.ttl
+        if not app_main.load_score_service():
+            raise SystemExit("查分服务加载失败")
+        app = app_main.app
+
+        print(f"{args.players} 个玩家，{args.requests} 个 type={args.type} 请求，并发 {args.concurrency}，"
+              f"云端延迟 {args.latency:.0f}ms，新鲜度窗口 {app_main.SAVE_FRESHNESS_TTL}s")
+        if not args.cold:
+            run(app, build_queries(argparse.Namespace(**{**vars(args), "requests": len(tokens)}), tokens),
+                args.concurrency)
+
+        stages_before = STAGE_SECONDS.totals()
+        cloud.reset_stats()
+        results, wall = run(app, build_queries(args, tokens), args.concurrency)
+        report(results, wall, stages_before, cloud.hits)
+        app_main.cleanup()
+    finally:
+        cloud.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
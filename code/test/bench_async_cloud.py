@@ -0,0 +1,86 @@
+"""
+批量刷新玩家资料：线程池 + 同步 PhigrosCloud 与 asyncio + AsyncPhigrosCloud 对比
+
+在本地模拟 LeanCloud 服务器（每个请求固定延迟，模拟网络往返）上登记一批玩家，
+分别用两种方式获取全部玩家的昵称、summary 和存档，输出耗时、每秒刷新的玩家数，
+并检查服务端观察到的同时连接数没有超过 limit_per_host。
+
+用法（在 code 目录下运行）：
+    python test/bench_async_cloud.py [玩家数] [每个请求的延迟毫秒数]
+"""
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PhiCloudAction import PhigrosCloud, getSharedSession
+from PhiCloudAction.AsyncCloudAction import createAsyncSession, fetchProfiles
+from mock_cloud import MockCloud, make_token
+
+THREAD_WORKERS = 16
+CONCURRENCY = 128
+LIMIT_PER_HOST = 64
+
+
+def run_threads(tokens, base_url):
+    session = getSharedSession(pool_size=THREAD_WORKERS)
+
+    def fetch(token):
+        return PhigrosCloud(token, session, base_url).fetchProfile()
+
+    with ThreadPoolExecutor(THREAD_WORKERS) as pool:
+        return dict(zip(tokens, pool.map(fetch, tokens)))
+
+
+async def run_async(tokens, base_url):
+    session = createAsyncSession(limit=LIMIT_PER_HOST, limitPerHost=LIMIT_PER_HOST)
+    try:
+        return await fetchProfiles(tokens, CONCURRENCY, client=session, baseUrl=base_url)
+    finally:
+        await session.close()
+
+
+def report(label, cloud, tokens, results, elapsed):
+    failed = [token for token, result in results.items() if isinstance(result, Exception)]
+    assert not failed, f"{label}：{len(failed)} 个玩家获取失败，例如 {results[failed[0]]!r}"
+    for token in tokens:
+        assert results[token]["save"] == cloud.players[token]["save"]
+        assert results[token]["nickname"] == cloud.players[token]["nickname"]
+    print(f"{label:<24} {elapsed:7.2f}s  {len(tokens) / elapsed:8.1f} 玩家/s  "
+          f"请求 {sum(cloud.hits.values())}  同时连接峰值 {cloud.peak_concurrency}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = (float(sys.argv[2]) if len(sys.argv) > 2 else 50) / 1000
+    tokens = [make_token(i) for i in range(count)]
+
+    with MockCloud(latency=latency) as cloud:
+        for token in tokens:
+            cloud.add_player(token)
+        print(f"{count} 个玩家，每个请求延迟 {latency * 1000:.0f}ms")
+
+        cloud.reset_stats()
+        start = time.perf_counter()
+        results = run_threads(tokens, cloud.base_url)
+        report(f"线程池({THREAD_WORKERS})", cloud, tokens, results, time.perf_counter() - start)
+
+        cloud.reset_stats()
+        start = time.perf_counter()
+        results = asyncio.run(run_async(tokens, cloud.base_url))
+        report(f"asyncio({CONCURRENCY}/{LIMIT_PER_HOST})", cloud, tokens, results, time.perf_counter() - start)
+        assert cloud.peak_concurrency <= LIMIT_PER_HOST, "同时连接数超过了 limit_per_host"
+
+        # 无效的 SessionToken 只影响自己
+        cloud.reset_stats()
+        results = asyncio.run(run_async(tokens[:3] + [make_token(count)], cloud.base_url))
+        assert isinstance(results[make_token(count)], Exception)
+        assert all(not isinstance(results[token], Exception) for token in tokens[:3])
+        print("✅ 单个玩家失败不影响其他玩家")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+gameKey 往返（解析 → 序列化）：原来的 str(list) + eval 与 BitFlags / IntList 对比
+
+生成包含大量 key 的 gameKey，确认 buildSaveDict(parseSaveDict(x)) 能完整往返（包括从 JSON 读回的普通字符串），
+再分别统计：
+    原来的做法：GameKey.read 返回 str(list)，GameKey.write / Bits.write 用 eval 解析回列表
+    现在的做法：解析结果是 BitFlags / IntList（字符串形式不变），写回时直接使用保存好的整数
+
+用法（在 code 目录下运行）：
+    python test/bench_game_key.py [key 数量] [重复次数]
+"""
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 不输出 PhiCloudAction 的 DEBUG 日志（导入时就会输出，所以要在导入之前设置）
+os.environ.setdefault("PCA_LOG_LEVEL", "WARNING")
+
+from PhiCloudAction import buildSaveDict, logger, parseSaveDict, unzipFile
+from PhiCloudAction.AES import decrypt
+from PhiCloudAction.Structure import (
+    Bit, BitFlags, Byte, GameKey, IntList, String, VarInt, Writer, readGameKey,
+)
+from mock_cloud import build_save
+
+
+def legacy_read(data, pos=0):
+    """原来的 GameKey.read（逐字节读取，结果是 str(list)）"""
+    all_keys = {}
+    key_sum, pos = VarInt.read(data, pos)
+    for _ in range(key_sum):
+        name, pos = String.read(data, pos)
+        length, pos = Byte.read(data, pos)
+        all_keys[name] = {"type": str([Bit.read(data[pos], i) for i in range(5)])}
+        pos += 1
+        flag = []
+        for _ in range(length - 1):
+            value, pos = Byte.read(data, pos)
+            flag.append(value)
+        all_keys[name]["flag"] = str(flag)
+    return all_keys, pos
+
+
+def legacy_write(value):
+    """原来的 GameKey.write（type 和 flag 都用 eval 解析）"""
+    writer = Writer()
+    writer.type_write(VarInt, len(value))
+    for name, key in value.items():
+        writer.type_write(String, name)
+        writer.type_write(Byte, len(eval(key["flag"])) + 1)
+        byte = 0
+        for i, bit in enumerate(eval(key["type"])):
+            byte = Bit.write(byte, i, bit)
+        writer.type_write(Byte, byte)
+        for flag in eval(key["flag"]):
+            writer.type_write(Byte, flag)
+    return writer.get_data()
+
+
+def measure(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    logger.setLevel(logging.ERROR)
+
+    key_list = {
+        f"key{i}": {"type": str([i & 1, (i >> 1) & 1, 1, (i >> 2) & 1, (i >> 3) & 1]), "flag": str([1] * (i % 4))}
+        for i in range(count)
+    }
+    save_data = build_save({}, key_list)
+    save_dict = parseSaveDict(save_data)
+    assert parseSaveDict(buildSaveDict(parseSaveDict(save_data))) == save_dict
+    # 从 JSON 读回来的是普通字符串，也要能往返
+    assert parseSaveDict(buildSaveDict(json.loads(json.dumps(save_dict)))) == save_dict
+    assert isinstance(save_dict["gameKey"]["keyList"]["key5"]["type"], BitFlags)
+    assert isinstance(save_dict["gameKey"]["keyList"]["key5"]["flag"], IntList)
+    print("✅ buildSaveDict(parseSaveDict(x)) 往返一致（BitFlags 和 JSON 字符串）")
+
+    raw = unzipFile(save_data, "gameKey")["gameKey"]
+    data = decrypt(raw[1:])
+    old_keys, _ = legacy_read(data)
+    new_keys, _ = readGameKey(data)
+    assert old_keys == new_keys
+    # keyList 之后还有 4 个字节（gameKey03 的其他字段）
+    assert legacy_write(old_keys) == GameKey.write(bytearray(), new_keys) == bytearray(data[:-4])
+
+    print(f"{count} 个 key，gameKey {len(data) / 1024:.1f}KiB，重复 {repeat} 次")
+    old_read = measure(lambda: legacy_read(data), repeat)
+    new_read = measure(lambda: readGameKey(data), repeat)
+    old_write = measure(lambda: legacy_write(old_keys), repeat)
+    new_write = measure(lambda: GameKey.write(bytearray(), new_keys), repeat)
+    json_keys = json.loads(json.dumps(new_keys))
+    str_write = measure(lambda: GameKey.write(bytearray(), json_keys), repeat)
+    print(f"{'':<24}{'原来(ms)':>10}{'现在(ms)':>10}")
+    print(f"{'解析':<24}{old_read:>10.2f}{new_read:>10.2f}")
+    print(f"{'序列化':<24}{old_write:>10.2f}{new_write:>10.2f}")
+    print(f"{'往返':<24}{old_read + old_write:>10.2f}{new_read + new_write:>10.2f}")
+    print(f"{'序列化（JSON 字符串）':<22}{old_write:>10.2f}{str_write:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
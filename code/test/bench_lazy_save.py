@@ -0,0 +1,113 @@
+"""
+每次刷新存档解密的字节数：整份解密（parseSaveDict）与按需解密（LazySave）对比
+
+统计 AES 解密的字节数和耗时：
+    整份解密：parseSaveDict 解密全部文件（写 PhigrosSave.json），计算 B30，
+              checkSaveHistory 再解压、解密一次 gameRecord（原来的做法）
+    按需解密：LazySave 只解密 gameRecord，B30 和 checkSaveHistory 共用同一份
+最后在本地模拟云端上调用 GetScore.update_rks_record，确认真实的刷新流程只解密了 gameRecord。
+
+用法（在 code 目录下运行）：
+    python test/bench_lazy_save.py [重复次数]
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from json import dumps
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 不输出 PhiCloudAction 的 DEBUG 日志（导入时就会输出，所以要在导入之前设置）
+os.environ.setdefault("PCA_LOG_LEVEL", "WARNING")
+
+import GetScore
+import PhiCloudAction.ActionLib as ActionLib
+from PhiCloudAction import (
+    LazySave, RecordTable, decryptSave, getB30, logger, parseSaveDict, readDifficultyFile, unzipFile,
+)
+from context import default_context
+from mock_cloud import MockCloud, build_save, random_records
+
+# 按解密前的数据长度统计解密字节数（decryptSave 用 decrypt，LazySave 用原地解密的 decryptInto）
+# PhiCloudAction.LazySave 这个名字被同名的类占用了，从 sys.modules 取模块
+LazySaveModule = sys.modules["PhiCloudAction.LazySave"]
+decrypted = Counter()
+
+
+def counting(decrypt):
+    def wrapper(data):
+        decrypted["bytes"] += len(data)
+        decrypted["calls"] += 1
+        return decrypt(data)
+
+    return wrapper
+
+
+ActionLib.decrypt = counting(ActionLib.decrypt)
+LazySaveModule.decryptInto = counting(LazySaveModule.decryptInto)
+
+
+def eager_refresh(save_data, difficulty):
+    save_dict = parseSaveDict(save_data)
+    dumps(save_dict, indent=4, ensure_ascii=False)
+    b30 = getB30(RecordTable.fromRecord(save_dict, difficulty))
+    history = unzipFile(save_data)
+    for key in ("gameKey", "gameProgress", "settings", "user"):
+        del history[key]
+    return b30, decryptSave(history)["gameRecord"]
+
+
+def lazy_refresh(save_data, difficulty):
+    save = LazySave(save_data)
+    b30 = getB30(RecordTable.fromRecord(save, difficulty))
+    return b30, save["gameRecord"]
+
+
+def measure(func, repeat):
+    decrypted.clear()
+    func()
+    per_call = decrypted["bytes"], decrypted["calls"]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return per_call, (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    logger.setLevel(logging.ERROR)
+
+    difficulty = readDifficultyFile(default_context.difficulty_path())
+    game_keys = {f"key{i}": {"type": str([1, 0, 1, 0, 1]), "flag": str([1, 1, 1])} for i in range(2000)}
+    save_data = build_save(random_records(difficulty), game_keys)
+    sizes = {key: len(value) - 1 for key, value in unzipFile(save_data).items()}
+    print(f"存档 {len(save_data)} 字节，各文件大小：{sizes}")
+
+    assert lazy_refresh(save_data, difficulty) == eager_refresh(save_data, difficulty)
+    for label, func in (("整份解密", eager_refresh), ("按需解密", lazy_refresh)):
+        (count, calls), elapsed = measure(lambda: func(save_data, difficulty), repeat)
+        print(f"{label}：每次刷新解密 {count:>7} 字节（{calls} 次），{elapsed:.2f}ms")
+
+    # 真实的刷新流程：update_rks_record 下载新存档，计算 B30 并写入 saveHistory
+    token = "c" * 25
+    history_dir = tempfile.mkdtemp()
+    try:
+        with MockCloud() as cloud:
+            cloud.add_player(token, save_data=save_data)
+            GetScore.CLOUD_BASE_URL = cloud.base_url
+            GetScore.code_context.save_history_dir = history_dir
+            GetScore.code_context.save_cache_dir = os.path.join(history_dir, "saveCache")
+            decrypted.clear()
+            GetScore.update_rks_record(token, force=True)
+        assert os.path.exists(os.path.join(history_dir, token, "recordHistory.json"))
+        assert decrypted["bytes"] == sizes["gameRecord"], f"解密了 {decrypted['bytes']} 字节"
+        print(f"✅ update_rks_record 只解密了 gameRecord（{decrypted['bytes']} 字节，{decrypted['calls']} 次）")
+    finally:
+        shutil.rmtree(history_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+登录高峰期间查分接口的延迟基准
+
+在临时目录中启动网站（根目录 main.py），用多个线程持续调用 /api/dash/login，
+同时测量 /api?type=help 的延迟（p50/p99）和登录吞吐量。分别测试两种密码哈希方式：
+    inline：在请求线程中直接计算 PBKDF2（旧行为，登录请求越多占用的 CPU 核越多）
+    pool  ：在有界的密码哈希线程池中计算，超出队列上限的登录直接返回 503
+
+用法（在 code 目录下运行）：
+    python test/bench_login_storm.py [登录线程数] [持续秒数]
+"""
+import http.client
+import importlib.util
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from statistics import quantiles
+
+from werkzeug.serving import make_server
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT_DIR)
+
+USER_COUNT = 20
+PASSWORD = "123456"
+
+
+def load_app(work_dir):
+    """在临时工作目录中加载网站模块（用户数据库、日志都写到临时目录）"""
+    os.chdir(work_dir)
+    spec = importlib.util.spec_from_file_location("app_main", os.path.join(ROOT_DIR, "main.py"))
+    app_main = importlib.util.module_from_spec(spec)
+    sys.modules["app_main"] = app_main
+    spec.loader.exec_module(app_main)
+    logging.disable(logging.CRITICAL)
+    return app_main
+
+
+def request(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        return response.status
+    finally:
+        conn.close()
+
+
+def run(app_main, label, hasher, storm_threads, duration):
+    from passwords import PasswordHasher
+
+    app_main.password_hasher.shutdown()
+    app_main.password_hasher = hasher
+    assert isinstance(hasher, PasswordHasher)
+
+    server = make_server("127.0.0.1", 0, app_main.app, threaded=True)
+    port = server.server_port
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    statuses = {}
+    statuses_lock = threading.Lock()
+
+    def login_worker(index):
+        body = {"type": "username", "username": f"user{index % USER_COUNT + 1}", "password": PASSWORD}
+        while not stop.is_set():
+            status = request(port, "POST", "/api/dash/login", body)
+            with statuses_lock:
+                statuses[status] = statuses.get(status, 0) + 1
+
+    workers = [threading.Thread(target=login_worker, args=(i,)) for i in range(storm_threads)]
+    for worker in workers:
+        worker.start()
+
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        request(port, "GET", "/api?type=help")
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+    stop.set()
+    for worker in workers:
+        worker.join()
+    server.shutdown()
+
+    cuts = quantiles(latencies, n=100)
+    logins = statuses.get(200, 0)
+    print(f"{label:<8} help p50={cuts[49]:7.2f}ms p99={cuts[98]:7.2f}ms  "
+          f"登录成功 {logins / duration:6.1f}/s  状态码 {dict(sorted(statuses.items()))}")
+
+
+def main():
+    storm_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        app_main = load_app(work_dir)
+        from passwords import PasswordHasher
+
+        store = app_main.get_user_store()
+        for i in range(USER_COUNT):
+            app_main.create_default_account(f"bench-{i}", f"bench-token-{i}")
+        print(f"CPU 核数 {os.cpu_count()}，登录线程 {storm_threads}，每项 {duration:.0f} 秒，用户 {store.count()} 个")
+
+        run(app_main, "inline", PasswordHasher(app_main.PASSWORD_KDF_ITERATIONS, workers=0), storm_threads, duration)
+        run(app_main, "pool", PasswordHasher(app_main.PASSWORD_KDF_ITERATIONS, app_main.PASSWORD_WORKERS,
+                                             app_main.PASSWORD_QUEUE_LIMIT), storm_threads, duration)
+        os.chdir(ROOT_DIR)
+
+
+if __name__ == "__main__":
+    main()
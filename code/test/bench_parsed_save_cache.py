@@ -0,0 +1,107 @@
+"""
+按存档 md5 缓存解析结果（ParsedSaveCache）：未命中、内存命中、磁盘命中（模拟重启）对比
+
+先确认缓存中的成绩表（包括从磁盘读回的）算出的 B30 / B19 和字典方式（parseSaveDict + countRks + getB30）相同，
+定数表版本变化时会用新定数表重新计算，不认识的难度名称读回后不变；再分别统计从存档数据得到 B30 的耗时：
+    未命中：LazySave 解密、解析 gameRecord，建成绩表并写入缓存
+    内存命中：直接使用内存中的成绩表
+    磁盘命中：清空内存缓存（相当于重启）后从 npz 文件读回
+
+用法（在 code 目录下运行）：
+    python test/bench_parsed_save_cache.py [重复次数]
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 不输出 PhiCloudAction 的 DEBUG 日志（导入时就会输出，所以要在导入之前设置）
+os.environ.setdefault("PCA_LOG_LEVEL", "WARNING")
+
+from PhiCloudAction import LazySave, RecordTable, countRks, getB19, getB30, logger, parseSaveDict, readDifficultyFile
+from context import default_context
+from mock_cloud import build_save, random_records
+from savecache import ParsedSaveCache
+
+CHECKSUM = "0123456789abcdef0123456789abcdef"
+
+
+def measure(func, repeat, setup=None):
+    total = 0.0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        total += time.perf_counter() - start
+    return total / repeat * 1000
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    logger.setLevel(logging.ERROR)
+
+    difficulty = readDifficultyFile(default_context.difficulty_path())
+    save_data = build_save(random_records(difficulty))
+    expected_b30 = getB30(countRks(parseSaveDict(save_data), difficulty))
+    expected_b19 = getB19(countRks(parseSaveDict(save_data), difficulty))
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = ParsedSaveCache(cache_dir)
+
+        def lookup():
+            table, _ = cache.get(CHECKSUM, difficulty, "v1")
+            if table is None:
+                table = cache.put(CHECKSUM, RecordTable.fromRecord(LazySave(save_data), difficulty), "v1")
+            return getB30(table)
+
+        def cold():
+            cache.clear_memory()
+            for name in os.listdir(cache_dir):
+                os.remove(os.path.join(cache_dir, name))
+
+        assert lookup() == expected_b30
+        assert CHECKSUM in cache
+        assert lookup() == expected_b30
+        cache.clear_memory()
+        table, source = cache.get(CHECKSUM, difficulty, "v1")
+        assert source == "disk" and getB30(table) == expected_b30 and getB19(table) == expected_b19
+        print(f"✅ 缓存的成绩表与字典方式结果相同（内存 {table.nbytes / 1024:.1f}KiB，"
+              f"磁盘 {os.path.getsize(os.path.join(cache_dir, CHECKSUM + '.npz')) / 1024:.1f}KiB）")
+
+        # 定数表更新：所有曲目定数加 0.1，缓存的成绩要用新定数表重新计算
+        updated = {song: [level + 0.1 for level in levels] for song, levels in difficulty.items()}
+        table, _ = cache.get(CHECKSUM, updated, "v2")
+        assert getB30(table) == getB30(countRks(parseSaveDict(save_data), updated))
+        cache.clear_memory()
+        print("✅ 定数表版本变化时重新计算定数和 RKS")
+
+        # 不认识的难度名称：写入磁盘再读回后仍然是原来的名称（不会变成 Legacy）
+        song = next(iter(difficulty))
+        record = {"score": 1000000, "acc": 100.0, "fc": 1}
+        table = RecordTable.fromRecord({song: {"IN": record, "SP": record}}, difficulty)
+        cache.put("f" * 32, table, "v1")
+        cache.clear_memory()
+        restored, _ = cache.get("f" * 32, difficulty, "v1")
+        assert [restored.toRecord(i)["level"] for i in range(len(restored))] == ["IN", "SP"]
+        print("✅ 不认识的难度名称从缓存读回后保持不变")
+
+        cold()
+        miss = measure(lookup, repeat, cold)
+        lookup()
+        memory = measure(lookup, repeat)
+        disk = measure(lookup, repeat, cache.clear_memory)
+        print(f"{'':<12}{'耗时(ms)':>10}")
+        print(f"{'未命中':<12}{miss:>10.3f}")
+        print(f"{'内存命中':<12}{memory:>10.3f}")
+        print(f"{'磁盘命中':<12}{disk:>10.3f}")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
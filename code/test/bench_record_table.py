@@ -0,0 +1,93 @@
+"""
+B30 计算：countRks + getB30（逐条处理字典）与 RecordTable（NumPy 列式成绩表）对比
+
+用定数表生成随机成绩（含同分、AP、acc 恰好为 70、缺少定数的歌曲），先确认两种方式得到的 B30 / B19 完全相同，
+再分别输出每种方式的平均耗时：
+    字典：countRks 添加定数和 RKS，getB30 深拷贝、全部排序后取前 30
+    列式：RecordTable.fromRecord 构建列，向量化计算 RKS，argpartition 取前 30
+--scale 把歌曲复制多份，模拟成绩更多的存档。
+
+用法（在 code 目录下运行）：
+    python test/bench_record_table.py [重复次数] [--scale N]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from copy import deepcopy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 不输出 PhiCloudAction 的 DEBUG 日志（导入时就会输出，所以要在导入之前设置）
+os.environ.setdefault("PCA_LOG_LEVEL", "WARNING")
+
+from PhiCloudAction import RecordTable, countRks, getB19, getB30, logger, readDifficultyFile
+from context import default_context
+from mock_cloud import random_records
+
+
+def build_records(difficulty, scale, seed):
+    records, constants = {}, dict(difficulty)
+    for copy in range(scale):
+        for index, (song_id, song) in enumerate(random_records(difficulty, seed=seed + copy).items()):
+            name = song_id if copy == 0 else f"{song_id}#{copy}"
+            constants[name] = difficulty[song_id]
+            for record in song.values():
+                if index % 5 == 0:
+                    record["score"], record["acc"] = 1000000, 100.0
+                elif index % 11 == 0:
+                    record["acc"] = 70.0
+            records[name] = song
+    records["不存在的歌曲"] = {"IN": {"score": 1000000, "acc": 100.0, "fc": 1}}
+    return records, constants
+
+
+def dict_b30(records, difficulty, b19=False):
+    save_dict = countRks(deepcopy(records), difficulty)
+    return getB19(save_dict) if b19 else getB30(save_dict)
+
+
+def table_b30(records, difficulty, b19=False):
+    table = RecordTable.fromRecord(records, difficulty)
+    return getB19(table) if b19 else getB30(table)
+
+
+def measure(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="B30 计算：字典与 NumPy 列式成绩表对比")
+    parser.add_argument("repeat", nargs="?", type=int, default=50)
+    parser.add_argument("--scale", type=int, default=1, help="把歌曲复制多少份")
+    args = parser.parse_args()
+    logger.setLevel(logging.ERROR)
+
+    difficulty = readDifficultyFile(default_context.difficulty_path())
+    for seed in range(5):
+        records, constants = build_records(difficulty, args.scale, seed)
+        for b19 in (False, True):
+            assert table_b30(records, constants, b19) == dict_b30(records, constants, b19), f"seed {seed} 结果不一致"
+    print("✅ B30 / B19 结果一致")
+
+    rows = sum(len(song) for song in records.values())
+    print(f"{len(records)} 首歌，{rows} 条成绩，重复 {args.repeat} 次")
+    # 字典方式的 countRks 会修改传入的数据，计时包含一次深拷贝，单独列出深拷贝本身的耗时
+    copy = measure(lambda: deepcopy(records), args.repeat)
+    old = measure(lambda: dict_b30(records, constants), args.repeat)
+    new = measure(lambda: table_b30(records, constants), args.repeat)
+    print(f"字典（countRks + getB30）  {old:8.3f}ms（其中深拷贝输入 {copy:.3f}ms）")
+    print(f"列式（RecordTable）        {new:8.3f}ms  {(old - copy) / new:.1f}x")
+
+    table = RecordTable.fromRecord(records, constants)
+    build = measure(lambda: RecordTable.fromRecord(records, constants), args.repeat)
+    select = measure(lambda: table.getBest(3, 27), args.repeat)
+    print(f"  其中构建列 {build:.3f}ms，argpartition 取 B30 {select:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
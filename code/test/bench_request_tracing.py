@@ -0,0 +1,76 @@
+"""
+PigeonRequest 请求追踪开销
+
+用一个直接返回固定响应（约 100KB 的存档数据）的客户端代替网络请求，只测量 PigeonRequest.request
+自身的开销，对比：
+    关闭追踪（日志级别 INFO）
+    10% 采样 / 全部采样（记录到 metrics）
+    dumpBodies + DEBUG 日志（相当于原来每次请求都输出完整请求头和返回数据）
+
+用法（在 code 目录下运行）：
+    python test/bench_request_tracing.py [请求次数]
+"""
+import io
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from requests import PreparedRequest, Response
+
+from PhiCloudAction import PigeonRequest, logger, setRequestHook
+from metrics import trace_cloud_request
+
+URL = "https://example.invalid/files/save.zip"
+
+
+class CannedClient:
+    """不访问网络，直接返回同一个响应"""
+
+    def __init__(self, body):
+        self.response = Response()
+        self.response.status_code = 200
+        self.response._content = body
+        self.response.request = PreparedRequest()
+        self.response.request.prepare(method="GET", url=URL, headers={"X-LC-Session": "x" * 25})
+
+    def get(self, url, headers=None, **kwargs):
+        return self.response
+
+
+def run(request, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        request.get(URL)
+    return (time.perf_counter() - start) / count * 1e6
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    # 存档本身是二进制数据，这里用文本模拟最坏情况（能被完整 decode 输出）
+    request = PigeonRequest("x" * 25, CannedClient(b"a" * 100_000))
+
+    sink = logging.StreamHandler(io.StringIO())
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(sink)
+
+    cases = (
+        ("关闭追踪", None, 1.0, False, logging.INFO),
+        ("采样 10%", trace_cloud_request, 0.1, False, logging.INFO),
+        ("全部采样", trace_cloud_request, 1.0, False, logging.INFO),
+        ("dumpBodies + DEBUG", trace_cloud_request, 1.0, True, logging.DEBUG),
+    )
+    print(f"{count} 次请求，返回数据 100KB")
+    for label, hook, rate, dump, level in cases:
+        logger.setLevel(level)
+        setRequestHook(hook, rate, dump)
+        run(request, 100)
+        print(f"{label:<20} {run(request, count):9.2f} µs/次")
+    setRequestHook(None)
+
+
+if __name__ == "__main__":
+    main()
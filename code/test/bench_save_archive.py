@@ -0,0 +1,81 @@
+"""
+批量解析历史存档（savearchive.decode_history）：当前进程与不同进程数的进程池对比
+
+在临时目录中生成 saveHistory/<sessionToken>/<时间>.save（每份存档的成绩都不同，另放一份损坏的存档），
+先确认进程池与当前进程解析的结果相同、损坏的存档被跳过，再统计每种方式每秒解析的存档数。
+只有 1 个 CPU 时进程池没有并行的收益，还要多出进程间传递结果的开销，会比在当前进程中解析慢。
+
+用法（在 code 目录下运行）：
+    python test/bench_save_archive.py [玩家数] [每个玩家的存档数]
+"""
+import contextlib
+import io
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 不输出 PhiCloudAction 的 DEBUG 日志（导入时就会输出，所以要在导入之前设置）
+os.environ.setdefault("PCA_LOG_LEVEL", "WARNING")
+
+import numpy as np
+
+from PhiCloudAction import logger, readDifficultyFile
+from context import default_context
+from mock_cloud import build_save, random_records
+from savearchive import decode_history
+
+
+def run(history_dir, difficulty, workers):
+    stats = {}
+    # 损坏的存档每次都会输出一条错误信息（stderr），这里只看 stats 中的失败数
+    with contextlib.redirect_stderr(io.StringIO()):
+        items = list(decode_history(history_dir, difficulty=difficulty, workers=workers, stats=stats))
+    return items, stats
+
+
+def same(a, b):
+    return (a.token, a.snapshot, a.rks) == (b.token, b.snapshot, b.rks) and all(
+        np.array_equal(x, y) for x, y in zip(a.table.columns().values(), b.table.columns().values()))
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    snapshots = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    logger.setLevel(logging.ERROR)
+
+    difficulty = readDifficultyFile(default_context.difficulty_path())
+    history_dir = tempfile.mkdtemp()
+    try:
+        for p in range(players):
+            token_dir = os.path.join(history_dir, f"{p:025d}")
+            os.makedirs(token_dir)
+            for s in range(snapshots):
+                with open(os.path.join(token_dir, f"2024-01-01_00-{s // 60:02d}-{s % 60:02d}.save"), "wb") as f:
+                    f.write(build_save(random_records(difficulty, seed=p * snapshots + s)))
+        with open(os.path.join(history_dir, f"{0:025d}", "2023-12-31_00-00-00.save"), "wb") as f:
+            f.write(b"not a zip file")
+        total = players * snapshots
+
+        serial, stats = run(history_dir, difficulty, 0)
+        assert len(serial) == total and stats["failed"] == 1
+        pooled, stats = run(history_dir, difficulty, None)
+        assert len(pooled) == total and stats["failed"] == 1
+        assert all(same(a, b) for a, b in zip(serial, pooled))
+        print(f"✅ {total} 份存档：进程池与当前进程结果相同，损坏的存档已跳过")
+
+        cpus = os.cpu_count() or 1
+        print(f"{cpus} 个 CPU" + ("：进程池无法并行，只多出进程间通信的开销，会比当前进程慢" if cpus == 1 else ""))
+        print(f"{'':<16}{'耗时(s)':>10}{'份/秒':>10}")
+        for workers in sorted({0, 1, 2, cpus}):
+            _, stats = run(history_dir, difficulty, workers)
+            label = "当前进程" if workers == 0 else f"{workers} 个进程"
+            print(f"{label:<16}{stats['seconds']:>10.2f}{stats['saves'] / stats['seconds']:>10.1f}")
+    finally:
+        shutil.rmtree(history_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
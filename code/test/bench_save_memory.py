@@ -0,0 +1,86 @@
+"""
+解析一份存档时的内存峰值（tracemalloc）：bytes 切片路径与缓冲区原地解密路径对比
+
+    parseSaveDict：unzipFile 把所有文件读成 bytes，decryptSave 先切掉文件头（复制一份）再解密、去填充（又各一份）
+    LazySave.toDict()：逐个文件解压到预分配的 bytearray，用 memoryview 原地解密，解析计划直接读视图
+    LazySave：只解析 gameRecord（计算 B30 时的做法）
+每种方式先确认结果相同，再用 tracemalloc 统计一次解析期间新分配内存的峰值，
+以及峰值减去解析结果本身之后的临时内存（解压、解密产生的中间数据）。
+解析全部文件时峰值主要是解析结果本身，原地解密只省下一点临时内存，所以 parseSaveDict 仍然使用 bytes 路径；
+明显的节省来自只解析 gameRecord。
+
+用法（在 code 目录下运行）：
+    python test/bench_save_memory.py [gameKey 数量]
+"""
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 不输出 PhiCloudAction 的 DEBUG 日志（导入时就会输出，所以要在导入之前设置）
+os.environ.setdefault("PCA_LOG_LEVEL", "WARNING")
+
+from PhiCloudAction import LazySave, logger, parseSaveDict, readDifficultyFile, unzipFile
+from context import default_context
+from mock_cloud import build_save, random_records
+
+
+def lazy_full_parse(save_data):
+    return LazySave(save_data).toDict()
+
+
+def game_record_only(save_data):
+    return LazySave(save_data)["gameRecord"]
+
+
+def memory_kib(func, save_data):
+    """返回 (峰值, 临时内存)：调用结束时还在的内存就是解析结果"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func(save_data)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 1024, (peak - retained) / 1024
+
+
+def elapsed_ms(func, save_data, repeat=20):
+    func(save_data)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(save_data)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    key_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    logger.setLevel(logging.ERROR)
+
+    difficulty = readDifficultyFile(default_context.difficulty_path())
+    game_keys = {f"key{i}": {"type": str([1, 0, 1, 0, 1]), "flag": str([1, 1, 1])} for i in range(key_count)}
+    save_data = build_save(random_records(difficulty), game_keys)
+    sizes = {key: len(value) for key, value in unzipFile(save_data).items()}
+    print(f"存档 {len(save_data) / 1024:.1f}KiB，解压后 {sum(sizes.values()) / 1024:.1f}KiB：{sizes}")
+
+    expected = parseSaveDict(save_data)
+    assert lazy_full_parse(save_data) == expected
+    assert game_record_only(save_data) == expected["gameRecord"]
+
+    cases = (
+        ("parseSaveDict（bytes 切片）", parseSaveDict),
+        ("LazySave.toDict()（缓冲区）", lazy_full_parse),
+        ("LazySave（只要 gameRecord）", game_record_only),
+    )
+    print(f"{'':<28}{'峰值(KiB)':>12}{'临时(KiB)':>12}{'耗时(ms)':>10}")
+    for label, func in cases:
+        peak, transient = memory_kib(func, save_data)
+        print(f"{label:<28}{peak:>12.1f}{transient:>12.1f}{elapsed_ms(func, save_data):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+存档解析：Reader.parseStructure（逐字段 type_read）与预编译解析计划（compilePlan）对比
+
+用 mock_cloud.build_save 生成包含全部歌曲的存档，解压、解密一次后，对每个存档文件分别用两种方式反序列化：
+先确认结果完全相同，再输出每种方式的平均耗时；最后对比完整的 parseSaveDict（解压 + 解密 + 反序列化）。
+
+用法（在 code 目录下运行）：
+    python test/bench_save_parser.py [重复次数]
+"""
+import logging
+import os
+import sys
+import time
+from base64 import b64decode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PhiCloudAction import logger, parseSaveDict, readDifficultyFile, unzipFile
+from PhiCloudAction.AES import decrypt
+from PhiCloudAction.Structure import Reader, compilePlan, headGetStructure, summary
+from context import default_context
+from mock_cloud import build_save, build_summary, random_records
+
+
+def measure(func, repeat):
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def legacy_parse_save(save_data):
+    """parseSaveDict 改用解析计划之前的实现"""
+    save_dict = unzipFile(save_data)
+    structures = headGetStructure({key: value[0].to_bytes() for key, value in save_dict.items()})
+    return {key: Reader(decrypt(value[1:])).parseStructure(structures[key]) for key, value in save_dict.items()}
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    logger.setLevel(logging.INFO)
+
+    difficulty = readDifficultyFile(default_context.difficulty_path())
+    save_data = build_save(random_records(difficulty),
+                           {f"key{i}": {"type": str([1, 0, 1, 0, 1]), "flag": str([1, 1, 1])} for i in range(200)})
+    files = unzipFile(save_data)
+    structures = headGetStructure({key: value[0].to_bytes() for key, value in files.items()})
+    decrypted = {key: decrypt(value[1:]) for key, value in files.items()}
+    decrypted["summary"] = b64decode(build_summary(rks=15.25, challenge=345))
+    structures["summary"] = summary
+
+    print(f"存档 {len(save_data)} 字节，{len(difficulty)} 首歌，重复 {repeat} 次")
+    print(f"{'结构':<24}{'字节':>8}{'Reader(ms)':>14}{'解析计划(ms)':>14}{'加速':>8}")
+    for key, data in decrypted.items():
+        structure = structures[key]
+        plan = compilePlan(structure)
+        expected = Reader(data).parseStructure(structure)
+        assert plan.parse(data) == expected, f"{key} 解析结果不一致"
+        old = measure(lambda: Reader(data).parseStructure(structure), repeat)
+        new = measure(lambda: plan.parse(data), repeat)
+        label = f"{key} ({structure.__name__})"
+        print(f"{label:<24}{len(data):>8}{old:>14.3f}{new:>14.3f}{old / new:>7.1f}x")
+
+    assert parseSaveDict(save_data) == legacy_parse_save(save_data)
+    old = measure(lambda: legacy_parse_save(save_data), repeat)
+    new = measure(lambda: parseSaveDict(save_data), repeat)
+    print(f"{'parseSaveDict（完整）':<22}{len(save_data):>8}{old:>14.3f}{new:>14.3f}{old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+常驻查分服务的启动/单次请求开销基准
+
+对比两种请求路径（不访问云端，只测量模块与预载数据的准备开销）：
+    旧：每个请求调用 load_main_module()，重新走导入流程、构建包装字典、读取定数表/曲名表/字体/背景列表
+    新：启动时创建一次 ScoreService，请求直接使用其中的入口和预载数据
+
+用法（在 code 目录下运行）：
+    python test/bench_service.py [请求次数]
+"""
+import logging
+import os
+import sys
+import time
+from statistics import mean, quantiles
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.basicConfig(level=logging.INFO, handlers=[logging.NullHandler()])
+
+import main as code_main
+from image import load_render_assets
+from service import ScoreService
+
+
+def old_request_setup():
+    """复现旧版 handle_api 每个请求做的准备工作"""
+    from main import getB, get_user_info, nickname, get_save_data, draw_B_image, update_phigros_data, getInfoList
+    logging.info("✅ 成功加载 main.py 模块")
+
+    def wrap_function(original_func):
+        def wrapper(*args, **kwargs):
+            return original_func(*args, **kwargs)
+        return wrapper
+
+    functions = {
+        'getB': wrap_function(getB),
+        'get_user_info': wrap_function(get_user_info),
+        'nickname': wrap_function(nickname),
+        'get_save_data': wrap_function(get_save_data),
+        'draw_B_image': wrap_function(draw_B_image),
+        'update_phigros_data': wrap_function(update_phigros_data),
+        'getInfoList': wrap_function(getInfoList),
+    }
+    # getB 和 draw_B_image 在每次调用时都会重新读取这些数据
+    try:
+        code_main.load_difficulty_data()
+    except FileNotFoundError:
+        pass
+    load_render_assets()
+    return functions
+
+
+def new_request_setup(service):
+    """新版请求只取用常驻服务上的入口和预载数据"""
+    return service.getB, service.draw_B_image, service.difficulty_data, service.render_assets
+
+
+def measure(func, count):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(title, samples):
+    p = quantiles(samples, n=100)
+    print(f"{title}: 平均 {mean(samples):.4f} ms | p50 {p[49]:.4f} ms | p99 {p[98]:.4f} ms")
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    start = time.perf_counter()
+    service = ScoreService()
+    print(f"启动：创建 ScoreService 耗时 {(time.perf_counter() - start) * 1000:.2f} ms（只执行一次）")
+
+    report("旧：每请求 load_main_module + 读取数据", measure(old_request_setup, count))
+    report("新：常驻 ScoreService", measure(lambda: new_request_setup(service), count))
@@ -0,0 +1,132 @@
+"""
+云端故障处理检查
+
+在本地模拟 LeanCloud 服务器上注入故障，确认：
+    偶发的 5xx 会自动重试，调用方拿到正常结果
+    卡住的接口在超时后放弃，不会一直占着线程
+    连续失败后熔断器打开，之后的查询不再请求云端，直接使用 saveHistory 中最近一次的数据
+    熔断器打开一段时间后放行试探请求：试探失败时重新打开，云端恢复后自动关闭
+
+用法（在 code 目录下运行）：
+    python test/check_cloud_resilience.py
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import GetScore
+from PhiCloudAction import CircuitBreaker, CircuitOpenError, PhigrosCloud, PooledSession, readDifficultyFile
+from metrics import CACHE_EVENTS
+from mock_cloud import MockCloud, build_save, random_records
+from requests.exceptions import InvalidSchema, Timeout
+
+SESSION_TOKEN = "c" * 25
+USERS = "/1.1/users/me"
+
+
+def main():
+    cloud_server = MockCloud().start()
+    history_dir = tempfile.mkdtemp()
+    try:
+        records = random_records(readDifficultyFile(GetScore.code_context.difficulty_path()), 50)
+        cloud_server.add_player(SESSION_TOKEN, save_data=build_save(records))
+        base_url = cloud_server.base_url
+
+        # 偶发的 5xx：重试后成功
+        session = PooledSession(retries=2, backoff=0.01)
+        cloud_server.fail(2)
+        nickname = PhigrosCloud(SESSION_TOKEN, session, base_url).getNickname()
+        assert nickname == cloud_server.players[SESSION_TOKEN]["nickname"]
+        assert cloud_server.hits[USERS] == 3, cloud_server.hits
+        print(f"✅ 两次 503 后重试成功：users/me 请求 {cloud_server.hits[USERS]} 次")
+
+        # 卡住的接口：超时后放弃
+        cloud_server.latency = 2
+        session = PooledSession(read_timeout=0.2, retries=1, backoff=0.01)
+        start = time.perf_counter()
+        try:
+            PhigrosCloud(SESSION_TOKEN, session, base_url).getNickname()
+            raise AssertionError("应当超时")
+        except Timeout:
+            elapsed = time.perf_counter() - start
+        assert elapsed < 1.5, elapsed
+        print(f"✅ 卡住的接口 {elapsed:.2f}s 后放弃（读取超时 0.2s，重试 1 次）")
+        cloud_server.latency = 0
+
+        # GetScore：先正常查询一次，saveHistory 中有了记录
+        GetScore.CLOUD_BASE_URL = base_url
+        GetScore.CLOUD_BACKOFF = 0.01
+        GetScore.cloud_breaker.failure_threshold = 3
+        GetScore.cloud_breaker.reset_timeout = 0.5
+        GetScore.SAVE_FRESHNESS_TTL = 0
+        GetScore.code_context.save_history_dir = history_dir
+        GetScore.code_context.save_cache_dir = os.path.join(history_dir, "saveCache")
+        GetScore.code_context.save_dump_file = os.path.join(history_dir, "PhigrosSave.json")
+        rks, _ = GetScore.update_rks_record(SESSION_TOKEN)
+
+        # 云端持续故障：熔断器打开前每次查询都会重试，打开后不再请求云端
+        cloud_server.fail()
+        stale_before = CACHE_EVENTS.value("save", "stale")
+        for _ in range(GetScore.cloud_breaker.failure_threshold):
+            assert GetScore.update_rks_record(SESSION_TOKEN)[0] == rks
+        assert GetScore.cloud_breaker.state == "open"
+
+        cloud_server.reset_stats()
+        start = time.perf_counter()
+        for _ in range(20):
+            assert GetScore.update_rks_record(SESSION_TOKEN)[0] == rks
+        elapsed = time.perf_counter() - start
+        assert sum(cloud_server.hits.values()) == 0, cloud_server.hits
+        stale = CACHE_EVENTS.value("save", "stale") - stale_before
+        print(f"✅ 熔断器打开：20 次查询 {elapsed * 1000:.1f}ms，云端请求 0 次，"
+              f"使用本地数据 {stale:.0f} 次（RKS {rks:.4f}）")
+
+        try:
+            PhigrosCloud(SESSION_TOKEN, GetScore.cloud_session(), base_url).getNickname()
+            raise AssertionError("应当被熔断器拒绝")
+        except CircuitOpenError:
+            pass
+
+        # 云端仍然故障：试探请求（包括它的重试）失败后熔断器重新打开，而不是一直停在半开
+        time.sleep(GetScore.cloud_breaker.reset_timeout)
+        assert GetScore.cloud_breaker.state == "half_open"
+        assert GetScore.update_rks_record(SESSION_TOKEN)[0] == rks
+        assert GetScore.cloud_breaker.state == "open", GetScore.cloud_breaker.state
+        print("✅ 试探请求失败后熔断器重新打开")
+
+        # 云端恢复：等待 reset_timeout 后的试探请求成功，熔断器关闭
+        cloud_server.recover()
+        time.sleep(GetScore.cloud_breaker.reset_timeout)
+        assert GetScore.cloud_breaker.state == "half_open"
+        cloud_server.reset_stats()
+        assert GetScore.update_rks_record(SESSION_TOKEN)[0] == rks
+        assert GetScore.cloud_breaker.state == "closed"
+        assert cloud_server.hits[USERS] == 1, cloud_server.hits
+        print("✅ 云端恢复后试探请求成功，熔断器关闭")
+
+        # 试探请求引发其他异常（不在重试范围内）时也算失败，之后的试探请求仍然会被放行
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+        session = PooledSession(retries=2, backoff=0.01, breaker=breaker)
+        breaker.record_failure()
+        time.sleep(breaker.reset_timeout)
+        try:
+            session.get("ftp://localhost/")
+            raise AssertionError("应当引发 InvalidSchema")
+        except InvalidSchema:
+            pass
+        assert breaker.state == "open", breaker.state
+        time.sleep(breaker.reset_timeout)
+        assert PhigrosCloud(SESSION_TOKEN, session, base_url).getNickname() == nickname
+        assert breaker.state == "closed"
+        print("✅ 试探请求引发异常后熔断器重新打开，云端正常时关闭")
+    finally:
+        shutil.rmtree(history_dir, ignore_errors=True)
+        cloud_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+云端请求次数检查
+
+在本地启动一个模拟 LeanCloud 的替身服务器（users/me、classes/_GameSave、存档文件），
+统计每个接口被请求的次数，确认：
+    PhigrosCloud.fetchProfile() 每个接口只请求一次，存档校验值已知时不下载存档
+    GetScore.update_rks_record() + nickname() 在存档未变化时只请求 users/me 和 _GameSave 各一次，
+    新鲜度窗口内再次查询不发出任何请求
+    存档校验值变化但歌曲记录相同时（saveHistory 不会记录），重启后也不再下载这份存档
+    ScoreService 中同一 SessionToken、不同 B 数的并发查询只刷新一次
+
+用法（在 code 目录下运行）：
+    python test/check_request_counts.py
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import GetScore
+from PhiCloudAction import PhigrosCloud
+from PhiCloudAction import readDifficultyFile
+from mock_cloud import MockCloud, build_save, random_records
+
+SESSION_TOKEN = "a" * 25
+RECORD_TOKEN = "b" * 25
+NICKNAME = "替身玩家"
+
+
+def expect(hits, expected, label):
+    actual = {path: hits.get(path, 0) for path in expected}
+    assert actual == expected, f"{label}：期望 {expected}，实际 {dict(hits)}"
+    print(f"✅ {label}：{actual}")
+
+
+def main():
+    cloud_server = MockCloud().start()
+    save_data = cloud_server.add_player(SESSION_TOKEN, NICKNAME)
+    checksum = cloud_server.players[SESSION_TOKEN]["checksum"]
+    base_url = cloud_server.base_url
+    hits = cloud_server.hits
+    endpoints = ("/1.1/users/me", "/1.1/classes/_GameSave", f"/files/{SESSION_TOKEN}")
+
+    with PhigrosCloud(SESSION_TOKEN, baseUrl=base_url) as cloud:
+        profile = cloud.fetchProfile()
+    assert profile["nickname"] == NICKNAME and profile["save"] == save_data
+    assert profile["summary"]["checksum"] == checksum
+    expect(hits, dict.fromkeys(endpoints, 1), "fetchProfile")
+
+    hits.clear()
+    with PhigrosCloud(SESSION_TOKEN, baseUrl=base_url) as cloud:
+        profile = cloud.fetchProfile({checksum})
+    assert profile["save"] is None
+    expect(hits, dict(zip(endpoints, (1, 1, 0))), "fetchProfile（校验值已知）")
+
+    # GetScore：saveHistory 中已有同一个校验值的记录
+    history_dir = tempfile.mkdtemp()
+    try:
+        GetScore.CLOUD_BASE_URL = base_url
+        GetScore.code_context.save_history_dir = history_dir
+        GetScore.code_context.save_cache_dir = os.path.join(history_dir, "saveCache")
+        token_dir = os.path.join(history_dir, SESSION_TOKEN)
+        os.makedirs(token_dir)
+        with open(os.path.join(token_dir, "summaryHistory.json"), "w", encoding="utf-8") as f:
+            json.dump({"2024-01-01_00-00-00": {"checksum": checksum, "rks": 15.5}}, f)
+
+        hits.clear()
+        GetScore.update_rks_record(SESSION_TOKEN)
+        assert GetScore.nickname(SESSION_TOKEN) == NICKNAME
+        expect(hits, dict(zip(endpoints, (1, 1, 0))), "update_rks_record + nickname（存档未变化）")
+
+        hits.clear()
+        GetScore.update_rks_record(SESSION_TOKEN)
+        GetScore.nickname(SESSION_TOKEN)
+        expect(hits, dict(zip(endpoints, (0, 0, 0))), "新鲜度窗口内再次查询")
+
+        # 新鲜度窗口为 0：每次都向云端确认，但同一次查询中的昵称直接使用刷新时取到的
+        ttl, GetScore.SAVE_FRESHNESS_TTL = GetScore.SAVE_FRESHNESS_TTL, 0
+        hits.clear()
+        GetScore.update_rks_record(SESSION_TOKEN)
+        assert GetScore.nickname(SESSION_TOKEN, refreshed=True) == NICKNAME
+        expect(hits, dict(zip(endpoints, (1, 1, 0))), "新鲜度窗口为 0 时刷新 + 昵称")
+        GetScore.SAVE_FRESHNESS_TTL = ttl
+
+        # 可以解析的存档：先下载一次，再换成歌曲记录相同、校验值不同的存档
+        GetScore.code_context.save_dump_file = os.path.join(history_dir, "PhigrosSave.json")
+        records = random_records(readDifficultyFile(GetScore.code_context.difficulty_path()), 50)
+        save_file = f"/files/{RECORD_TOKEN}"
+        record_endpoints = endpoints[:2] + (save_file,)
+        cloud_server.add_player(RECORD_TOKEN, save_data=build_save(records))
+
+        hits.clear()
+        first_rks, _ = GetScore.update_rks_record(RECORD_TOKEN)
+        expect(hits, dict(zip(record_endpoints, (1, 1, 1))), "首次查询下载存档")
+
+        cloud_server.add_player(RECORD_TOKEN, save_data=build_save(
+            records, {"Glaciaxion": {"type": str([0, 0, 1, 0, 0]), "flag": str([1])}}))
+        GetScore._last_checked.clear()
+        hits.clear()
+        GetScore.update_rks_record(RECORD_TOKEN)
+        expect(hits, dict(zip(record_endpoints, (1, 1, 1))), "存档变化（歌曲记录相同）")
+
+        # 模拟重启：清空进程内的状态
+        GetScore._last_checked.clear()
+        GetScore._checksum_file_cache.clear()
+        hits.clear()
+        current_rks, _ = GetScore.update_rks_record(RECORD_TOKEN)
+        assert current_rks == first_rks
+        expect(hits, dict(zip(record_endpoints, (1, 1, 0))), "重启后同一份存档不再下载")
+
+        # 解析结果按存档 md5 缓存在 saveCache 中：清空内存缓存后从磁盘读取，计算 B30 时不下载存档
+        GetScore.save_cache().clear_memory()
+        hits.clear()
+        assert GetScore.get_b_calculated_rks(RECORD_TOKEN, 30) == first_rks
+        expect(hits, dict(zip(record_endpoints, (1, 1, 0))), "B30 使用缓存的解析结果")
+
+        # ScoreService：不同 B 数的并发查询合并刷新（每个请求都向云端确认，但同一时刻只确认一次）
+        from service import ScoreService
+        ttl = GetScore.SAVE_FRESHNESS_TTL
+        service = ScoreService(save_freshness_ttl=0, cloud_base_url=base_url)
+        cloud_server.latency = 0.2
+        hits.clear()
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(lambda best: service.query(RECORD_TOKEN, best, 3), (30, 27, 19, 21)))
+        cloud_server.latency = 0
+        GetScore.SAVE_FRESHNESS_TTL = ttl
+        # 本地没有 info/difficulty.tsv 时 list 是错误信息，这里只关心云端请求次数
+        assert all("list" in result and "nickname" in result for result in results)
+        expect(hits, dict(zip(record_endpoints, (1, 1, 0))), "ScoreService 并发查询（B 数不同）")
+    finally:
+        shutil.rmtree(history_dir, ignore_errors=True)
+        cloud_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -20,12 +20,14 @@ else:
 
 if __name__ == "__main__":
     with PhigrosCloud(sessionToken) as cloud:
-        logger.info(f"玩家昵称：{cloud.getNickname()}")
+        # 昵称、summary和存档各只请求一次喵
+        profile = cloud.fetchProfile()
+        logger.info(f"玩家昵称：{profile['nickname']}")
 
-        summary = cloud.getSummary()
+        summary = profile["summary"]
         logger.info(f"玩家summary：{summary}")
 
-        save_data = cloud.getSave()
+        save_data = profile["save"]
         save_dict = parseSaveDict(save_data)
 
     with open("PhigrosSave.json", "w", encoding="utf-8") as file:
@@ -0,0 +1,297 @@
+"""
+本地模拟 LeanCloud 服务器
+
+实现 PhigrosCloud 用到的三个接口：users/me、classes/_GameSave、存档文件下载，
+按请求头 X-LC-Session 区分玩家，未登记的 SessionToken 返回 400（与 LeanCloud 相同）。
+会统计每个接口的请求次数和同时处理中的请求数峰值，可设置每个请求的延迟来模拟网络往返，
+也可以用 fail() 让接下来的请求返回 5xx 来模拟云端故障。
+
+用法：
+    with MockCloud(latency=0.05) as cloud:
+        cloud.add_player(token, nickname="玩家")
+        PhigrosCloud(token, baseUrl=cloud.base_url).fetchProfile()
+        print(cloud.hits, cloud.peak_concurrency)
+
+也可以单独运行（在 code 目录下），登记一批带随机成绩的玩家并输出它们的 SessionToken，
+然后把根目录 main.py 的 CLOUD_BASE_URL 改为输出的地址，对真实运行的服务压测：
+    python test/mock_cloud.py --port 8800 --players 50 --latency 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from base64 import b64encode
+from collections import Counter
+from hashlib import md5
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from struct import pack
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+USERS_PATH = "/1.1/users/me"
+GAME_SAVE_PATH = "/1.1/classes/_GameSave"
+FILES_PREFIX = "/files/"
+
+
+def build_summary(rks=15.5, challenge=0, avatar="Introduction", save_version=6, game_version=100):
+    """按 summary 结构拼出 base64 数据（与 PhigrosCloud.uploadSummary 相同的格式）"""
+    avatar = avatar.encode()
+    data = bytearray()
+    data.extend(pack("=B", save_version))
+    data.extend(pack("=H", challenge))
+    data.extend(pack("=f", rks))
+    data.extend(pack("=B", game_version))
+    data.append(len(avatar))
+    data.extend(avatar)
+    for _ in range(12):
+        data.extend(pack("=H", 0))
+    return b64encode(bytes(data)).decode()
+
+
+def _default_value(type_obj):
+    from PhiCloudAction.Structure.DataType import Bit, Bits, Float, Money, String, _Bits
+
+    if type_obj is Bit:
+        return 0
+    if type_obj is Bits or isinstance(type_obj, _Bits):
+        return str([0] * 8)
+    if type_obj is String:
+        return ""
+    if type_obj is Float:
+        return 0.0
+    if type_obj is Money:
+        return [0] * 5
+    return 0
+
+
+def build_save(records, game_keys=None):
+    """
+    拼出一个能被 parseSaveDict 解析的存档压缩包
+
+    参数:
+        records: gameRecord 数据 {歌曲ID: {难度: {"score", "acc", "fc"}}}
+        game_keys: gameKey 中的 keyList（默认为空）
+    """
+    from PhiCloudAction import buildSaveDict
+    from PhiCloudAction.Structure import gameKey03, gameProgress04, settings01, user01
+
+    save_dict = {}
+    for name, structure in (("gameKey", gameKey03), ("gameProgress", gameProgress04),
+                            ("settings", settings01), ("user", user01)):
+        save_dict[name] = {key: _default_value(type_obj) for key, type_obj in structure.__annotations__.items()}
+    save_dict["gameKey"]["keyList"] = game_keys or {}
+    save_dict["gameKey"]["oldScoreClearedV390"] = 1
+    save_dict["gameProgress"]["flagOfSongRecordKeyTakumi"] = str([0] * 3)
+    save_dict["gameRecord"] = records
+    return buildSaveDict(save_dict)
+
+
+def random_records(difficulty, count=None, seed=0):
+    """
+    按定数表生成可复现的随机成绩
+
+    参数:
+        difficulty: readDifficultyFile 读出的定数表 {歌曲ID: [各难度定数]}
+        count: 歌曲数量（默认全部歌曲）
+    """
+    import random
+
+    rng = random.Random(seed)
+    records = {}
+    for song_id, levels in list(difficulty.items())[:count]:
+        song = {}
+        for name in ("EZ", "HD", "IN", "AT")[:len(levels)]:
+            if rng.random() < 0.8:
+                score = rng.randint(700000, 1000000)
+                song[name] = {"score": score, "acc": 70 + 30 * (score - 700000) / 300000,
+                              "fc": int(score == 1000000 or rng.random() < 0.2)}
+        records[song_id] = song
+    return records
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        cloud = self.server.cloud
+        path = self.path.split("?")[0]
+        cloud._enter(path)
+        try:
+            if cloud.latency:
+                time.sleep(cloud.latency)
+            status = cloud._take_failure()
+            if status is not None:
+                self.reply(status, json.dumps({"code": status, "error": "injected failure"}).encode())
+            else:
+                self._dispatch(cloud, path)
+        finally:
+            cloud._leave()
+
+    def _dispatch(self, cloud, path):
+        if path.startswith(FILES_PREFIX):
+            player = cloud.players.get(path[len(FILES_PREFIX):])
+            if player is None:
+                self.reply(404, b"")
+            else:
+                self.reply(200, player["save"], "application/octet-stream")
+            return
+
+        token = self.headers.get("X-LC-Session")
+        player = cloud.players.get(token)
+        if path not in (USERS_PATH, GAME_SAVE_PATH):
+            self.reply(404, b"")
+        elif player is None:
+            self.reply(400, json.dumps({"code": 211, "error": "Could not find user."}).encode())
+        elif path == USERS_PATH:
+            self.reply(200, json.dumps({"nickname": player["nickname"], "objectId": token[:8]}).encode())
+        else:
+            self.reply(200, json.dumps({"results": [{
+                "summary": player["summary"],
+                "updatedAt": player["updated_at"],
+                "gameFile": {"metaData": {"_checksum": player["checksum"]},
+                             "url": f"{cloud.host}{FILES_PREFIX}{token}"},
+            }]}).encode())
+
+    def reply(self, status, body, content_type="application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 并发测试时一次会有几百个连接
+
+
+class MockCloud:
+    """在后台线程中运行的模拟 LeanCloud 服务器"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.players = {}
+        self.hits = Counter()
+        self.in_flight = 0
+        self.peak_concurrency = 0
+        self.fail_remaining = 0
+        self.fail_status = 503
+        self._lock = threading.Lock()
+        self._server = None
+
+    def add_player(self, token, nickname=None, save_data=None, rks=15.5, updated_at="2024-01-01T00:00:00.000Z"):
+        """登记一个玩家，返回其存档数据；不给存档数据时使用随机字节（只能用于不解析存档的场景）"""
+        save_data = save_data if save_data is not None else os.urandom(256)
+        self.players[token] = {
+            "nickname": nickname if nickname is not None else f"玩家{len(self.players)}",
+            "save": save_data,
+            "checksum": md5(save_data).hexdigest(),
+            "summary": build_summary(rks=rks),
+            "updated_at": updated_at,
+        }
+        return save_data
+
+    def fail(self, count=None, status=503):
+        """接下来的 count 个请求返回 status（count 为 None 时一直失败，直到 recover()）"""
+        with self._lock:
+            self.fail_remaining = -1 if count is None else count
+            self.fail_status = status
+
+    def recover(self):
+        with self._lock:
+            self.fail_remaining = 0
+
+    def _take_failure(self):
+        with self._lock:
+            if self.fail_remaining == 0:
+                return None
+            if self.fail_remaining > 0:
+                self.fail_remaining -= 1
+            return self.fail_status
+
+    def _enter(self, path):
+        with self._lock:
+            self.hits[path] += 1
+            self.in_flight += 1
+            self.peak_concurrency = max(self.peak_concurrency, self.in_flight)
+
+    def _leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits.clear()
+            self.peak_concurrency = self.in_flight
+
+    @property
+    def host(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    @property
+    def base_url(self):
+        return f"{self.host}/1.1/"
+
+    def start(self, port=0):
+        self._server = _Server(("127.0.0.1", port), _Handler)
+        self._server.cloud = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def make_token(index):
+    """第 index 个模拟玩家的 SessionToken（25 位数字，符合 checkSessionToken 的格式）"""
+    return f"{index:025d}"
+
+
+def add_random_players(cloud, count, songs=None, seed=0):
+    """登记 count 个带随机成绩的玩家（存档可以正常解析），返回它们的 SessionToken"""
+    from PhiCloudAction import readDifficultyFile
+    from context import default_context
+
+    difficulty = readDifficultyFile(default_context.difficulty_path())
+    tokens = [make_token(i) for i in range(count)]
+    for i, token in enumerate(tokens):
+        cloud.add_player(token, save_data=build_save(random_records(difficulty, songs, seed + i)),
+                         rks=12 + (i % 40) / 10)
+    return tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 LeanCloud 服务器")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--players", type=int, default=50, help="玩家数量")
+    parser.add_argument("--songs", type=int, default=None, help="每个玩家的歌曲数（默认全部歌曲）")
+    parser.add_argument("--latency", type=float, default=0, help="每个请求的延迟（毫秒）")
+    args = parser.parse_args()
+
+    cloud = MockCloud(latency=args.latency / 1000)
+    tokens = add_random_players(cloud, args.players, args.songs)
+    cloud.start(args.port)
+    print(f"CLOUD_BASE_URL = \"{cloud.base_url}\"")
+    print("\n".join(tokens))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        cloud.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,9 @@ import subprocess
 import select
 import json
 import uuid
+import sqlite3
+from userstore import UserStore
+from passwords import PasswordHasher, PasswordHasherBusy, LEGACY_KDF_ITERATIONS
 
 print("测试已经重启")
 
@@ -72,6 +75,10 @@ API_HELP_CONFIG = {
     "ifNotImage": "是否不要图片（true/false）",
     "text": "自定义文案（可选）",
     "xml": "自定义XML数据（可选）",
+    "force": "是否忽略存档缓存、强制重新下载云存档（true/false，可选）",
+    "data_filters": "type=data 时的筛选参数（均可选）：id（歌曲ID，逗号分隔）、difficulty（ez/hd/in/at，逗号分隔）、"
+                    "level_min/level_max（定数范围）、charter（谱师）、composer（曲师）、fields（返回字段，逗号分隔，如 name,level）",
+    "async": "type=image 时是否异步出图（true/false，可选）：返回 202 和任务ID，之后通过 /api/jobs/<任务ID>?wait=秒数 获取图片",
     "type": "请求类型：get（获取数据）/help（帮助）/image（直接返回图片）/data（获取谱面数据）"
 }
 
@@ -87,9 +94,33 @@ SALT_FILE = 'admin_salt.txt'
 DEFAULT_USERNAME = 'Admin'
 DEFAULT_PASSWORD = 'YourPassword'  #使用本项目前请务必将这个玩意改为你自己的密码！！！
 
-# 用户数据文件
+# 用户数据库文件
+USER_DB_FILE = 'user_data.db'
+# 旧版用户数据文件（仅用于一次性迁移到数据库）
 USER_DATA_FILE = 'user_data.json'
 
+user_store = None
+user_store_lock = threading.Lock()
+
+# 密码哈希配置：PBKDF2 迭代次数、专用线程数、最多排队的哈希任务数
+# 修改迭代次数后，旧用户会在下一次登录成功时按新次数重新哈希
+PASSWORD_KDF_ITERATIONS = 100000
+PASSWORD_WORKERS = 2
+PASSWORD_QUEUE_LIMIT = 32
+
+# 存档新鲜度窗口（秒）：同一 SessionToken 在窗口内重复查询时不访问云端（force=1 可跳过）
+SAVE_FRESHNESS_TTL = 60
+
+# 异步出图（async=1）：出图进程数（None 表示使用全部 CPU 核）、最多排队的出图任务数、长轮询最长等待秒数
+RENDER_WORKERS = None
+RENDER_QUEUE_LIMIT = 64
+RENDER_JOB_MAX_WAIT = 30
+
+# 云端 API 地址，None 表示使用官方地址；压测时可指向本地模拟服务器（code/test/mock_cloud.py）
+CLOUD_BASE_URL = None
+
+password_hasher = PasswordHasher(PASSWORD_KDF_ITERATIONS, PASSWORD_WORKERS, PASSWORD_QUEUE_LIMIT)
+
 SQL_INJECTION_PATTERNS = [
     r'(\bOR\b|\bAND\b)\s+\d+=\d+', r'\bUNION\s+SELECT\b', r'\bSELECT\b.*\bFROM\b',
     r'\bINSERT\b.*\bINTO\b', r'\bDROP\b.*\bTABLE\b', r'\bDELETE\b.*\bFROM\b',
@@ -97,101 +128,94 @@ SQL_INJECTION_PATTERNS = [
 ]
 
 # 用户数据管理函数
-def init_user_data():
-    """初始化用户数据文件"""
-    if not os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump({}, f, ensure_ascii=False, indent=2)
-
-def load_user_data():
-    """加载用户数据"""
-    try:
-        with open(USER_DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return {}
+def get_user_store():
+    """获取用户数据库（首次调用时创建，并从旧的 user_data.json 迁移数据）"""
+    global user_store
+    if user_store is None:
+        with user_store_lock:
+            if user_store is None:
+                store = UserStore(USER_DB_FILE)
+                store.migrate_from_json(USER_DATA_FILE)
+                user_store = store
+    return user_store
 
-def save_user_data(data):
-    """保存用户数据"""
-    with open(USER_DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def init_user_data():
+    """初始化用户数据库"""
+    get_user_store()
 
 def generate_user_id():
     """生成唯一用户ID"""
     return str(uuid.uuid4())
 
 def hash_user_password(password, salt=None):
-    """哈希用户密码"""
-    if salt is None:
-        salt = secrets.token_hex(16)
-    password_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
-    return password_hash, salt
+    """哈希用户密码（在密码哈希线程池中计算），返回 (哈希值, 盐, 迭代次数)"""
+    return password_hasher.hash(password, salt)
 
-def verify_user_password(password, stored_hash, salt):
-    """验证用户密码"""
+def verify_user_password(password, stored_hash, salt, iterations=None):
+    """验证用户密码；哈希队列已满时抛出 PasswordHasherBusy"""
     try:
-        new_hash, _ = hash_user_password(password, salt)
-        return secrets.compare_digest(new_hash, stored_hash)
+        return password_hasher.verify(password, stored_hash, salt, iterations)
+    except PasswordHasherBusy:
+        raise
     except:
         return False
 
+def check_user_password(user_id, user_info, password):
+    """
+    登录时验证用户密码
+
+    验证成功且该用户的哈希迭代次数与当前配置不同时，顺便按当前配置重新哈希并保存
+    """
+    iterations = user_info.get('kdf_iterations')
+    if not verify_user_password(password, user_info['password_hash'], user_info['salt'], iterations):
+        return False
+    if password_hasher.needs_rehash(iterations):
+        try:
+            password_hash, salt, iterations = hash_user_password(password)
+            get_user_store().update(user_id, password_hash=password_hash, salt=salt, kdf_iterations=iterations)
+        except PasswordHasherBusy:
+            # 重新哈希不是必须的，队列满时留到下次登录
+            pass
+    return True
+
 def username_exists(username):
     """检查用户名是否存在"""
-    user_data = load_user_data()
-    for user_id, user_info in user_data.items():
-        if user_info.get('username') == username:
-            return True
-    return False
+    return get_user_store().username_exists(username)
 
 def get_user_by_username(username):
     """通过用户名获取用户信息"""
-    user_data = load_user_data()
-    for user_id, user_info in user_data.items():
-        if user_info.get('username') == username:
-            return user_id, user_info
-    return None, None
+    return get_user_store().get_by_username(username)
 
 def get_user_by_sessiontoken(sessiontoken):
     """通过SessionToken获取用户信息"""
-    user_data = load_user_data()
-    for user_id, user_info in user_data.items():
-        if user_info.get('sessiontoken') == sessiontoken:
-            return user_id, user_info
-    return None, None
-
-def generate_default_username():
-    """生成默认用户名"""
-    user_data = load_user_data()
-    base_username = "user"
-    counter = 1
-    
-    while True:
-        username = f"{base_username}{counter}"
-        if not username_exists(username):
-            return username
-        counter += 1
+    return get_user_store().get_by_sessiontoken(sessiontoken)
+
+def create_default_account(user_id, sessiontoken):
+    """
+    为SessionToken创建绑定默认用户名和密码的新用户
+
+    默认用户名由数据库中持久化的递增编号分配（O(1)，并发安全）；SessionToken已注册时返回 None
+    """
+    default_password = "123456"
+    password_hash, salt, iterations = hash_user_password(default_password)
+    
+    try:
+        return get_user_store().create_with_default_username(user_id, {
+            'sessiontoken': sessiontoken,
+            'password_hash': password_hash,
+            'salt': salt,
+            'kdf_iterations': iterations,
+            'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        })
+    except sqlite3.IntegrityError:
+        return None
 
 def auto_bind_account(user_id, sessiontoken):
     """自动为新用户绑定默认用户名和密码"""
-    user_data = load_user_data()
-    
-    if user_id not in user_data:
+    default_username = create_default_account(user_id, sessiontoken)
+    if not default_username:
         return False
     
-    # 生成默认用户名
-    default_username = generate_default_username()
-    default_password = "123456"
-    
-    # 哈希密码
-    password_hash, salt = hash_user_password(default_password)
-    
-    # 更新用户信息
-    user_data[user_id]['username'] = default_username
-    user_data[user_id]['password_hash'] = password_hash
-    user_data[user_id]['salt'] = salt
-    
-    save_user_data(user_data)
-    
     logging.info(f"自动绑定账号: {default_username} (用户ID: {user_id})")
     return default_username
 
@@ -226,14 +250,15 @@ def detect_sql_injection(input_str):
     return False
 
 def hash_password(password, salt=None):
-    if salt is None: salt = secrets.token_hex(16)
-    password_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
+    # 管理员配置文件不记录迭代次数，固定使用旧的迭代次数
+    password_hash, salt, _ = password_hasher.hash(password, salt, LEGACY_KDF_ITERATIONS)
     return password_hash, salt
 
 def verify_password(password, stored_hash, salt):
     try:
         new_hash, _ = hash_password(password, salt)
         return secrets.compare_digest(new_hash, stored_hash)
+    except PasswordHasherBusy: raise
     except Exception: return False
 
 def init_admin_config():
@@ -267,42 +292,27 @@ def save_admin_config(username, password):
         return True
     except Exception as e: logging.error(f"保存管理员配置失败: {e}"); return False
 
-def execute_in_code_directory(func, *args, **kwargs):
-    """在 code 目录下执行函数，确保文件路径正确"""
-    original_cwd = os.getcwd()
-    code_dir = os.path.join(os.path.dirname(__file__), 'code')
-    
-    try:
-        os.chdir(code_dir)
-        result = func(*args, **kwargs)
-        return result
-    finally:
-        os.chdir(original_cwd)
+score_service = None
+score_service_lock = threading.Lock()
 
-def load_main_module():
+def load_score_service():
+    """创建常驻的查分服务（只在启动时执行一次，之后的请求直接复用）"""
+    global score_service
     try:
         code_dir = os.path.join(os.path.dirname(__file__), 'code')
         if code_dir not in sys.path: 
             sys.path.insert(0, code_dir)
         
-        # 导入 main.py 中的函数
-        from main import getB, get_user_info, nickname, get_save_data, draw_B_image, update_phigros_data, getInfoList
+        # 导入 code 目录下的查分服务
+        # code 模块内部使用绝对路径（见 code/context.py），不再需要 os.chdir，可在多个请求线程中并发调用
+        from service import ScoreService
+        score_service = ScoreService(save_freshness_ttl=SAVE_FRESHNESS_TTL,
+                                     render_workers=RENDER_WORKERS, render_queue_limit=RENDER_QUEUE_LIMIT,
+                                     cloud_base_url=CLOUD_BASE_URL)
+        score_service.metrics.gauge("txgetscore_password_queue_depth", "正在计算和排队的密码哈希任务数",
+                                    lambda: password_hasher.queue_depth())
         logging.info("✅ 成功加载 main.py 模块")
-        
-        def wrap_function(original_func):
-            def wrapper(*args, **kwargs):
-                return execute_in_code_directory(original_func, *args, **kwargs)
-            return wrapper
-        
-        return {
-            'getB': wrap_function(getB),
-            'get_user_info': wrap_function(get_user_info),
-            'nickname': wrap_function(nickname),
-            'get_save_data': wrap_function(get_save_data),
-            'draw_B_image': wrap_function(draw_B_image),
-            'update_phigros_data': wrap_function(update_phigros_data),
-            'getInfoList': wrap_function(getInfoList)
-        }
+        return score_service
     except ImportError as e: 
         logging.error(f"❌ 导入失败: {e}")
         if "update_phigros_data" in str(e):
@@ -313,6 +323,14 @@ def load_main_module():
         traceback.print_exc()
         return None
 
+def get_score_service():
+    """获取查分服务；未通过 __main__ 启动（例如由其他 WSGI 服务器加载）时在首次请求时创建"""
+    if score_service is None:
+        with score_service_lock:
+            if score_service is None:
+                load_score_service()
+    return score_service
+
 def run_data_update():
     global update_status
     if update_status["is_running"]: 
@@ -324,9 +342,11 @@ def run_data_update():
     logging.info(f"🔄 开始数据更新: {update_status['last_run']}")
     
     try:
-        main_functions = load_main_module()
-        if main_functions and 'update_phigros_data' in main_functions:
-            result = main_functions['update_phigros_data']()
+        service = get_score_service()
+        if service:
+            result = service.update_phigros_data()
+            # 定数表、曲名表和曲绘可能已更新，重新加载常驻数据
+            service.reload()
             update_status["last_success"] = update_status["last_run"]
             update_status["last_error"] = None
             logging.info(f"✅ 数据更新成功: {result if result else '完成'}")
@@ -407,13 +427,18 @@ def get_api_help_document():
                 "phi": API_HELP_CONFIG["phi"],
                 "ifNotImage": API_HELP_CONFIG["ifNotImage"],
                 "text": API_HELP_CONFIG["text"],
-                "xml": API_HELP_CONFIG["xml"]
+                "xml": API_HELP_CONFIG["xml"],
+                "force": API_HELP_CONFIG["force"],
+                "async": API_HELP_CONFIG["async"],
+                "data_filters": API_HELP_CONFIG["data_filters"]
             },
             "examples": [
                 "/api?type=get&sessiontoken=xxx&best=30&phi=3&ifNotImage=true",
                 "/api?type=image&sessiontoken=xxx&best=30&phi=3&text=自定义文案",
+                "/api?type=image&sessiontoken=xxx&best=30&phi=3&async=true",
                 "/api?type=help",
-                "/api?type=data"
+                "/api?type=data",
+                "/api?type=data&difficulty=at&level_min=15&fields=name,level,charter"
             ]
         }
     }
@@ -421,14 +446,58 @@ def get_api_help_document():
 def get_chart_data():
     """获取谱面数据"""
     try:
-        main_functions = load_main_module()
-        if main_functions and 'getInfoList' in main_functions:
-            return main_functions['getInfoList']()
+        service = get_score_service()
+        if service:
+            return service.getInfoList()
         else:
             return {"error": "无法加载谱面数据模块"}
     except Exception as e:
         return {"error": f"获取谱面数据失败: {str(e)}"}
 
+CHART_FILTER_PARAMS = {
+    'id': 'song_ids', 'difficulty': 'difficulties', 'level_min': 'level_min', 'level_max': 'level_max',
+    'charter': 'charter', 'composer': 'composer', 'fields': 'fields'
+}
+
+def handle_chart_data_request():
+    """
+    谱面数据请求
+
+    不带筛选参数时返回预先编码（并预先 gzip 压缩）的完整数据，带 ETag，客户端缓存未过期时返回 304；
+    带筛选参数时只返回匹配的歌曲和难度
+    """
+    service = get_score_service()
+    if not service:
+        return jsonify({"code": 200, "message": "谱面数据获取成功", "data": {"error": "无法加载谱面数据模块"}})
+    
+    filters = {name: request.args.get(param) for param, name in CHART_FILTER_PARAMS.items() if request.args.get(param)}
+    try:
+        if filters:
+            return jsonify({
+                "code": 200,
+                "message": "谱面数据获取成功",
+                "data": service.chart_table.query(**filters)
+            })
+        
+        use_gzip = 'gzip' in request.accept_encodings
+        body, version = service.chart_table.full_response(use_gzip)
+    except Exception:
+        # 文件不存在或读取失败时按原来的格式返回错误信息
+        return jsonify({"code": 200, "message": "谱面数据获取成功", "data": get_chart_data()})
+    
+    # 压缩和未压缩的响应体不同，使用不同的 ETag
+    etag = f"{version}-gzip" if use_gzip else version
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 # ==================== 真正的重启系统 ====================
 
 def restart_server():
@@ -522,8 +591,6 @@ def api_dash_login():
     sessiontoken = data.get('sessiontoken', '')
     username = data.get('username', '')
     
-    user_data = load_user_data()
-    
     if login_type == 'sessiontoken':
         if not sessiontoken:
             return jsonify({"code": 400, "error": "SessionToken不能为空"}), 400
@@ -536,7 +603,7 @@ def api_dash_login():
             if not password:
                 return jsonify({"code": 401, "error": "需要密码"}), 401
             
-            if verify_user_password(password, user_info['password_hash'], user_info['salt']):
+            if check_user_password(user_id, user_info, password):
                 session['user_logged_in'] = True
                 session['user_id'] = user_id
                 session['username'] = user_info['username']
@@ -572,7 +639,7 @@ def api_dash_login():
         if not user_info:
             return jsonify({"code": 401, "error": "用户不存在"}), 401
         
-        if verify_user_password(password, user_info['password_hash'], user_info['salt']):
+        if check_user_password(user_id, user_info, password):
             session['user_logged_in'] = True
             session['user_id'] = user_id
             session['username'] = username
@@ -603,22 +670,9 @@ def api_dash_register():
     
     # 创建新用户并自动绑定默认账号
     user_id = generate_user_id()
-    user_data = load_user_data()
-    
-    # 生成默认用户名
-    default_username = generate_default_username()
-    default_password = "123456"
-    password_hash, salt = hash_user_password(default_password)
-    
-    user_data[user_id] = {
-        'sessiontoken': sessiontoken,
-        'username': default_username,
-        'password_hash': password_hash,
-        'salt': salt,
-        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    }
-    
-    save_user_data(user_data)
+    default_username = create_default_account(user_id, sessiontoken)
+    if not default_username:
+        return jsonify({"code": 400, "error": "该SessionToken已注册"}), 400
     
     session['user_logged_in'] = True
     session['user_id'] = user_id
@@ -655,22 +709,19 @@ def api_dash_delete_account():
     if not password:
         return jsonify({"code": 400, "error": "需要密码确认"}), 400
     
-    user_data = load_user_data()
     user_id = session.get('user_id')
+    user_info = get_user_store().get(user_id)
     
-    if user_id not in user_data:
+    if not user_info:
         return jsonify({"code": 404, "error": "用户不存在"}), 404
     
-    user_info = user_data[user_id]
-    
     # 验证密码
     if user_info.get('username') and user_info.get('password_hash'):
-        if not verify_user_password(password, user_info['password_hash'], user_info['salt']):
+        if not verify_user_password(password, user_info['password_hash'], user_info['salt'], user_info.get('kdf_iterations')):
             return jsonify({"code": 401, "error": "密码错误"}), 401
     
     # 删除用户数据
-    del user_data[user_id]
-    save_user_data(user_data)
+    get_user_store().delete(user_id)
     
     # 清除session
     session.clear()
@@ -698,21 +749,20 @@ def api_dash_bind_account():
     if username_exists(username):
         return jsonify({"code": 400, "error": "用户名已存在"}), 400
     
-    user_data = load_user_data()
     user_id = session.get('user_id')
     
-    if user_id not in user_data:
-        return jsonify({"code": 404, "error": "用户不存在"}), 404
-    
     # 哈希密码
-    password_hash, salt = hash_user_password(password)
+    password_hash, salt, iterations = hash_user_password(password)
     
-    # 更新用户信息
-    user_data[user_id]['username'] = username
-    user_data[user_id]['password_hash'] = password_hash
-    user_data[user_id]['salt'] = salt
+    # 更新用户信息（用户名唯一索引保证并发绑定时不会重复）
+    try:
+        updated = get_user_store().update(user_id, username=username, password_hash=password_hash, salt=salt,
+                                          kdf_iterations=iterations)
+    except sqlite3.IntegrityError:
+        return jsonify({"code": 400, "error": "用户名已存在"}), 400
     
-    save_user_data(user_data)
+    if not updated:
+        return jsonify({"code": 404, "error": "用户不存在"}), 404
     
     # 更新session
     session['username'] = username
@@ -723,18 +773,11 @@ def api_dash_bind_account():
 @login_required
 def api_dash_unbind_account():
     """解绑用户名和密码API"""
-    user_data = load_user_data()
     user_id = session.get('user_id')
     
-    if user_id not in user_data:
-        return jsonify({"code": 404, "error": "用户不存在"}), 404
-    
     # 清除用户名和密码
-    user_data[user_id]['username'] = None
-    user_data[user_id]['password_hash'] = None
-    user_data[user_id]['salt'] = None
-    
-    save_user_data(user_data)
+    if not get_user_store().update(user_id, username=None, password_hash=None, salt=None):
+        return jsonify({"code": 404, "error": "用户不存在"}), 404
     
     # 更新session
     session['username'] = None
@@ -745,13 +788,12 @@ def api_dash_unbind_account():
 @login_required
 def api_dash_user_info():
     """获取用户信息API"""
-    user_data = load_user_data()
     user_id = session.get('user_id')
+    user_info = get_user_store().get(user_id)
     
-    if user_id not in user_data:
+    if not user_info:
         return jsonify({"code": 404, "error": "用户不存在"}), 404
     
-    user_info = user_data[user_id]
     return jsonify({
         "code": 200,
         "data": {
@@ -1117,14 +1159,23 @@ def admin_dashboard():
             // 加载用户列表
             async function loadUserList() {
                 try {
-                    const response = await fetch('/api/admin/users');
-                    const data = await response.json();
+                    // 接口按页返回（每页最多 1000 个），沿着 next_after 取完所有页
+                    const users = [];
+                    let after = 0;
+                    let data;
+                    do {
+                        const response = await fetch(`/api/admin/users?after=${after}&limit=1000`);
+                        data = await response.json();
+                        if (data.code !== 200) break;
+                        users.push(...data.data.users);
+                        after = data.data.next_after;
+                    } while (after !== null && after !== undefined);
                     
                     if (data.code === 200) {
                         let userHtml = '<table style="width: 100%; border-collapse: collapse; margin-top: 10px;">';
                         userHtml += '<tr><th style="text-align: left; padding: 8px; border-bottom: 1px solid rgba(255,255,255,0.3)">用户ID</th><th style="text-align: left; padding: 8px; border-bottom: 1px solid rgba(255,255,255,0.3)">用户名</th><th style="text-align: left; padding: 8px; border-bottom: 1px solid rgba(255,255,255,0.3)">注册时间</th></tr>';
                         
-                        data.data.users.forEach(user => {
+                        users.forEach(user => {
                             userHtml += `<tr>
                                 <td style="padding: 8px; border-bottom: 1px solid rgba(255,255,255,0.1)">${user.user_id.substring(0, 8)}...</td>
                                 <td style="padding: 8px; border-bottom: 1px solid rgba(255,255,255,0.1)">${user.username || '未绑定'}</td>
@@ -1198,13 +1249,9 @@ def api_admin_logout():
 @admin_login_required
 def api_admin_stats():
     """管理员统计数据API"""
-    user_data = load_user_data()
-    total_users = len(user_data)
-    bound_users = len([u for u in user_data.values() if u.get('username')])
-    
     # 计算今日注册用户
     today = datetime.now().strftime("%Y-%m-%d")
-    today_users = len([u for u in user_data.values() if u.get('created_at', '').startswith(today)])
+    total_users, bound_users, today_users = get_user_store().stats(today)
     
     return jsonify({
         "code": 200,
@@ -1215,24 +1262,40 @@ def api_admin_stats():
         }
     })
 
+@app.route('/api/admin/metrics')
+@admin_login_required
+def api_admin_metrics():
+    """查分流程各阶段耗时、缓存命中、云端错误和队列长度（Prometheus 文本格式）"""
+    service = get_score_service()
+    if not service:
+        return jsonify({"code": 500, "error": "无法加载模块"}), 500
+    return Response(service.metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/admin/users')
 @admin_login_required
 def api_admin_users():
-    """管理员用户列表API"""
-    user_data = load_user_data()
+    """管理员用户列表API（按注册顺序分页，after 为上一页返回的游标）"""
+    try:
+        after = int(request.args.get('after', '0'))
+        limit = min(max(int(request.args.get('limit', '100')), 1), 1000)
+    except ValueError:
+        return jsonify({"code": 400, "error": "after和limit必须是数字"}), 400
+    
+    page, next_after = get_user_store().list_users(after, limit)
     users = []
     
-    for user_id, user_info in user_data.items():
+    for user_info in page:
         users.append({
-            "user_id": user_id,
+            "user_id": user_info['user_id'],
             "username": user_info.get('username'),
-            "created_at": user_info.get('created_at', '未知')
+            "created_at": user_info.get('created_at') or '未知'
         })
     
     return jsonify({
         "code": 200,
         "data": {
-            "users": users
+            "users": users,
+            "next_after": next_after
         }
     })
 
@@ -1346,28 +1409,52 @@ def manual_update():
     threading.Thread(target=run_data_update, daemon=True).start()
     return jsonify({"code":200,"message":"更新任务已开始"})
 
-def handle_image_request(sessiontoken, best, phi, text, xml):
+def handle_image_request(sessiontoken, best, phi, text, xml, force=False, async_mode=False):
     if not sessiontoken: 
         return jsonify({"code":400,"error":"sessiontoken必需"}),400
     
-    main_functions = load_main_module()
-    if not main_functions: 
+    service = get_score_service()
+    if not service: 
         return jsonify({"code":500,"error":"无法加载模块"}),500
     
     try:
-        bC = main_functions['getB'](sessiontoken, best, phi)
-        user_info = main_functions['get_user_info'](sessiontoken)
-        name = main_functions['nickname'](sessiontoken)
+        # 同一 SessionToken 和参数的并发请求只会执行一次查询
+        query = service.query(sessiontoken, best, phi, force=force)
+        bC = query["list"]
+        user_info = query["user_info"]
+        name = query["nickname"]
         
-        # 使用 main.py 中的 draw_B_image 函数生成图片
-        img = main_functions['draw_B_image'](bC, user_info, name, text, xml)
+        # 同一存档、参数和资源版本生成的图片完全相同，用缓存键作为强 ETag
+        image_key = service.image_cache_key(user_info, name, best, phi, text, xml)
+        if image_key and request.if_none_match.contains(image_key):
+            response = Response(status=304)
+            response.set_etag(image_key)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
         
-        if not img: 
+        if async_mode:
+            # 提交到出图进程池，客户端之后轮询 /api/jobs/<任务ID>
+            job_id = service.render_jobs.submit(bC, user_info, name, text, xml, key=image_key)
+            if job_id is None:
+                response = jsonify({"code": 503, "error": "出图任务过多，请稍后再试"})
+                response.status_code = 503
+                response.headers['Retry-After'] = '5'
+                return response
+            status_url = url_for('api_job_status', job_id=job_id)
+            response = jsonify({"code": 202, "message": "出图任务已提交", "job_id": job_id, "status_url": status_url})
+            response.status_code = 202
+            response.headers['Location'] = status_url
+            return response
+        
+        # 使用 main.py 中的 draw_B_image 函数生成图片（命中缓存时直接返回已编码的图片）
+        png = service.render_image_png(bC, user_info, name, text, xml, key=image_key)
+        
+        if not png: 
             return jsonify({"code":500,"error":"图片生成失败"}),500
         
-        img_byte_arr = io.BytesIO()
-        img.save(img_byte_arr, format='PNG')
-        response = Response(img_byte_arr.getvalue(), mimetype='image/png')
+        response = Response(png, mimetype='image/png')
+        if image_key:
+            response.set_etag(image_key)
         response.headers['Cache-Control'] = 'no-cache'
         return response
         
@@ -1384,6 +1471,8 @@ def handle_api():
     if_not_image_str = request.args.get('ifNotImage', 'false').lower()
     text = request.args.get('text', '')
     xml = request.args.get('xml', '')
+    force = request.args.get('force', 'false').lower() in ['true', '1', 'yes']
+    async_mode = request.args.get('async', 'false').lower() in ['true', '1', 'yes']
     
     try: 
         best = int(best_str)
@@ -1394,39 +1483,35 @@ def handle_api():
     if_not_image = if_not_image_str in ['true', '1', 'yes']
     
     if request_type == 'image': 
-        return handle_image_request(sessiontoken, best, phi, text, xml)
+        return handle_image_request(sessiontoken, best, phi, text, xml, force, async_mode)
     
     elif request_type == 'get':
         if not sessiontoken: 
             return jsonify({"code":400,"error":"sessiontoken必需"}),400
         
-        main_functions = load_main_module()
-        if not main_functions: 
+        service = get_score_service()
+        if not service: 
             return jsonify({"code":500,"error":"无法加载模块"}),500
         
         try:
-            bC = main_functions['getB'](sessiontoken, best, phi)
-            user_info = main_functions['get_user_info'](sessiontoken)
-            name = main_functions['nickname'](sessiontoken)
-            save_data = main_functions['get_save_data'](sessiontoken)
+            # 同一 SessionToken 和参数的并发请求只会执行一次查询，结果是共享的，这里另建字典再添加图片字段
+            query = service.query(sessiontoken, best, phi, with_save_data=True, force=force)
+            bC = query["list"]
+            user_info = query["user_info"]
+            name = query["nickname"]
             
             result = {
                 "list": bC, 
                 "user_info": user_info, 
-                "save_data": save_data, 
+                "save_data": query["save_data"], 
                 "nickname": name
             }
             
             if not if_not_image:
-                try: 
-                    img = main_functions['draw_B_image'](bC, user_info, name, text, xml)
-                except TypeError: 
-                    img = main_functions['draw_B_image'](bC, user_info, name)
-                
-                if img:
-                    img_byte_arr = io.BytesIO()
-                    img.save(img_byte_arr, format='PNG')
-                    result["_image_base64"] = base64.b64encode(img_byte_arr.getvalue()).decode('utf-8')
+                image_key = service.image_cache_key(user_info, name, best, phi, text, xml)
+                png = service.render_image_png(bC, user_info, name, text, xml, key=image_key)
+                if png:
+                    result["_image_base64"] = base64.b64encode(png).decode('utf-8')
             
             return jsonify({
                 "code":200,
@@ -1445,22 +1530,59 @@ def handle_api():
         return jsonify(get_api_help_document())
     
     elif request_type == 'data':
-        # 获取谱面数据
-        chart_data = get_chart_data()
-        return jsonify({
-            "code": 200,
-            "message": "谱面数据获取成功",
-            "data": chart_data
-        })
+        # 获取谱面数据（支持筛选和字段投影）
+        return handle_chart_data_request()
     
     else: 
         return jsonify({"code":400,"message":"无效type参数"}),400
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    """异步出图任务状态；wait 参数为长轮询秒数，任务完成后直接返回 PNG 图片"""
+    service = get_score_service()
+    if not service:
+        return jsonify({"code":500,"error":"无法加载模块"}),500
+    
+    try:
+        wait = min(max(float(request.args.get('wait', '0')), 0), RENDER_JOB_MAX_WAIT)
+    except ValueError:
+        return jsonify({"code":400,"error":"wait必须是数字"}),400
+    
+    job = service.render_jobs.get(job_id, wait)
+    if job is None:
+        return jsonify({"code":404,"error":"任务不存在或已过期"}),404
+    
+    if job["status"] == "pending":
+        response = jsonify({"code": 202, "status": "pending", "job_id": job_id})
+        response.status_code = 202
+        response.headers['Retry-After'] = '1'
+        return response
+    
+    if job["status"] == "error":
+        return jsonify({"code":500,"status":"error","error":f"图片生成失败: {job['error']}"}),500
+    
+    response = Response(job["png"], mimetype='image/png')
+    if job["key"]:
+        response.set_etag(job["key"])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.errorhandler(PasswordHasherBusy)
+def handle_password_hasher_busy(e):
+    """密码哈希队列已满：返回 503，提示客户端稍后重试"""
+    response = jsonify({"code": 503, "error": str(e)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 # 注册退出处理
 def cleanup():
     """清理函数，在程序退出时调用"""
     logging.info("🧹 正在清理资源...")
     stop_scheduler()
+    password_hasher.shutdown()
+    if score_service:
+        score_service.render_jobs.shutdown()
 
 atexit.register(cleanup)
 
@@ -1485,13 +1607,9 @@ if __name__ == '__main__':
         print(f"   {param}: {description}")
     
     print("🔍 检查模块加载...")
-    main_functions = load_main_module()
-    if main_functions:
+    if load_score_service():
         print("✅ 模块检查通过")
-        if 'update_phigros_data' in main_functions: 
-            start_scheduler()
-        else: 
-            print("⚠️  未找到 update_phigros_data 函数，定时更新功能禁用")
+        start_scheduler()
     else: 
         print("❌ 模块检查失败，请检查 code/main.py")
     
@@ -1499,9 +1617,9 @@ if __name__ == '__main__':
     keyboard_listener()
     
     try:
-        app.run(debug=True, host='0.0.0.0', port=5001, use_reloader=False)
+        app.run(debug=True, host='0.0.0.0', port=5001, use_reloader=False, threaded=True)
     except KeyboardInterrupt:
         print("\n🛑 接收到中断信号，正在关闭服务器...")
         stop_scheduler()
     finally:
-        print("👋 服务器已关闭")
\ No newline at end of file
+        print("👋 服务器已关闭")
\ No newline at end of file
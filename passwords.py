@@ -0,0 +1,77 @@
+import hashlib
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 没有记录迭代次数的旧密码哈希使用的 PBKDF2 迭代次数
+LEGACY_KDF_ITERATIONS = 100000
+
+
+class PasswordHasherBusy(Exception):
+    """密码哈希队列已满"""
+
+
+class PasswordHasher:
+    """
+    在独立的有界线程池中计算 PBKDF2 密码哈希
+
+    hashlib.pbkdf2_hmac 计算时会释放 GIL，放到固定数量的工作线程里执行，可以限制密码哈希最多占用的 CPU 核数，
+    登录高峰时不会拖慢查分接口。排队的任务超过 max_queue 时直接抛出 PasswordHasherBusy，由调用方返回 503。
+    workers 为 0 时在调用线程中直接计算（旧行为，仅用于对比测试）。
+    """
+
+    def __init__(self, iterations=LEGACY_KDF_ITERATIONS, workers=2, max_queue=32):
+        self.iterations = iterations
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pbkdf2") if workers > 0 else None
+
+    @staticmethod
+    def _pbkdf2(password, salt, iterations):
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), iterations).hex()
+
+    def _run(self, password, salt, iterations):
+        if self._executor is None:
+            return self._pbkdf2(password, salt, iterations)
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise PasswordHasherBusy("密码验证请求过多，请稍后再试")
+            self._pending += 1
+        try:
+            return self._executor.submit(self._pbkdf2, password, salt, iterations).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def queue_depth(self):
+        """当前正在计算和排队的哈希任务数"""
+        return self._pending
+
+    def hash(self, password, salt=None, iterations=None):
+        """
+        计算密码哈希
+
+        返回:
+            (str, str, int): 哈希值、盐和使用的迭代次数
+        """
+        if salt is None:
+            salt = secrets.token_hex(16)
+        if iterations is None:
+            iterations = self.iterations
+        return self._run(password, salt, iterations), salt, iterations
+
+    def verify(self, password, stored_hash, salt, iterations=None):
+        """验证密码；iterations 为空时按旧密码的迭代次数计算"""
+        new_hash = self._run(password, salt, iterations or LEGACY_KDF_ITERATIONS)
+        return secrets.compare_digest(new_hash, stored_hash)
+
+    def needs_rehash(self, iterations):
+        """用户的哈希迭代次数与当前配置不一致时需要重新哈希"""
+        return (iterations or LEGACY_KDF_ITERATIONS) != self.iterations
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
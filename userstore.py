@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+USER_FIELDS = ('sessiontoken', 'username', 'password_hash', 'salt', 'created_at', 'kdf_iterations')
+INSERT_USER_SQL = (
+    f"INSERT INTO users (user_id, {', '.join(USER_FIELDS)}) "
+    f"VALUES ({', '.join('?' * (len(USER_FIELDS) + 1))})"
+)
+DEFAULT_USERNAME_PREFIX = 'user'
+
+
+class UserStore:
+    """
+    基于 SQLite 的用户数据存储
+
+    username 和 sessiontoken 上有唯一索引，查询是 O(log n)；所有写操作都在事务里完成，
+    并发注册时由唯一约束保证不会出现重复的用户名或 SessionToken。
+    每个线程使用自己的连接，数据库开启 WAL，读写互不阻塞。
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL UNIQUE,
+                sessiontoken TEXT UNIQUE,
+                username TEXT UNIQUE,
+                password_hash TEXT,
+                salt TEXT,
+                created_at TEXT,
+                kdf_iterations INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        ''')
+        # 旧版数据库没有 kdf_iterations 列（为空表示旧的默认迭代次数）
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(users)')}
+        if 'kdf_iterations' not in columns:
+            conn.execute('ALTER TABLE users ADD COLUMN kdf_iterations INTEGER')
+
+    def transaction(self):
+        """返回一个立即加写锁的事务（with 语句中使用）"""
+        return _Transaction(self._connect())
+
+    @staticmethod
+    def _row_to_user(row):
+        if row is None:
+            return None, None
+        return row['user_id'], {key: row[key] for key in USER_FIELDS}
+
+    # ==================== 查询 ====================
+
+    def get(self, user_id):
+        """通过用户ID获取用户信息，不存在时返回 None"""
+        row = self._connect().execute('SELECT * FROM users WHERE user_id = ?', (user_id,)).fetchone()
+        return self._row_to_user(row)[1]
+
+    def get_by_username(self, username):
+        row = self._connect().execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        return self._row_to_user(row)
+
+    def get_by_sessiontoken(self, sessiontoken):
+        row = self._connect().execute('SELECT * FROM users WHERE sessiontoken = ?', (sessiontoken,)).fetchone()
+        return self._row_to_user(row)
+
+    def username_exists(self, username):
+        row = self._connect().execute('SELECT 1 FROM users WHERE username = ?', (username,)).fetchone()
+        return row is not None
+
+    def count(self):
+        return self._connect().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def stats(self, today):
+        """总用户数、已绑定用户数、今日注册数（today 为 YYYY-MM-DD，按 created_at 索引做前缀范围查询）"""
+        conn = self._connect()
+        total_users = conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]
+        bound_users = conn.execute('SELECT COUNT(*) FROM users WHERE username IS NOT NULL').fetchone()[0]
+        today_users = conn.execute(
+            'SELECT COUNT(*) FROM users WHERE created_at >= ? AND created_at < ?',
+            (today, today + '~')
+        ).fetchone()[0]
+        return total_users, bound_users, today_users
+
+    def list_users(self, after=0, limit=100):
+        """
+        按注册顺序分页列出用户（以内部自增 id 作为游标）
+
+        返回:
+            (list[dict], int | None): 用户列表和下一页游标，没有下一页时为 None
+        """
+        rows = self._connect().execute(
+            'SELECT * FROM users WHERE id > ? ORDER BY id LIMIT ?', (after, limit + 1)
+        ).fetchall()
+        next_after = rows[limit - 1]['id'] if len(rows) > limit else None
+        users = []
+        for row in rows[:limit]:
+            user_id, user_info = self._row_to_user(row)
+            users.append({"user_id": user_id, **user_info})
+        return users, next_after
+
+    # ==================== 写入 ====================
+
+    def create(self, user_id, user_info):
+        """新建用户；用户名或 SessionToken 已存在时抛出 sqlite3.IntegrityError"""
+        with self.transaction() as conn:
+            conn.execute(INSERT_USER_SQL, (user_id, *(user_info.get(key) for key in USER_FIELDS)))
+
+    def create_with_default_username(self, user_id, user_info, prefix=DEFAULT_USERNAME_PREFIX):
+        """
+        新建用户并分配默认用户名（prefix + 递增编号），返回分配到的用户名
+
+        编号保存在 counters 表里，与插入在同一个写事务中完成，并发注册不会拿到相同的用户名；
+        编号只增不减，被手动绑定占用的名字会被跳过，所以分配是均摊 O(1) 的。
+        SessionToken 已存在时抛出 sqlite3.IntegrityError。
+        """
+        with self.transaction() as conn:
+            counter = self._load_username_counter(conn, prefix)
+            while True:
+                counter += 1
+                username = f'{prefix}{counter}'
+                if conn.execute('SELECT 1 FROM users WHERE username = ?', (username,)).fetchone() is None:
+                    break
+            conn.execute(INSERT_USER_SQL, (user_id, *({**user_info, 'username': username}.get(key) for key in USER_FIELDS)))
+            conn.execute(
+                'INSERT INTO counters (name, value) VALUES (?, ?) '
+                'ON CONFLICT(name) DO UPDATE SET value = excluded.value',
+                (f'username:{prefix}', counter)
+            )
+        return username
+
+    @staticmethod
+    def _load_username_counter(conn, prefix):
+        """读取默认用户名编号；第一次使用时从已有用户名中取最大编号（只扫描一次）"""
+        row = conn.execute('SELECT value FROM counters WHERE name = ?', (f'username:{prefix}',)).fetchone()
+        if row is not None:
+            return row[0]
+        row = conn.execute(
+            'SELECT MAX(CAST(SUBSTR(username, ?) AS INTEGER)) FROM users WHERE username GLOB ?',
+            (len(prefix) + 1, f'{prefix}[0-9]*')
+        ).fetchone()
+        return row[0] or 0
+
+    def update(self, user_id, **fields):
+        """更新用户字段，返回用户是否存在；用户名冲突时抛出 sqlite3.IntegrityError"""
+        fields = {key: value for key, value in fields.items() if key in USER_FIELDS}
+        if not fields:
+            return self.get(user_id) is not None
+        assignments = ', '.join(f'{key} = ?' for key in fields)
+        with self.transaction() as conn:
+            cursor = conn.execute(f'UPDATE users SET {assignments} WHERE user_id = ?', (*fields.values(), user_id))
+            return cursor.rowcount > 0
+
+    def delete(self, user_id):
+        with self.transaction() as conn:
+            cursor = conn.execute('DELETE FROM users WHERE user_id = ?', (user_id,))
+            return cursor.rowcount > 0
+
+    # ==================== 迁移 ====================
+
+    def migrate_from_json(self, json_file):
+        """
+        从旧的 user_data.json 一次性导入用户数据
+
+        只在数据库为空且 JSON 文件存在时执行，导入成功后把 JSON 文件重命名为 *.migrated，返回实际导入的用户数
+        """
+        if not os.path.exists(json_file):
+            return 0
+        with self.transaction() as conn:
+            if conn.execute('SELECT COUNT(*) FROM users').fetchone()[0] > 0:
+                return 0
+            try:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    user_data = json.load(f)
+            except (OSError, ValueError) as e:
+                logging.error(f"读取 {json_file} 失败，跳过迁移: {e}")
+                return 0
+            migrated = 0
+            for user_id, user_info in user_data.items():
+                row = [user_id, *(user_info.get(key) for key in USER_FIELDS)]
+                # 旧版并发写入可能留下重复的 SessionToken 或用户名，保留账号但清空重复的字段
+                if row[1] is not None and conn.execute(
+                        'SELECT 1 FROM users WHERE sessiontoken = ?', (row[1],)).fetchone():
+                    logging.warning(f"迁移用户 {user_id} 时发现重复的 SessionToken，已清空其 SessionToken")
+                    row[1] = None
+                if row[2] is not None and conn.execute(
+                        'SELECT 1 FROM users WHERE username = ?', (row[2],)).fetchone():
+                    logging.warning(f"迁移用户 {user_id} 时发现重复的用户名 {row[2]}，已解除其用户名绑定")
+                    row[2:5] = [None, None, None]
+                # 其他约束冲突时抛出异常，整个迁移回滚，JSON 文件保持原样
+                conn.execute(INSERT_USER_SQL, row)
+                migrated += 1
+        os.replace(json_file, json_file + '.migrated')
+        logging.info(f"已从 {json_file} 迁移 {migrated} 个用户到 {self.db_file}")
+        return migrated
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE 事务：进入时即获取写锁，异常时回滚"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.conn.execute('COMMIT')
+        else:
+            self.conn.execute('ROLLBACK')
+        return False